@@ -5,6 +5,8 @@ from sqlalchemy import pool
 
 from alembic import context
 
+from codenames.sharding import shard_urls
+
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
 config = context.config
@@ -57,13 +59,23 @@ def run_migrations_online():
 
     """
     connectable = config.attributes.get('connection', None)
-    if connectable is None:
-        connectable = engine_from_config(
-            config.get_section(config.config_ini_section),
-            prefix="sqlalchemy.",
-            poolclass=pool.NullPool,
+    if connectable is not None:
+        run_migrations_on(connectable)
+        return
+
+    # every shard of the games (or only the configured database)
+    section = config.get_section(config.config_ini_section)
+    for url in shard_urls(section["sqlalchemy.url"]):
+        run_migrations_on(
+            engine_from_config(
+                {**section, "sqlalchemy.url": url},
+                prefix="sqlalchemy.",
+                poolclass=pool.NullPool,
+            )
         )
 
+
+def run_migrations_on(connectable):
     with connectable.connect() as connection:
         context.configure(
             connection=connection, target_metadata=target_metadata
@@ -0,0 +1,26 @@
+"""add move id to conditions
+
+Revision ID: 3b8d1f0c9a2e
+Revises: 6fae36685ece
+Create Date: 2026-10-19 10:12:41.503127
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3b8d1f0c9a2e'
+down_revision = '6fae36685ece'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # the guess that led to a condition, if any
+    op.add_column("conditions", sa.Column('move_id', sa.Integer))
+
+
+def downgrade():
+    with op.batch_alter_table("conditions") as batch_op:
+        batch_op.drop_column("move_id")
@@ -0,0 +1,29 @@
+"""add unique index on game names
+
+Revision ID: 9c4e2a7b5d13
+Revises: 3b8d1f0c9a2e
+Create Date: 2026-10-19 14:03:27.815402
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c4e2a7b5d13'
+down_revision = '3b8d1f0c9a2e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # duplicates created by concurrent requests keep their name with their id
+    op.execute(
+        "UPDATE games SET name = name || ' (' || id || ')' "
+        "WHERE id NOT IN (SELECT MIN(id) FROM games GROUP BY name)"
+    )
+    op.create_index("ix_games_name", "games", ["name"], unique=True)
+
+
+def downgrade():
+    op.drop_index("ix_games_name", table_name="games")
@@ -0,0 +1,37 @@
+"""add salt to games
+
+Revision ID: a4c7e2f8d3b9
+Revises: f1a6d3e9b2c4
+Create Date: 2026-10-19 19:12:36.480211
+
+"""
+import secrets
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4c7e2f8d3b9'
+down_revision = 'f1a6d3e9b2c4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("games", sa.Column("salt", sa.String(), nullable=True))
+    games = sa.table("games", sa.column("id", sa.Integer), sa.column("salt"))
+    connection = op.get_bind()
+    for (game_id,) in connection.execute(sa.select(games.c.id)).fetchall():
+        connection.execute(
+            games.update()
+            .where(games.c.id == game_id)
+            .values(salt=secrets.token_hex(8))
+        )
+
+
+def downgrade():
+    with op.batch_alter_table(
+        "games", table_kwargs={"sqlite_autoincrement": True}
+    ) as batch_op:
+        batch_op.drop_column("salt")
@@ -0,0 +1,38 @@
+"""add game id counters
+
+Revision ID: b8e1d5a3c6f4
+Revises: a4c7e2f8d3b9
+Create Date: 2026-10-19 19:40:52.217964
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8e1d5a3c6f4'
+down_revision = 'a4c7e2f8d3b9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    counters = op.create_table(
+        "game_id_counters",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("last_id", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    # continue after every id ever handed out, including deleted games
+    connection = op.get_bind()
+    last_id = connection.execute(sa.text("SELECT MAX(id) FROM games")).scalar() or 0
+    if connection.dialect.name == "sqlite":
+        sequence = connection.execute(
+            sa.text("SELECT seq FROM sqlite_sequence WHERE name = 'games'")
+        ).scalar()
+        last_id = max(last_id, sequence or 0)
+    op.bulk_insert(counters, [{"id": 1, "last_id": last_id}])
+
+
+def downgrade():
+    op.drop_table("game_id_counters")
@@ -0,0 +1,38 @@
+"""drop salt from games
+
+Revision ID: c3d9f4a1e7b6
+Revises: b8e1d5a3c6f4
+Create Date: 2026-10-19 21:05:14.730492
+
+"""
+import secrets
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3d9f4a1e7b6'
+down_revision = 'b8e1d5a3c6f4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # game ids are never reused, seat tokens are signed without a salt
+    with op.batch_alter_table(
+        "games", table_kwargs={"sqlite_autoincrement": True}
+    ) as batch_op:
+        batch_op.drop_column("salt")
+
+
+def downgrade():
+    op.add_column("games", sa.Column("salt", sa.String(), nullable=True))
+    games = sa.table("games", sa.column("id", sa.Integer), sa.column("salt"))
+    connection = op.get_bind()
+    for (game_id,) in connection.execute(sa.select(games.c.id)).fetchall():
+        connection.execute(
+            games.update()
+            .where(games.c.id == game_id)
+            .values(salt=secrets.token_hex(8))
+        )
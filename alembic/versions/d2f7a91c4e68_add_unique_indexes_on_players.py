@@ -0,0 +1,45 @@
+"""add unique indexes on players
+
+Revision ID: d2f7a91c4e68
+Revises: 9c4e2a7b5d13
+Create Date: 2026-10-19 15:21:09.402178
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2f7a91c4e68'
+down_revision = '9c4e2a7b5d13'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # players that have been seated twice by concurrent joins lose the later seat
+    op.execute(
+        "DELETE FROM players WHERE id NOT IN "
+        "(SELECT MIN(id) FROM players GROUP BY game_id, color, role)"
+    )
+    op.execute(
+        "DELETE FROM players WHERE id NOT IN "
+        "(SELECT MIN(id) FROM players GROUP BY game_id, session_id)"
+    )
+    op.create_index(
+        "uq_players_game_id_color_role",
+        "players",
+        ["game_id", "color", "role"],
+        unique=True,
+    )
+    op.create_index(
+        "uq_players_game_id_session_id",
+        "players",
+        ["game_id", "session_id"],
+        unique=True,
+    )
+
+
+def downgrade():
+    op.drop_index("uq_players_game_id_session_id", table_name="players")
+    op.drop_index("uq_players_game_id_color_role", table_name="players")
@@ -0,0 +1,32 @@
+"""autoincrement game ids
+
+Revision ID: e5b3c8d1a7f2
+Revises: d2f7a91c4e68
+Create Date: 2026-10-19 18:21:44.102938
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5b3c8d1a7f2'
+down_revision = 'd2f7a91c4e68'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # SQLite hands out the highest rowid again once its row is deleted, the
+    # ids of archived and reaped games must never be reused
+    if op.get_bind().dialect.name == "sqlite":
+        with op.batch_alter_table(
+            "games", recreate="always", table_kwargs={"sqlite_autoincrement": True}
+        ):
+            pass
+
+
+def downgrade():
+    if op.get_bind().dialect.name == "sqlite":
+        with op.batch_alter_table("games", recreate="always"):
+            pass
@@ -0,0 +1,32 @@
+"""backfill condition timestamps
+
+Revision ID: f1a6d3e9b2c4
+Revises: e5b3c8d1a7f2
+Create Date: 2026-10-19 18:47:09.553120
+
+"""
+import time
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1a6d3e9b2c4'
+down_revision = 'e5b3c8d1a7f2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # conditions of games created before they were timestamped count as
+    # activity at the time of the migration, so the reaper does not delete
+    # every such game right away
+    op.execute(
+        sa.text("UPDATE conditions SET created_at = :now WHERE created_at IS NULL")
+        .bindparams(now=int(time.time()))
+    )
+
+
+def downgrade():
+    pass
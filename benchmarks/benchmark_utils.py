@@ -0,0 +1,44 @@
+from itertools import count
+
+from codenames.game import Color, Role, Condition
+from codenames.sql import SQLAlchemyGameManager, SQLAlchemyGameBackend
+
+PLAYERS = [
+    ("red-player", Color.RED, Role.PLAYER),
+    ("red-spy", Color.RED, Role.SPYMASTER),
+    ("blue-player", Color.BLUE, Role.PLAYER),
+    ("blue-spy", Color.BLUE, Role.SPYMASTER),
+]
+
+_game_names = count()
+
+
+def board_manager(db, board_size: int = 25) -> SQLAlchemyGameManager:
+    """A game manager with roughly the proportions of the original board."""
+    num_team = round(board_size * 9 / 25)
+    num_assassin = 1
+    num_neutral = board_size - 2 * num_team - num_assassin
+    return SQLAlchemyGameManager(
+        db,
+        num_blue=num_team,
+        num_red=num_team,
+        num_neutral=num_neutral,
+        num_assassin=num_assassin,
+    )
+
+
+def create_started_game(db, board_size: int = 25) -> SQLAlchemyGameBackend:
+    """Creates a game with all players seated and the blue spymaster to move."""
+    game = board_manager(db, board_size).create_random(
+        f"game-{next(_game_names)}", "creator", random_seed=66
+    )
+    backend = SQLAlchemyGameBackend(game.id, db)
+    for session_id, color, role in PLAYERS:
+        backend.add_player(session_id, color, role, session_id)
+    backend.add_condition(Condition.BLUE_SPY)
+    backend.commit()
+    return backend
+
+
+def next_game_name() -> str:
+    return f"game-{next(_game_names)}"
@@ -0,0 +1,27 @@
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from alembic.command import upgrade as alembic_upgrade
+from alembic.config import Config as AlembicConfig
+
+import pytest
+
+
+@pytest.fixture
+def db_session():
+    # a single shared connection, so that endpoints running in the thread pool
+    # see the same in-memory database
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    alembic_config = AlembicConfig("alembic.ini")
+    alembic_config.set_main_option("sqlalchemy.url", "sqlite:///:memory:")
+    with engine.begin() as connection:
+        alembic_config.attributes["connection"] = connection
+        alembic_upgrade(alembic_config, "head")
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
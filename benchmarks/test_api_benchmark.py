@@ -0,0 +1,53 @@
+from itertools import count
+
+import pytest
+import spacy
+from fastapi.testclient import TestClient
+
+from codenames.api import app, embeddings, get_similarity_service
+from codenames.embeddings import DEFAULT_MODEL
+from codenames.similarity import SimilarityService
+from codenames.sql import SQLAlchemyGameBackend
+
+if not spacy.util.is_package(DEFAULT_MODEL):
+    pytest.skip(f"{DEFAULT_MODEL} is not installed", allow_module_level=True)
+
+from benchmark_utils import create_started_game
+
+
+@pytest.fixture
+def client(db_session):
+    def load_board(game_id: int):
+        backend = SQLAlchemyGameBackend(game_id, db_session)
+        return [(w.id, w.word.value) for w in backend.read_active_words()]
+
+    similarities = SimilarityService(embeddings, load_board)
+    app.dependency_overrides[get_similarity_service] = lambda: similarities
+    yield TestClient(app)
+    del app.dependency_overrides[get_similarity_service]
+
+
+@pytest.mark.parametrize("hint", ["ocean", "hollywod"])
+def test_similarity(benchmark, client, db_session, hint):
+    backend = create_started_game(db_session)
+    suffixes = count()
+
+    # a new hint on every call, otherwise only the first one is scored
+    response = benchmark(
+        lambda: client.get(
+            f"/games/{backend.game_id}/similarity",
+            params={"hint": f"{hint}{next(suffixes)}"},
+        )
+    )
+
+    assert response.status_code == 200, response.text
+
+
+def test_cached_similarity(benchmark, client, db_session):
+    backend = create_started_game(db_session)
+
+    response = benchmark(
+        client.get, f"/games/{backend.game_id}/similarity", params={"hint": "ocean"}
+    )
+
+    assert response.status_code == 200, response.text
@@ -0,0 +1,45 @@
+import asyncio
+
+import pytest
+
+from codenames.broadcast import GameBroadcaster, Snapshot, StreamConfig
+
+from benchmark_utils import create_started_game
+
+
+@pytest.mark.parametrize("num_subscribers", [1, 10, 100, 1000])
+def test_fan_out(benchmark, db_session, num_subscribers):
+    backend = create_started_game(db_session)
+    game_infos = [backend.load()]
+    backend.add_guess(next(iter(game_infos[0]["words"])))
+    game_infos.append(backend.load())
+
+    async def run():
+        # never reloads on its own, every publish is triggered below
+        broadcaster = GameBroadcaster(
+            backend.game_id,
+            lambda _: game_infos[0],
+            StreamConfig(
+                resync_interval=3600, max_queue_size=1, eviction_timeout=float("inf")
+            ),
+        )
+        for i in range(num_subscribers):
+            broadcaster.subscribe("blue-spy" if i % 4 == 0 else f"spectator-{i}")
+        await asyncio.sleep(0)
+
+        versions = iter(range(10**9))
+        benchmark(lambda: broadcaster.publish(game_infos[next(versions) % 2]))
+        return broadcaster
+
+    broadcaster = asyncio.run(run())
+
+    assert broadcaster.num_subscribers == num_subscribers
+
+
+def test_encode_snapshot(benchmark, db_session):
+    backend = create_started_game(db_session)
+    game_info = backend.load()
+
+    snapshot = benchmark(Snapshot.encode, game_info)
+
+    assert snapshot.spymaster_frame != snapshot.operative_frame
@@ -0,0 +1,71 @@
+from itertools import combinations
+
+import numpy as np
+import pytest
+
+from codenames.clue_index import ClueIndex
+from codenames.clues import search
+from codenames.game import Color, Condition, Role, Word
+from codenames.lookahead import LookaheadConfig, MonteCarloSpymaster
+
+
+@pytest.fixture(scope="module")
+def clue_index():
+    rng = np.random.default_rng(0)
+    board_words = [f"word{i}" for i in range(400)]
+    vocab = [f"clue{i}" for i in range(100000)]
+    return ClueIndex(
+        board_words,
+        vocab,
+        rng.uniform(-0.2, 0.8, (len(board_words), len(vocab))).astype(np.float16),
+        np.zeros((len(board_words), 0), dtype=np.int32),
+        np.packbits(rng.random((len(board_words), len(vocab))) < 0.001, axis=1),
+    )
+
+
+def test_search(benchmark, clue_index):
+    board = clue_index.board_words[:25]
+
+    clues = benchmark(search, clue_index, board[:9], board[9:])
+
+    assert clues
+
+
+def test_enumerate_subsets(benchmark, clue_index):
+    """The subset enumeration of notebooks/word2vec.py, for comparison."""
+    board = clue_index.board_words[:25]
+
+    def enumerate_subsets():
+        similarities = clue_index.similarities(board[:9])
+        valid = clue_index.valid_mask(board)
+        return [
+            np.argsort(-np.where(valid, similarities[list(s)].mean(axis=0), -np.inf))
+            for k in range(1, 5)
+            for s in combinations(range(9), k)
+        ]
+
+    assert len(benchmark.pedantic(enumerate_subsets, rounds=1)) == 255
+
+
+def test_lookahead(benchmark, clue_index):
+    board = clue_index.board_words[:25]
+    colors = [Color.BLUE] * 9 + [Color.RED] * 8 + [Color.NEUTRAL] * 7
+    game_info = {
+        "words": {
+            i: Word(id=i, value=w, color=c, selected_at=None)
+            for i, (w, c) in enumerate(zip(board, colors + [Color.ASSASSIN]))
+        },
+        "hints": [{"id": 1, "word": None, "num": None, "color": None}],
+        "conditions": [{"value": Condition.BLUE_SPY, "hint_id": None}],
+        "players": [
+            {"session_id": f"{c.name}-{r.name}", "color": c, "role": r, "name": ""}
+            for c in [Color.BLUE, Color.RED]
+            for r in [Role.SPYMASTER, Role.PLAYER]
+        ],
+    }
+    spymaster = MonteCarloSpymaster(clue_index, LookaheadConfig(seed=0))
+
+    evaluations = benchmark.pedantic(spymaster.evaluate, args=(1, game_info), rounds=3)
+
+    benchmark.extra_info["num_rollouts"] = evaluations[0].num_rollouts
+    assert evaluations
@@ -0,0 +1,28 @@
+from codenames.game import Game, Color, Condition
+
+from benchmark_utils import create_started_game
+
+
+def play_round(backend, guesses):
+    Game("blue-spy", backend).load_state().give_hint("myhint", len(guesses))
+    for word_id in guesses:
+        Game("blue-player", backend).load_state().guess(word_id)
+
+
+def test_hint_and_guess_cycle(benchmark, db_session):
+    def setup():
+        backend = create_started_game(db_session)
+        blue_words = [
+            w.id for w in backend.load()["words"].values() if w.color == Color.BLUE
+        ]
+        return (backend, blue_words[:3]), {}
+
+    benchmark.pedantic(play_round, setup=setup, rounds=50)
+
+
+def test_load_state(benchmark, db_session):
+    backend = create_started_game(db_session)
+
+    state = benchmark(Game("blue-spy", backend).load_state)
+
+    assert state.get_info()["conditions"][-1]["value"] == Condition.BLUE_SPY
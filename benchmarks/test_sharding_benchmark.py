@@ -0,0 +1,134 @@
+import multiprocessing
+import os
+import time
+
+import pytest
+from alembic.command import upgrade as alembic_upgrade
+from alembic.config import Config as AlembicConfig
+
+from codenames.game import Color, Condition
+from codenames.sharding import (
+    GameShards,
+    ShardedGameBackend,
+    ShardedGameManager,
+    create_shard_engine,
+)
+
+from benchmark_utils import PLAYERS, next_game_name
+
+NUM_WRITERS = 8  # processes, each writing to a game of its own
+NUM_WRITES = 25  # transactions per writer
+MIN_SPEEDUP = 1.2  # of every number of shards over a single shard
+
+# writes per second by number of shards
+THROUGHPUT = {}
+
+
+def create_shards(directory, num_shards):
+    urls = []
+    for shard in range(num_shards):
+        url = f"sqlite:///{directory / f'codenames-{shard}.sqlite'}"
+        alembic_config = AlembicConfig("alembic.ini")
+        alembic_config.set_main_option("sqlalchemy.url", url)
+        engine = create_shard_engine(url)
+        with engine.begin() as connection:
+            alembic_config.attributes["connection"] = connection
+            alembic_upgrade(alembic_config, "head")
+        engine.dispose()
+        urls.append(url)
+    return urls
+
+
+def open_shards(urls):
+    return GameShards.from_engines([create_shard_engine(url) for url in urls])
+
+
+def create_games(urls):
+    """Creates a started game for every writer, spread over the shards."""
+    shards = open_shards(urls)
+    manager = ShardedGameManager(shards)
+    game_ids = []
+    while len(game_ids) < NUM_WRITERS:
+        name = next_game_name()
+        # the same number of writers per shard
+        if shards.shard_of_name(name) != len(game_ids) % shards.num_shards:
+            continue
+        game_id = manager.create_random(name, "creator").id
+        backend = ShardedGameBackend(game_id, shards)
+        for session_id, color, role in PLAYERS:
+            backend.add_player(session_id, color, role, session_id)
+        backend.add_condition(Condition.BLUE_SPY)
+        backend.commit()
+        backend.close()
+        game_ids.append(game_id)
+    manager.close()
+    return game_ids
+
+
+def write_game(urls, game_id, start, results):
+    # every write is a transaction of its own, as with one request per action
+    shards = open_shards(urls)
+    start.wait()
+    started_at = time.perf_counter()
+    for i in range(NUM_WRITES):
+        backend = ShardedGameBackend(game_id, shards)
+        backend.add_hint(f"hint{i}", 1, Color.BLUE)
+        backend.add_condition(Condition.BLUE_PLAYER)
+        backend.commit()
+        backend.close()
+    results.put((started_at, time.perf_counter()))
+
+
+def write_games(urls, game_ids):
+    """Writes to all games from separate processes, so that the writers only
+    contend for the write locks of the databases, and returns the number of
+    writes per second."""
+    context = multiprocessing.get_context("fork")
+    start = context.Barrier(len(game_ids))
+    results = context.Queue()
+    writers = [
+        context.Process(target=write_game, args=(urls, game_id, start, results))
+        for game_id in game_ids
+    ]
+    for writer in writers:
+        writer.start()
+    times = [results.get() for _ in writers]
+    for writer in writers:
+        writer.join()
+    duration = max(end for _, end in times) - min(start for start, _ in times)
+    return len(game_ids) * NUM_WRITES / duration
+
+
+@pytest.mark.parametrize("num_shards", [1, 2, 4])
+def test_concurrent_writes(benchmark, tmp_path, num_shards):
+    """Writes per second of concurrent writers to 1, 2 and 4 shards.
+
+    The speedup over a single shard is only asserted with at least as many
+    CPUs as shards, otherwise it is recorded as not checked. Scaling has not
+    been demonstrated yet: so far the benchmark only ran on a single CPU,
+    where the throughput did not grow with the number of shards (e.g. 251,
+    285 and 272 writes per second for 1, 2 and 4 shards).
+    """
+    urls = create_shards(tmp_path, num_shards)
+    writes_per_second = []
+
+    def setup():
+        return (urls, create_games(urls)), {}
+
+    def run(urls, game_ids):
+        writes_per_second.append(write_games(urls, game_ids))
+
+    benchmark.pedantic(run, setup=setup, rounds=3)
+
+    THROUGHPUT[num_shards] = max(writes_per_second)
+    benchmark.extra_info["num_shards"] = num_shards
+    benchmark.extra_info["writes_per_second"] = THROUGHPUT[num_shards]
+    if num_shards > 1 and 1 in THROUGHPUT:
+        speedup = THROUGHPUT[num_shards] / THROUGHPUT[1]
+        benchmark.extra_info["speedup"] = speedup
+        # with fewer CPUs than shards, the writers are bound by the CPU rather
+        # than by the write lock of each database
+        checked = (os.cpu_count() or 1) >= num_shards
+        benchmark.extra_info["speedup_checked"] = checked
+        if checked:
+            assert speedup > MIN_SPEEDUP
@@ -0,0 +1,32 @@
+import pytest
+
+from benchmark_utils import board_manager, create_started_game, next_game_name
+
+
+@pytest.mark.parametrize("board_size", [9, 25, 100])
+def test_load_by_board_size(benchmark, db_session, board_size):
+    backend = create_started_game(db_session, board_size)
+
+    result = benchmark(backend.load)
+
+    assert len(result["words"]) == board_size
+
+
+@pytest.mark.parametrize("num_games", [1, 100, 1000])
+def test_load_by_number_of_stored_games(benchmark, db_session, num_games):
+    manager = board_manager(db_session)
+    for _ in range(num_games - 1):
+        manager.create_random(next_game_name(), "creator")
+    backend = create_started_game(db_session)
+
+    result = benchmark(backend.load)
+
+    assert len(result["words"]) == 25
+
+
+def test_create_random(benchmark, db_session):
+    manager = board_manager(db_session)
+
+    game = benchmark(lambda: manager.create_random(next_game_name(), "creator"))
+
+    assert game.id
@@ -0,0 +1,211 @@
+"""Statistics over the history of archived games.
+
+Archived games never change, so the statistics are kept as aggregates that
+are refreshed incrementally: every refresh only decodes the games archived
+since the last one and adds their counts, computed as vectorized group-bys
+over all moves and board words of the batch.
+"""
+
+from typing import Dict, Any, List, Optional
+from types import SimpleNamespace
+import logging
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+
+from codenames import models
+from codenames.archive import FINISHED_CONDITIONS, decode_columns
+from codenames.game import Color, Condition
+from codenames.replay import GUESS, HINT, infer_events
+
+LOGGER = logging.getLogger("analytics")
+
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_MIN_APPEARANCES = 5
+DEFAULT_NUM_HARDEST_WORDS = 10
+DEFAULT_MAX_AGE = 60  # second
+
+TEAMS = [Color.BLUE, Color.RED]
+WORD_COLUMNS = ["appearances", "found", "confused"]
+
+
+def _rows(columns: Dict[str, List[Any]]) -> List[SimpleNamespace]:
+    return [SimpleNamespace(**dict(zip(columns, v))) for v in zip(*columns.values())]
+
+
+def game_records(archived: models.ArchivedGame) -> Dict[str, Any]:
+    """The first team, the winner, the guesses (with the guessing team) and
+    the board of an archived game."""
+    tables = decode_columns(archived.data)
+    words = tables["active_words"]
+    colors = {i: Color(c) for i, c in zip(words["id"], words["color"])}
+    conditions = _rows(tables["conditions"])
+    events = infer_events(
+        conditions, _rows(tables["hints"]), _rows(tables["moves"]), colors
+    )
+
+    guesses = []
+    condition = Condition(conditions[0].condition)
+    for event in events:
+        if event.type == GUESS:
+            guesses.append((event.word_id, condition.color.value))
+        condition = event.condition
+    return {
+        "first_team": events[0].condition.color,
+        "winner": Condition(archived.condition).color,
+        "num_hints": sum(1 for e in events if e.type == HINT),
+        "guesses": guesses,
+        "words": words,
+    }
+
+
+class GameAnalytics:
+    def __init__(
+        self,
+        min_appearances: int = DEFAULT_MIN_APPEARANCES,
+        num_hardest_words: int = DEFAULT_NUM_HARDEST_WORDS,
+    ):
+        self._min_appearances = min_appearances
+        self._num_hardest_words = num_hardest_words
+        # games by first team (rows) and winner (columns)
+        self._wins = np.zeros((len(TEAMS), len(TEAMS)), dtype=np.int64)
+        self._num_games = 0
+        self._num_hints = 0
+        self._num_guesses = 0
+        self._num_assassins = 0
+        self._words = pd.DataFrame(columns=WORD_COLUMNS, dtype=np.int64)
+        # refreshes continue after the (archival time, id) of the latest game
+        self._archived_at = 0
+        self._last_id = 0
+        self._lock = threading.Lock()
+        self._stats: Optional[Dict[str, Any]] = None
+        self._refreshed_at = 0.0
+
+    @property
+    def num_games(self) -> int:
+        return self._num_games
+
+    def add(self, archived_games: List[models.ArchivedGame]) -> None:
+        records = [game_records(g) for g in archived_games]
+        if not records:
+            return
+
+        first = np.array([TEAMS.index(r["first_team"]) for r in records])
+        winner = np.array([TEAMS.index(r["winner"]) for r in records])
+        np.add.at(self._wins, (first, winner), 1)
+        self._num_games += len(records)
+        self._num_hints += sum(r["num_hints"] for r in records)
+
+        board = pd.DataFrame(
+            {
+                "game": np.repeat(
+                    np.arange(len(records)), [len(r["words"]["id"]) for r in records]
+                ),
+                "id": np.concatenate([r["words"]["id"] for r in records]),
+                "value": np.concatenate([r["words"]["value"] for r in records]),
+                "color": np.concatenate([r["words"]["color"] for r in records]),
+            }
+        )
+        guesses = pd.DataFrame(
+            [(i, w, c) for i, r in enumerate(records) for w, c in r["guesses"]],
+            columns=["game", "id", "team"],
+        )
+        guesses = guesses.merge(board, on=["game", "id"])
+        self._num_guesses += len(guesses)
+        self._num_assassins += int((guesses["color"] == Color.ASSASSIN.value).sum())
+
+        # team words: found by their team or confused by the other team
+        team_colors = [c.value for c in TEAMS]
+        team_words = board[board["color"].isin(team_colors)]
+        team_guesses = guesses[guesses["color"].isin(team_colors)]
+        found = team_guesses[team_guesses["color"] == team_guesses["team"]]
+        confused = team_guesses[team_guesses["color"] != team_guesses["team"]]
+        words = pd.DataFrame(
+            {
+                "appearances": team_words.groupby("value").size(),
+                "found": found.groupby("value").size(),
+                "confused": confused.groupby("value").size(),
+            }
+        )
+        self._words = self._words.add(words, fill_value=0).fillna(0).astype(np.int64)
+
+    def refresh(self, archive_db: Session, batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+        """Adds the games finished and archived since the last refresh."""
+        num_added = 0
+        while True:
+            batch = (
+                archive_db.query(models.ArchivedGame)
+                .filter(models.ArchivedGame.condition.in_(FINISHED_CONDITIONS))
+                .filter(
+                    or_(
+                        models.ArchivedGame.archived_at > self._archived_at,
+                        and_(
+                            models.ArchivedGame.archived_at == self._archived_at,
+                            models.ArchivedGame.id > self._last_id,
+                        ),
+                    )
+                )
+                .order_by(models.ArchivedGame.archived_at, models.ArchivedGame.id)
+                .limit(batch_size)
+                .all()
+            )
+            self.add(batch)
+            if batch:
+                self._archived_at, self._last_id = batch[-1].archived_at, batch[-1].id
+            num_added += len(batch)
+            if len(batch) < batch_size:
+                return num_added
+
+    def stats(self) -> Dict[str, Any]:
+        words = self._words[self._words["appearances"] >= self._min_appearances]
+        found_rate = words["found"] / words["appearances"]
+        hardest = found_rate.sort_values(kind="stable")[: self._num_hardest_words]
+
+        games_by_first_team = self._wins.sum(axis=1)
+        return {
+            "num_games": self._num_games,
+            "win_rate_by_first_team": {
+                team.name: {
+                    "games": int(games_by_first_team[i]),
+                    "win_rate": (
+                        float(self._wins[i, i] / games_by_first_team[i])
+                        if games_by_first_team[i]
+                        else None
+                    ),
+                }
+                for i, team in enumerate(TEAMS)
+            },
+            "guesses_per_hint": (
+                self._num_guesses / self._num_hints if self._num_hints else None
+            ),
+            "assassin_rate": (
+                self._num_assassins / self._num_games if self._num_games else None
+            ),
+            "hardest_words": [
+                {
+                    "word": word,
+                    "appearances": int(words.at[word, "appearances"]),
+                    "found_rate": float(rate),
+                    "confused_rate": float(
+                        words.at[word, "confused"] / words.at[word, "appearances"]
+                    ),
+                }
+                for word, rate in hardest.items()
+            ],
+        }
+
+    def cached_stats(
+        self, archive_db: Session, max_age: float = DEFAULT_MAX_AGE
+    ) -> Dict[str, Any]:
+        """The statistics, refreshed at most every `max_age` seconds."""
+        with self._lock:
+            if self._stats is None or time.monotonic() - self._refreshed_at > max_age:
+                num_added = self.refresh(archive_db)
+                LOGGER.debug(f"Added {num_added} archived games to the statistics")
+                self._stats = self.stats()
+                self._refreshed_at = time.monotonic()
+            return self._stats
@@ -1,15 +1,30 @@
-from typing import Optional, List
-import jsonpickle
-from fastapi import FastAPI, Depends, Cookie, Request, HTTPException, Form
+from typing import Optional, List, Dict, Any, Tuple
+from contextlib import contextmanager
+import logging
+import os
+import secrets
+from fastapi import (
+    FastAPI,
+    Depends,
+    Cookie,
+    Request,
+    Response,
+    HTTPException,
+    Form,
+    Header,
+    WebSocket,
+    WebSocketDisconnect,
+)
 from sqlalchemy.orm import Session
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from sse_starlette.sse import EventSourceResponse
+from starlette.concurrency import run_in_threadpool
 import asyncio
-import spacy
-import numpy as np
 
 from codenames import models, schemas
-from codenames.sql import SQLAlchemyGameManager, SQLAlchemyGameBackend
+from codenames.sql import SQLAlchemyGameBackend
+from codenames.sharding import ShardedGameBackend, ShardedGameManager
 from codenames.game import (
     Game,
     Color,
@@ -19,16 +34,84 @@ from codenames.game import (
     GameAlreadyExistsException,
     AuthorizationException,
     InvalidColorRoleCombination,
+    Seat,
     StateException,
 )
-from codenames.database import SessionLocal, engine
+from codenames.database import (
+    ArchiveSessionLocal,
+    archive_engine,
+    shard_engines,
+    shards,
+)
+from codenames.archive import load_archived_game, to_game_info
+from codenames.analytics import GameAnalytics
+from codenames.reaper import GameReaper, ReaperConfig
+from codenames.broadcast import (
+    BroadcasterRegistry,
+    StreamConfig,
+    encode_data,
+    encode_deltas,
+    operative_view,
+    KEEPALIVE_FRAME,
+)
+from codenames.broker import Broker, create_broker
+from codenames.embeddings import DEFAULT_MODEL, create_embedding_service
+from codenames.similarity import SimilarityService
+from codenames.replay import Replay, ReplayException, UndoHistory
+from codenames.tokens import (
+    DEFAULT_TOKEN_TTL,
+    InvalidTokenException,
+    SeatTokens,
+    seat_cookie,
+)
+from codenames.metrics import (
+    REGISTRY,
+    MetricsMiddleware,
+    instrument_engine,
+)
+from codenames import profiling
+from codenames.profiling import PROFILER, LoggingReporter, RingBufferReporter
 
-models.Base.metadata.create_all(bind=engine)
+for engine in shard_engines:
+    models.Base.metadata.create_all(bind=engine)
+    instrument_engine(engine)
+    profiling.instrument_engine(engine)
+models.ArchiveBase.metadata.create_all(bind=archive_engine)
 
 app = FastAPI()
 
-MESSAGE_STREAM_DELAY = 1  # second
-MESSAGE_STREAM_RETRY_TIMEOUT = 15000  # milisecond
+LOGGER = logging.getLogger("api")
+
+MESSAGE_STREAM_RESYNC_INTERVAL = 30  # second
+MESSAGE_STREAM_KEEPALIVE_INTERVAL = 5  # second
+MESSAGE_STREAM_MAX_QUEUE_SIZE = 8
+MESSAGE_STREAM_EVICTION_TIMEOUT = 30  # second
+
+STATS_MAX_AGE = float(os.environ.get("CODENAMES_STATS_MAX_AGE", "60"))  # second
+
+# games without activity for longer than the TTL are removed (0 disables it)
+REAPER_TTL = float(os.environ.get("CODENAMES_REAPER_TTL", str(24 * 60 * 60)))
+REAPER_INTERVAL = float(os.environ.get("CODENAMES_REAPER_INTERVAL", "600"))
+REAPER_ARCHIVE = os.environ.get("CODENAMES_REAPER_ARCHIVE", "0") == "1"
+
+# shared by all workers, otherwise seat tokens are only valid in the issuing one
+TOKEN_SECRET = os.environ.get("CODENAMES_TOKEN_SECRET")
+TOKEN_TTL = int(os.environ.get("CODENAMES_TOKEN_TTL", str(DEFAULT_TOKEN_TTL)))
+
+# moderators send it as a bearer token, without it moderation is disabled
+ADMIN_TOKEN = os.environ.get("CODENAMES_ADMIN_TOKEN")
+
+PROFILING_ENABLED = os.environ.get("CODENAMES_PROFILING", "0") == "1"
+PROFILING_SAMPLE_RATE = float(os.environ.get("CODENAMES_PROFILING_SAMPLE_RATE", "0"))
+PROFILING_CAPTURE = os.environ.get("CODENAMES_PROFILING_CAPTURE", "cprofile")
+
+profiling_records = RingBufferReporter(maxlen=1024)
+if PROFILING_ENABLED:
+    PROFILER.configure(
+        enabled=True, sample_rate=PROFILING_SAMPLE_RATE, capture=PROFILING_CAPTURE
+    )
+    PROFILER.add_reporter(LoggingReporter(logging.DEBUG))
+    PROFILER.add_reporter(profiling_records)
 
 # add CORS so our web page can connect to our api
 app.add_middleware(
@@ -38,29 +121,174 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware)
 
 
 def get_game_manager():
-    db = SessionLocal()
-    manager = SQLAlchemyGameManager(db)
+    manager = ShardedGameManager(shards)
     try:
         yield manager
+    finally:
+        manager.close()
+
+
+if not TOKEN_SECRET:
+    LOGGER.warning("No CODENAMES_TOKEN_SECRET, seat tokens are valid per process")
+seat_tokens = SeatTokens(
+    TOKEN_SECRET.encode() if TOKEN_SECRET else secrets.token_bytes(32), TOKEN_TTL
+)
+
+
+def get_seat_tokens():
+    return seat_tokens
+
+
+def verify_seat(
+    tokens: SeatTokens, game_id: int, token: Optional[str]
+) -> Optional[Seat]:
+    # without a valid token (e.g. issued with another secret or expired),
+    # players are authorized by their session id
+    if token is None:
+        return None
+    try:
+        return tokens.verify(token, game_id)
+    except InvalidTokenException as ex:
+        LOGGER.debug(f"Ignoring seat token: {ex.message}")
+        return None
+
+
+def get_db(game_id: int):
+    # the database of the shard of the game
+    db = shards.session(shards.shard_of(game_id))
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def get_archive_db():
+    db = ArchiveSessionLocal()
+    try:
+        yield db
     finally:
         db.close()
 
 
 def get_game_backend(game_id: int):
-    db = SessionLocal()
-    backend = SQLAlchemyGameBackend(game_id, db)
+    backend = ShardedGameBackend(game_id, shards)
     try:
         yield backend
     finally:
-        db.close()
+        backend.close()
+
+
+@contextmanager
+def open_game_backend(game_id: int):
+    backend = ShardedGameBackend(game_id, shards)
+    try:
+        yield backend
+    finally:
+        backend.close()
+
+
+def get_game_backend_opener():
+    return open_game_backend
+
+
+def get_seat(
+    game_id: int,
+    request: Request,
+    tokens: SeatTokens = Depends(get_seat_tokens),
+) -> Optional[Seat]:
+    return verify_seat(tokens, game_id, request.cookies.get(seat_cookie(game_id)))
+
+
+def load_game_info(game_id: int) -> Dict[str, Any]:
+    with open_game_backend(game_id) as backend:
+        return backend.load()
+
+
+broker = create_broker(os.environ.get("CODENAMES_BROKER_URL"))
+
+
+def get_broker():
+    return broker
+
+
+broadcasters = BroadcasterRegistry(
+    load_game_info,
+    broker,
+    StreamConfig(
+        resync_interval=MESSAGE_STREAM_RESYNC_INTERVAL,
+        keepalive_interval=MESSAGE_STREAM_KEEPALIVE_INTERVAL,
+        max_queue_size=MESSAGE_STREAM_MAX_QUEUE_SIZE,
+        eviction_timeout=MESSAGE_STREAM_EVICTION_TIMEOUT,
+    ),
+)
+
+
+def get_broadcasters():
+    return broadcasters
+
+
+REGISTRY.gauge(
+    "codenames_stream_subscribers",
+    "Number of connected SSE and WebSocket subscribers.",
+    lambda: {(): broadcasters.stats()["active_subscribers"]},
+)
+
+
+EMBEDDING_WORKERS = int(os.environ.get("CODENAMES_EMBEDDING_WORKERS", "1"))
+VECTORS_PATH = os.environ.get(
+    "CODENAMES_VECTORS_PATH", f"instance/{DEFAULT_MODEL}.vectors.npy"
+)
+
+embeddings = create_embedding_service(
+    EMBEDDING_WORKERS, DEFAULT_MODEL, VECTORS_PATH or None
+)
+
+
+def load_board(game_id: int) -> List[Tuple[int, str]]:
+    with open_game_backend(game_id) as backend:
+        return [(w.id, w.word.value) for w in backend.read_active_words()]
+
 
-nlp = spacy.load("en_vectors_floret_lg")
+similarities = SimilarityService(embeddings, load_board)
+
+
+def get_similarity_service():
+    return similarities
+
+
+reapers = [
+    GameReaper(
+        open_db,
+        ReaperConfig(ttl=REAPER_TTL, interval=REAPER_INTERVAL, archive=REAPER_ARCHIVE),
+        ArchiveSessionLocal,
+        broadcasters,
+        similarities,
+    )
+    for open_db in shards.session_factories
+]
+reaper_tasks: List[asyncio.Task] = []
+
+
+@app.on_event("startup")
+async def start_reapers():
+    if REAPER_TTL > 0:
+        reaper_tasks.extend(asyncio.create_task(r.run()) for r in reapers)
+
+
+@app.on_event("shutdown")
+def stop_reapers():
+    for task in reaper_tasks:
+        task.cancel()
+
+
+@app.on_event("shutdown")
+def close_embedding_service():
+    embeddings.close()
 
-def get_nlp():
-    return nlp
 
 @app.get("/games/{game_id}/words")
 def read_active_words(backend: SQLAlchemyGameBackend = Depends(get_game_backend)):
@@ -90,35 +318,43 @@ def read_conditions(backend: SQLAlchemyGameBackend = Depends(get_game_backend)):
     return backend.read_conditions()
 
 
+def join_with_ai_players(
+    session_id: str, backend: SQLAlchemyGameBackend, color: Color, role: Role, name: str
+) -> None:
+    ai_players = [
+        (session_id + "-ai1", color.toggle(), role, "Ng (AI)"),
+        (session_id + "-ai2", color, role.toggle(), "LeCun (AI)"),
+        (session_id + "-ai3", color.toggle(), role.toggle(), "Hinton (AI)"),
+    ]
+    Game(session_id, backend).load_state().join_with(
+        color,
+        role,
+        name,
+        [
+            {"session_id": s, "color": c, "role": r, "name": n}
+            for s, c, r, n in ai_players
+        ],
+    )
+
+
 @app.put("/games/{game_id}/join")
 def join_game(
     player: schemas.PlayerCreate,
+    response: Response,
     session_id: Optional[str] = Cookie(None),
     backend: SQLAlchemyGameBackend = Depends(get_game_backend),
+    broker: Broker = Depends(get_broker),
+    tokens: SeatTokens = Depends(get_seat_tokens),
 ):
     if session_id is None:
         raise HTTPException(status_code=401, detail="Could not determine session id")
-    current_game_state = Game(session_id, backend).load_state()
-
-    ai1_game_state = Game(session_id + "-ai1", backend).load_state()
-    ai2_game_state = Game(session_id + "-ai2", backend).load_state()
-    ai3_game_state = Game(session_id + "-ai3", backend).load_state()
-
     try:
-        current_game_state.join(
-            Color(player.color_id), Role(player.role_id), player.name
-        )
-
-        ai1_game_state.join(
-            Color(player.color_id).toggle(), Role(player.role_id), "Ng (AI)"
-        )
-
-        ai2_game_state.join(
-            Color(player.color_id), Role(player.role_id).toggle(), "LeCun (AI)"
-        )
-
-        ai3_game_state.join(
-            Color(player.color_id).toggle(), Role(player.role_id).toggle(), "Hinton (AI)"
+        join_with_ai_players(
+            session_id,
+            backend,
+            Color(player.color_id),
+            Role(player.role_id),
+            player.name,
         )
     except RoleOccupiedException as ex:
         raise HTTPException(
@@ -144,8 +380,14 @@ def join_game(
             status_code=400,
             detail="Cannot join the game (maybe the game is already running)",
         )
+    broker.publish(backend.game_id)
+    token = tokens.issue(backend.game_id, Color(player.color_id), Role(player.role_id))
+    response.set_cookie(
+        seat_cookie(backend.game_id), token, httponly=True, samesite="strict"
+    )
     return {
-        "message": f"Successfully joined the game {backend.game_id} with color {player.color_id} and role {player.role_id}."
+        "message": f"Successfully joined the game {backend.game_id} with color {player.color_id} and role {player.role_id}.",
+        "token": token,
     }
 
 
@@ -153,6 +395,7 @@ def join_game(
 def start_game(
     session_id: Optional[str] = Cookie(None),
     backend: SQLAlchemyGameBackend = Depends(get_game_backend),
+    broker: Broker = Depends(get_broker),
 ):
     if session_id is None:
         raise HTTPException(status_code=401, detail="Could not determine session id")
@@ -164,6 +407,7 @@ def start_game(
     except Exception as ex:
         raise HTTPException(status_code=400, detail="Cannot start the game")
 
+    broker.publish(backend.game_id)
     return {"message": "Successfully started the game"}
 
 
@@ -172,10 +416,12 @@ def give_hint(
     hint: schemas.HintCreate,
     session_id: Optional[str] = Cookie(None),
     backend: SQLAlchemyGameBackend = Depends(get_game_backend),
+    broker: Broker = Depends(get_broker),
+    seat: Optional[Seat] = Depends(get_seat),
 ):
-    if session_id is None:
+    if session_id is None and seat is None:
         raise HTTPException(status_code=401, detail="Could not determine session id")
-    current_game_state = Game(session_id, backend).load_state()
+    current_game_state = Game(session_id, backend, seat).load_state()
     try:
         current_game_state.give_hint(hint.word, hint.num)
     except AuthorizationException as ex:
@@ -185,6 +431,7 @@ def give_hint(
     except Exception as ex:
         raise HTTPException(status_code=400, detail="Cannot give a hint")
 
+    broker.publish(backend.game_id)
     return {
         "message": f"Successfully given the hint '{hint.word}' with num = {hint.num}"
     }
@@ -194,10 +441,12 @@ def give_hint(
 def end_turn(
     session_id: Optional[str] = Cookie(None),
     backend: SQLAlchemyGameBackend = Depends(get_game_backend),
+    broker: Broker = Depends(get_broker),
+    seat: Optional[Seat] = Depends(get_seat),
 ):
-    if session_id is None:
+    if session_id is None and seat is None:
         raise HTTPException(status_code=401, detail="Could not determine session id")
-    current_game_state = Game(session_id, backend).load_state()
+    current_game_state = Game(session_id, backend, seat).load_state()
     try:
         current_game_state.end_turn()
     except AuthorizationException as ex:
@@ -207,24 +456,22 @@ def end_turn(
     except Exception as ex:
         raise HTTPException(status_code=400, detail="Cannot end turn")
 
+    broker.publish(backend.game_id)
     return {"message": f"Successfully ended the turn"}
 
 
 @app.get("/games/{game_id}/similarity")
-def similarity(
+async def similarity(
+    game_id: int,
     hint: str,
-    backend: SQLAlchemyGameBackend = Depends(get_game_backend),
-    nlp = Depends(get_nlp)
+    response: Response,
+    session_id: Optional[str] = Cookie(None),
+    similarities: SimilarityService = Depends(get_similarity_service),
 ):
-    active_words = backend.read_active_words()
-    hint_word = nlp.vocab[hint.lower()]
-
-    ids = [w.id for w in active_words]
-    if hint == "":
-        return dict(zip(ids, [1.0] * len(ids)))
-    sim = np.array([hint_word.similarity(nlp.vocab[w.word.value.lower()]) for w in active_words])
-    norm = (sim - sim.min()) / (sim.max() - sim.min())
-    return dict(zip(ids, norm))
+    scored_hint, scores = await similarities.scores(game_id, hint, session_id)
+    # differs from the requested hint if a newer one of the session superseded it
+    response.headers["X-Hint"] = scored_hint
+    return scores
 
 
 @app.put("/games/{game_id}/guess")
@@ -232,10 +479,12 @@ def guess(
     guess: schemas.GuessCreate,
     session_id: Optional[str] = Cookie(None),
     backend: SQLAlchemyGameBackend = Depends(get_game_backend),
+    broker: Broker = Depends(get_broker),
+    seat: Optional[Seat] = Depends(get_seat),
 ):
-    if session_id is None:
+    if session_id is None and seat is None:
         raise HTTPException(status_code=401, detail="Could not determine session id")
-    current_game_state = Game(session_id, backend).load_state()
+    current_game_state = Game(session_id, backend, seat).load_state()
     try:
         current_game_state.guess(guess.word_id)
     except AuthorizationException as ex:
@@ -245,6 +494,7 @@ def guess(
     except Exception as ex:
         raise HTTPException(status_code=400, detail="Cannot give a hint")
 
+    broker.publish(backend.game_id)
     return {"message": f"Successfully guessed word '{guess.word_id}'"}
 
 
@@ -252,7 +502,7 @@ def guess(
 def create_game(
     game: schemas.GameCreate,
     session_id: Optional[str] = Cookie(None),
-    game_manager: SQLAlchemyGameManager = Depends(get_game_manager),
+    game_manager: ShardedGameManager = Depends(get_game_manager),
 ):
     try:
         result = game_manager.create_random(game.name, session_id, random_seed=66)
@@ -269,27 +519,294 @@ def create_game(
     }
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return PlainTextResponse(
+        REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+def get_profiling_records():
+    return profiling_records
+
+
+@app.get("/admin/profiling")
+def read_profiling_records(
+    name: Optional[str] = None,
+    records: RingBufferReporter = Depends(get_profiling_records),
+):
+    if not PROFILER.enabled:
+        raise HTTPException(status_code=404, detail="Profiling is disabled")
+    return [r.to_dict() for r in records.records(name)]
+
+
+def load_replay(db: Session, game_id: int) -> Replay:
+    try:
+        return Replay.load(db, game_id)
+    except ReplayException as ex:
+        raise HTTPException(status_code=404, detail=ex.message)
+
+
+@app.get("/games/{game_id}/replay")
+def read_replay(game_id: int, db: Session = Depends(get_db)):
+    replay = load_replay(db, game_id)
+    return replay.export(reveal=replay.finished)
+
+
+@app.get("/games/{game_id}/replay/state")
+def read_replay_state(
+    game_id: int,
+    step: Optional[int] = None,
+    at: Optional[int] = None,
+    db: Session = Depends(get_db),
+):
+    replay = load_replay(db, game_id)
+    try:
+        state = replay.state_at(at) if at is not None else replay.state(step)
+    except ReplayException as ex:
+        raise HTTPException(status_code=400, detail=ex.message)
+    view = state if replay.finished else operative_view(state)
+    return Response(encode_data(view), media_type="application/json")
+
+
+@app.get("/archive/games/{game_id}")
+def read_archived_game(game_id: int, archive_db: Session = Depends(get_archive_db)):
+    archived = load_archived_game(archive_db, game_id)
+    if archived is None:
+        raise HTTPException(status_code=404, detail=f"Game {game_id} is not archived")
+    return Response(
+        encode_data(
+            {"id": archived.id, "name": archived.name, **to_game_info(archived)}
+        ),
+        media_type="application/json",
+    )
+
+
+analytics = GameAnalytics()
+
+
+def get_analytics():
+    return analytics
+
+
+@app.get("/stats")
+def read_stats(
+    archive_db: Session = Depends(get_archive_db),
+    analytics: GameAnalytics = Depends(get_analytics),
+):
+    return analytics.cached_stats(archive_db, STATS_MAX_AGE)
+
+
+def get_admin_token() -> Optional[str]:
+    return ADMIN_TOKEN
+
+
+def require_moderator(
+    authorization: Optional[str] = Header(None),
+    admin_token: Optional[str] = Depends(get_admin_token),
+) -> None:
+    if not admin_token:
+        raise HTTPException(status_code=403, detail="Moderation is disabled")
+    scheme, _, credentials = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not credentials:
+        raise HTTPException(
+            status_code=401,
+            detail="Missing moderator token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    if not secrets.compare_digest(credentials.encode(), admin_token.encode()):
+        raise HTTPException(status_code=403, detail="Invalid moderator token")
+
+
+undo_history = UndoHistory()
+
+
+def get_undo_history():
+    return undo_history
+
+
+@app.put("/admin/games/{game_id}/undo", dependencies=[Depends(require_moderator)])
+def undo(
+    game_id: int,
+    db: Session = Depends(get_db),
+    history: UndoHistory = Depends(get_undo_history),
+    broker: Broker = Depends(get_broker),
+):
+    try:
+        event = history.undo(db, game_id)
+    except ReplayException as ex:
+        raise HTTPException(status_code=400, detail=ex.message)
+    broker.publish(game_id)
+    return {
+        "message": f"Successfully undid '{event.type}'",
+        "event": event.to_compact(),
+    }
+
+
+@app.put("/admin/games/{game_id}/redo", dependencies=[Depends(require_moderator)])
+def redo(
+    game_id: int,
+    db: Session = Depends(get_db),
+    history: UndoHistory = Depends(get_undo_history),
+    broker: Broker = Depends(get_broker),
+):
+    try:
+        event = history.redo(db, game_id)
+    except ReplayException as ex:
+        raise HTTPException(status_code=409, detail=ex.message)
+    broker.publish(game_id)
+    return {
+        "message": f"Successfully redid '{event.type}'",
+        "event": event.to_compact(),
+    }
+
+
 @app.get("/updates/{game_id}")
 async def message_stream(
-    request: Request, backend: SQLAlchemyGameBackend = Depends(get_game_backend)
+    game_id: int,
+    request: Request,
+    session_id: Optional[str] = Cookie(None),
+    broadcasters: BroadcasterRegistry = Depends(get_broadcasters),
 ):
-    async def get_game_info():
-        return backend.load()
+    keepalive_interval = broadcasters.config.keepalive_interval
 
     async def event_generator():
-        while True:
-            if await request.is_disconnected():
-                logger.debug("Request disconnected")
-                break
+        # idle broadcasters are removed, so look it up right before subscribing
+        broadcaster = broadcasters.get(game_id)
+        subscriber = broadcaster.subscribe(session_id)
+        try:
+            while True:
+                if await request.is_disconnected():
+                    LOGGER.debug("Request disconnected")
+                    break
+
+                try:
+                    frame = await asyncio.wait_for(subscriber.get(), keepalive_interval)
+                except asyncio.TimeoutError:
+                    yield KEEPALIVE_FRAME
+                    continue
+
+                if frame is None:
+                    LOGGER.debug("Subscriber evicted")
+                    break
+                yield frame
+        finally:
+            broadcaster.unsubscribe(subscriber)
 
-            game_info = await get_game_info()
-            yield {
-                "event": "new_message",
-                "id": "message_id",
-                "retry": MESSAGE_STREAM_RETRY_TIMEOUT,
-                "data": jsonpickle.encode(game_info, unpicklable=False),
-            }
+    return EventSourceResponse(event_generator())
 
-            await asyncio.sleep(MESSAGE_STREAM_DELAY)
 
-    return EventSourceResponse(event_generator())
+def perform_action(
+    session_id: Optional[str],
+    backend: SQLAlchemyGameBackend,
+    message: Dict[str, Any],
+    seat: Optional[Seat] = None,
+) -> Optional[Dict[str, Any]]:
+    """Applies a single socket action and returns an error event if it failed."""
+    action = message.get("action")
+    if session_id is None and (action == "join" or seat is None):
+        return {"t": "error", "status": 401, "detail": "Could not determine session id"}
+    try:
+        if action == "join":
+            player = schemas.PlayerCreate(**message)
+            join_with_ai_players(
+                session_id,
+                backend,
+                Color(player.color_id),
+                Role(player.role_id),
+                player.name,
+            )
+            return None
+
+        current_game_state = Game(session_id, backend, seat).load_state()
+        if action == "start":
+            current_game_state.start_game()
+        elif action == "hint":
+            hint = schemas.HintCreate(**message)
+            current_game_state.give_hint(hint.word, hint.num)
+        elif action == "guess":
+            current_game_state.guess(schemas.GuessCreate(**message).word_id)
+        elif action == "end_turn":
+            current_game_state.end_turn()
+        else:
+            return {"t": "error", "status": 400, "detail": f"Unknown action '{action}'"}
+    except AuthorizationException as ex:
+        return {"t": "error", "status": 401, "detail": ex.message}
+    except RoleOccupiedException:
+        return {
+            "t": "error",
+            "status": 403,
+            "detail": "This color and role is already occupied by another player",
+        }
+    except AlreadyJoinedException:
+        return {
+            "t": "error",
+            "status": 403,
+            "detail": "This user has already joined the game",
+        }
+    except InvalidColorRoleCombination:
+        return {
+            "t": "error",
+            "status": 403,
+            "detail": "Invalid color / role combination",
+        }
+    except StateException as ex:
+        return {"t": "error", "status": 403, "detail": ex.message}
+    except Exception:
+        return {"t": "error", "status": 400, "detail": f"Cannot perform '{action}'"}
+    return None
+
+
+@app.websocket("/ws/games/{game_id}")
+async def game_socket(
+    websocket: WebSocket,
+    game_id: int,
+    session_id: Optional[str] = Cookie(None),
+    open_backend=Depends(get_game_backend_opener),
+    broker: Broker = Depends(get_broker),
+    broadcasters: BroadcasterRegistry = Depends(get_broadcasters),
+    tokens: SeatTokens = Depends(get_seat_tokens),
+):
+    await websocket.accept()
+
+    seat = verify_seat(tokens, game_id, websocket.cookies.get(seat_cookie(game_id)))
+    broadcaster = broadcasters.get(game_id)
+    subscriber = broadcaster.subscribe(session_id, deltas=True)
+
+    async def send_updates():
+        while True:
+            frame = await subscriber.get()
+            if frame is None:
+                await websocket.close(code=1013)
+                return
+            await websocket.send_bytes(frame)
+
+    def apply_action(message: Dict[str, Any]):
+        # blocking database calls, run in the thread pool
+        with open_backend(game_id) as backend:
+            error = perform_action(session_id, backend, message, seat)
+            return error, None if error else backend.load()
+
+    async def receive_actions():
+        while True:
+            message = await websocket.receive_json()
+            error, game_info = await run_in_threadpool(apply_action, message)
+            if error:
+                await websocket.send_bytes(encode_deltas([error]))
+            else:
+                broadcaster.publish(game_info)
+                broker.publish(game_id)
+
+    tasks = [
+        asyncio.create_task(send_updates()),
+        asyncio.create_task(receive_actions()),
+    ]
+    try:
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for t in done:
+            if not isinstance(t.exception(), WebSocketDisconnect):
+                LOGGER.debug(f"Socket of game {game_id} closed: {t.exception()}")
+    finally:
+        for t in tasks:
+            t.cancel()
+        broadcaster.unsubscribe(subscriber)
@@ -0,0 +1,267 @@
+"""Archival of finished games.
+
+Finished games are moved out of the tables of the running games into a
+separate archive database, one row per game. The rows of all tables of a game
+are stored column by column as zlib compressed JSON, e.g. by
+
+    python -m codenames.archive --older-than-days 30
+
+Archived games can be read back as if they were loaded by a game backend.
+"""
+
+from typing import Dict, Any, List, Optional
+import argparse
+import json
+import logging
+import time
+import zlib
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from codenames import models
+from codenames.game import Color, Condition, Role, Word
+from codenames.sql import GAME_IDS
+
+LOGGER = logging.getLogger("archive")
+
+DEFAULT_MIN_AGE = 30 * 24 * 60 * 60  # second
+DEFAULT_BATCH_SIZE = 100
+
+FINISHED_CONDITIONS = [Condition.RED_WINS.value, Condition.BLUE_WINS.value]
+
+# the archived columns of each table
+COLUMNS = {
+    "active_words": ["id", "word_id", "color"],
+    "moves": ["id", "active_word_id", "selected_at"],
+    "conditions": ["id", "hint_id", "move_id", "condition", "created_at"],
+    "hints": ["id", "hint", "num", "color", "created_at"],
+    "players": ["id", "session_id", "name", "color", "role"],
+}
+MODELS = {
+    "active_words": models.ActiveWord,
+    "moves": models.Move,
+    "conditions": models.Condition,
+    "hints": models.Hint,
+    "players": models.Player,
+}
+
+
+class ArchiveConflictException(Exception):
+    def __init__(self, message: str):
+        super().__init__(message)
+        self._message = message
+
+    @property
+    def message(self):
+        return self._message
+
+
+def encode_columns(tables: Dict[str, Dict[str, List[Any]]]) -> bytes:
+    return zlib.compress(json.dumps(tables, separators=(",", ":")).encode(), 9)
+
+
+def decode_columns(data: bytes) -> Dict[str, Dict[str, List[Any]]]:
+    return json.loads(zlib.decompress(data))
+
+
+def finished_games(
+    db: Session, finished_before: int, limit: int, after: int = 0
+) -> List[Any]:
+    """The ids and final conditions of games that have been finished before
+    the given time, starting after the game id `after`."""
+    latest = (
+        db.query(func.max(models.Condition.id).label("id"))
+        .group_by(models.Condition.game_id)
+        .subquery()
+    )
+    return (
+        db.query(models.Condition)
+        .join(latest, models.Condition.id == latest.c.id)
+        .filter(models.Condition.condition.in_(FINISHED_CONDITIONS))
+        .filter(models.Condition.created_at < finished_before)
+        .filter(models.Condition.game_id > after)
+        .order_by(models.Condition.game_id)
+        .limit(limit)
+        .all()
+    )
+
+
+def archive_game(
+    db: Session, archive_db: Session, game_id: int, now: Optional[int] = None
+) -> models.ArchivedGame:
+    """Copies a game into the archive and deletes it from the database. The
+    archive is committed first, so a game is never lost but may have to be
+    archived again."""
+    game = db.query(models.Game).filter_by(id=game_id).one()
+    tables = {}
+    for table, model in MODELS.items():
+        rows = db.query(model).filter_by(game_id=game_id).order_by(model.id).all()
+        tables[table] = {c: [getattr(r, c) for r in rows] for c in COLUMNS[table]}
+    words = dict(
+        db.query(models.Word.id, models.Word.value)
+        .filter(models.Word.id.in_(tables["active_words"]["word_id"]))
+        .all()
+    )
+    tables["active_words"]["value"] = [
+        words[i] for i in tables["active_words"]["word_id"]
+    ]
+    conditions = tables["conditions"]
+    archived = models.ArchivedGame(
+        id=game.id,
+        name=game.name,
+        condition=conditions["condition"][-1],
+        finished_at=(
+            conditions["created_at"][-1]
+            if conditions["condition"][-1] in FINISHED_CONDITIONS
+            else None  # e.g. abandoned games archived by the reaper
+        ),
+        archived_at=int(time.time()) if now is None else now,
+        data=encode_columns(tables),
+    )
+    previous = archive_db.get(models.ArchivedGame, game.id)
+    if previous is not None and previous.name != game.name:
+        # an id handed out again before game ids were autoincremented
+        raise ArchiveConflictException(
+            f"Game {game.id} has been archived as '{previous.name}'"
+        )
+    archive_db.merge(archived)
+    archive_db.commit()
+
+    for model in [
+        models.Condition,
+        models.Move,
+        models.Hint,
+        models.Player,
+        models.ActiveWord,
+    ]:
+        db.query(model).filter_by(game_id=game_id).delete(synchronize_session=False)
+    db.query(models.Game).filter_by(id=game_id).delete(synchronize_session=False)
+    db.commit()
+    GAME_IDS.discard([game_id])
+    return archived
+
+
+def archive_games(
+    db: Session, archive_db: Session, game_ids: List[int], now: Optional[int] = None
+) -> List[int]:
+    """Archives the games and returns the ids of those that have been archived.
+    Games conflicting with an archived game are kept and logged."""
+    archived = []
+    for game_id in game_ids:
+        try:
+            archive_game(db, archive_db, game_id, now)
+        except ArchiveConflictException as e:
+            LOGGER.warning(f"Skipped archiving game {game_id}: {e.message}")
+            continue
+        archived.append(game_id)
+    return archived
+
+
+def archive_finished_games(
+    db: Session,
+    archive_db: Session,
+    min_age: int = DEFAULT_MIN_AGE,
+    now: Optional[int] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> int:
+    """Archives all games that have been finished for at least `min_age`
+    seconds and returns their number."""
+    now = int(time.time()) if now is None else now
+    num_archived = 0
+    last_id = 0  # skipped games are not returned again
+    while True:
+        game_ids = [
+            c.game_id for c in finished_games(db, now - min_age, batch_size, last_id)
+        ]
+        num_archived += len(archive_games(db, archive_db, game_ids, now))
+        if len(game_ids) < batch_size:
+            return num_archived
+        last_id = game_ids[-1]
+
+
+def to_game_info(archived: models.ArchivedGame) -> Dict[str, Any]:
+    """The archived game as loaded by a game backend."""
+    tables = decode_columns(archived.data)
+
+    def rows(table: str) -> List[Dict[str, Any]]:
+        columns = tables[table]
+        return [dict(zip(columns, values)) for values in zip(*columns.values())]
+
+    selected_at = {m["active_word_id"]: m["selected_at"] for m in rows("moves")}
+    return {
+        "words": {
+            w["id"]: Word(
+                id=w["id"],
+                value=w["value"],
+                color=Color(w["color"]),
+                selected_at=selected_at.get(w["id"]),
+            )
+            for w in rows("active_words")
+        },
+        "hints": [
+            {
+                "id": h["id"],
+                "word": h["hint"],
+                "num": h["num"],
+                "color": Color(h["color"]) if h["color"] else None,
+            }
+            for h in rows("hints")
+        ],
+        "conditions": [
+            {"value": Condition(c["condition"]), "hint_id": c["hint_id"]}
+            for c in rows("conditions")
+        ],
+        "players": [
+            {
+                "session_id": p["session_id"],
+                "color": Color(p["color"]),
+                "role": Role(p["role"]),
+                "name": p["name"],
+            }
+            for p in rows("players")
+        ],
+    }
+
+
+def load_archived_game(
+    archive_db: Session, game_id: Optional[int] = None, name: Optional[str] = None
+) -> Optional[models.ArchivedGame]:
+    query = archive_db.query(models.ArchivedGame)
+    if game_id is not None:
+        query = query.filter_by(id=game_id)
+    if name is not None:
+        query = query.filter_by(name=name)
+    return query.first()
+
+
+def main(args: Optional[List[str]] = None) -> None:
+    from codenames.database import ArchiveSessionLocal, archive_engine, shards
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--older-than-days", type=float, default=DEFAULT_MIN_AGE / (24 * 60 * 60)
+    )
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parsed = parser.parse_args(args)
+
+    logging.basicConfig(level=logging.INFO)
+    models.ArchiveBase.metadata.create_all(bind=archive_engine)
+    num_archived = 0
+    for open_db in shards.session_factories:
+        db, archive_db = open_db(), ArchiveSessionLocal()
+        try:
+            num_archived += archive_finished_games(
+                db,
+                archive_db,
+                int(parsed.older_than_days * 24 * 60 * 60),
+                batch_size=parsed.batch_size,
+            )
+        finally:
+            db.close()
+            archive_db.close()
+    LOGGER.info(f"Archived {num_archived} games")
+
+
+if __name__ == "__main__":
+    main()
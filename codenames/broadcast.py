@@ -0,0 +1,442 @@
+from typing import Dict, Any, List, Tuple, Optional, Callable, FrozenSet
+from dataclasses import dataclass, replace
+import asyncio
+import json
+import logging
+import time
+
+import jsonpickle
+from sse_starlette.sse import ServerSentEvent
+
+from codenames.game import Condition, Role
+from codenames.broker import Broker
+from codenames.metrics import (
+    SNAPSHOT_CACHE,
+    STREAM_DROPPED_FRAMES,
+    STREAM_EVICTED_SUBSCRIBERS,
+)
+
+LOGGER = logging.getLogger("broadcast")
+
+MESSAGE_STREAM_EVENT = "new_message"
+MESSAGE_STREAM_RETRY_TIMEOUT = 15000  # milisecond
+
+FINISHED_CONDITIONS = [Condition.RED_WINS, Condition.BLUE_WINS]
+
+
+def snapshot_version(game_info: Dict[str, Any]) -> Tuple[int, int, int, int]:
+    """Actions append to one of these collections, so their sizes label a
+    version of the game. An undo removes rows, so sizes can repeat and are not
+    used to tell whether a game has changed."""
+    return (
+        len(game_info["conditions"]),
+        len(game_info["hints"]),
+        len(game_info["players"]),
+        sum(1 for w in game_info["words"].values() if not w.is_active),
+    )
+
+
+def operative_view(game_info: Dict[str, Any]) -> Dict[str, Any]:
+    """Hides the colors of all words that have not been guessed yet."""
+    if game_info["conditions"][-1]["value"] in FINISHED_CONDITIONS:
+        return game_info
+    return {
+        **game_info,
+        "words": {
+            word_id: w if not w.is_active else replace(w, color=None)
+            for word_id, w in game_info["words"].items()
+        },
+    }
+
+
+def encode_data(game_info: Dict[str, Any]) -> str:
+    return jsonpickle.encode(game_info, unpicklable=False)
+
+
+def encode_frame(data: str, version: Tuple[int, ...]) -> bytes:
+    return ServerSentEvent(
+        data=data,
+        event=MESSAGE_STREAM_EVENT,
+        id=".".join(str(v) for v in version),
+        retry=MESSAGE_STREAM_RETRY_TIMEOUT,
+    ).encode()
+
+
+def encode_deltas(events: List[Dict[str, Any]]) -> bytes:
+    return json.dumps(events, separators=(",", ":")).encode()
+
+
+def diff_game_info(
+    old: Dict[str, Any], new: Dict[str, Any]
+) -> Optional[List[Dict[str, Any]]]:
+    """Returns the events that turn `old` into `new` or None if the change
+    cannot be expressed by appending (e.g. a player has left or an action has
+    been undone)."""
+    if (
+        new["conditions"][: len(old["conditions"])] != old["conditions"]
+        or new["hints"][: len(old["hints"])] != old["hints"]
+        or new["players"][: len(old["players"])] != old["players"]
+        or any(
+            not w.is_active and new["words"][word_id].is_active
+            for word_id, w in old["words"].items()
+        )
+    ):
+        return None
+
+    events = []
+    for p in new["players"][len(old["players"]) :]:
+        events.append(
+            {
+                "t": "player_joined",
+                "color": p["color"].value,
+                "role": p["role"].value,
+                "name": p["name"],
+            }
+        )
+    for h in new["hints"][len(old["hints"]) :]:
+        events.append(
+            {
+                "t": "hint_added",
+                "id": h["id"],
+                "word": h["word"],
+                "num": h["num"],
+                "color": h["color"].value if h["color"] else None,
+            }
+        )
+    for word_id, w in new["words"].items():
+        if not w.is_active and old["words"][word_id].is_active:
+            events.append({"t": "word_selected", "id": word_id, "color": w.color.value})
+    for c in new["conditions"][len(old["conditions"]) :]:
+        events.append(
+            {
+                "t": "condition_appended",
+                "value": c["value"].value,
+                "hint_id": c["hint_id"],
+            }
+        )
+    return events
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    version: Tuple[int, ...]
+    spymaster_data: str
+    operative_data: str
+    spymaster_frame: bytes
+    operative_frame: bytes
+    delta_frame: Optional[bytes]
+    spymaster_session_ids: FrozenSet[str]
+
+    @classmethod
+    def encode(
+        cls,
+        game_info: Dict[str, Any],
+        previous_game_info: Optional[Dict[str, Any]] = None,
+    ) -> "Snapshot":
+        version = snapshot_version(game_info)
+        spymaster_data = encode_data(game_info)
+        operative_data = encode_data(operative_view(game_info))
+        deltas = (
+            diff_game_info(previous_game_info, game_info)
+            if previous_game_info
+            else None
+        )
+        return cls(
+            version=version,
+            spymaster_data=spymaster_data,
+            operative_data=operative_data,
+            spymaster_frame=encode_frame(spymaster_data, version),
+            operative_frame=encode_frame(operative_data, version),
+            delta_frame=encode_deltas(deltas) if deltas is not None else None,
+            spymaster_session_ids=frozenset(
+                p["session_id"]
+                for p in game_info["players"]
+                if p["role"] == Role.SPYMASTER
+            ),
+        )
+
+    def frame_for(self, session_id: Optional[str]) -> bytes:
+        if session_id in self.spymaster_session_ids:
+            return self.spymaster_frame
+        return self.operative_frame
+
+    def full_delta_frame_for(self, session_id: Optional[str]) -> bytes:
+        if session_id in self.spymaster_session_ids:
+            data = self.spymaster_data
+        else:
+            data = self.operative_data
+        return b'[{"t":"snapshot","data":' + data.encode() + b"}]"
+
+    def delta_frame_for(self, session_id: Optional[str]) -> bytes:
+        if self.delta_frame is not None:
+            return self.delta_frame
+        return self.full_delta_frame_for(session_id)
+
+
+@dataclass(frozen=True)
+class StreamConfig:
+    resync_interval: float = 30  # second
+    keepalive_interval: float = 5  # second
+    max_queue_size: int = 8
+    eviction_timeout: float = 30  # second
+
+
+KEEPALIVE_FRAME = ServerSentEvent(comment="keepalive").encode()
+
+
+class Subscriber:
+    """A bounded queue of frames for a single connection.
+
+    If the client cannot keep up, all queued frames are replaced by the most
+    recent full snapshot since intermediate versions are of no use anymore.
+    """
+
+    def __init__(
+        self,
+        session_id: Optional[str],
+        deltas: bool = False,
+        max_queue_size: int = StreamConfig.max_queue_size,
+    ):
+        self._session_id = session_id
+        self._deltas = deltas
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue_size)
+        self._backlogged_since: Optional[float] = None
+        self._closed = False
+
+    @property
+    def session_id(self) -> Optional[str]:
+        return self._session_id
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def frame_of(self, snapshot: Snapshot, initial: bool = False) -> bytes:
+        if not self._deltas:
+            return snapshot.frame_for(self._session_id)
+        if initial:
+            return snapshot.full_delta_frame_for(self._session_id)
+        return snapshot.delta_frame_for(self._session_id)
+
+    def push(self, snapshot: Snapshot, initial: bool = False) -> int:
+        """Queues the frame of the snapshot and returns the number of dropped
+        frames."""
+        if self._closed:
+            return 0
+        num_dropped = 0
+        if self._queue.full():
+            if self._backlogged_since is None:
+                self._backlogged_since = time.monotonic()
+            num_dropped = self._drain()
+            initial = True
+        self._queue.put_nowait(self.frame_of(snapshot, initial))
+        return num_dropped
+
+    def is_backlogged_for(self, seconds: float) -> bool:
+        return (
+            self._backlogged_since is not None
+            and time.monotonic() - self._backlogged_since >= seconds
+        )
+
+    def close(self) -> None:
+        self._closed = True
+        self._drain()
+        self._queue.put_nowait(None)
+
+    def _drain(self) -> int:
+        num_drained = 0
+        while not self._queue.empty():
+            self._queue.get_nowait()
+            num_drained += 1
+        return num_drained
+
+    async def get(self) -> Optional[bytes]:
+        """Returns the next frame or None if the subscriber has been evicted."""
+        frame = await self._queue.get()
+        if self._queue.empty():
+            self._backlogged_since = None
+        return frame
+
+
+class GameBroadcaster:
+    """Reloads a single game whenever it is notified about a change and fans out
+    each new version to all subscribers.
+
+    Both role variants of a version are encoded exactly once, subscribers only
+    receive a reference to the matching pre-encoded frame. The game is also
+    reloaded every `resync_interval` seconds in case a notification got lost.
+    """
+
+    def __init__(
+        self,
+        game_id: int,
+        load_game_info: Callable[[int], Dict[str, Any]],
+        config: StreamConfig = StreamConfig(),
+        on_idle: Optional[Callable[["GameBroadcaster"], None]] = None,
+    ):
+        self._game_id = game_id
+        self._load_game_info = load_game_info
+        self._config = config
+        self._on_idle = on_idle
+        self._subscribers: List[Subscriber] = []
+        self._game_info: Optional[Dict[str, Any]] = None
+        self._snapshot: Optional[Snapshot] = None
+        self._task: Optional[asyncio.Task] = None
+        self._changed: Optional[asyncio.Event] = None
+        self._num_dropped_frames = 0
+        self._num_evicted_subscribers = 0
+
+    @property
+    def game_id(self) -> int:
+        return self._game_id
+
+    @property
+    def snapshot(self) -> Optional[Snapshot]:
+        return self._snapshot
+
+    @property
+    def num_subscribers(self) -> int:
+        return len(self._subscribers)
+
+    @property
+    def num_dropped_frames(self) -> int:
+        return self._num_dropped_frames
+
+    @property
+    def num_evicted_subscribers(self) -> int:
+        return self._num_evicted_subscribers
+
+    def subscribe(self, session_id: Optional[str], deltas: bool = False) -> Subscriber:
+        subscriber = Subscriber(session_id, deltas, self._config.max_queue_size)
+        self._subscribers.append(subscriber)
+        if self._snapshot:
+            SNAPSHOT_CACHE.inc(result="hit")
+            subscriber.push(self._snapshot, initial=True)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        if subscriber in self._subscribers:
+            self._subscribers.remove(subscriber)
+        if not self._subscribers:
+            self.notify()
+            if self._on_idle:
+                self._on_idle(self)
+
+    def notify(self) -> None:
+        if self._changed:
+            self._changed.set()
+
+    def close(self) -> int:
+        """Closes all subscribers, e.g. if the game is gone, and returns their
+        number."""
+        subscribers, self._subscribers = self._subscribers, []
+        for s in subscribers:
+            s.close()
+        self.notify()
+        return len(subscribers)
+
+    def publish(self, game_info: Dict[str, Any]) -> bool:
+        # compared by content, an undo and another action can restore the sizes
+        if self._snapshot and game_info == self._game_info:
+            SNAPSHOT_CACHE.inc(result="hit")
+            return False
+        SNAPSHOT_CACHE.inc(result="miss")
+        self._snapshot = Snapshot.encode(game_info, self._game_info)
+        self._game_info = game_info
+        for s in list(self._subscribers):
+            num_dropped = s.push(self._snapshot)
+            if num_dropped:
+                self._num_dropped_frames += num_dropped
+                STREAM_DROPPED_FRAMES.inc(num_dropped)
+            if s.is_backlogged_for(self._config.eviction_timeout):
+                LOGGER.info(f"Evicting backlogged subscriber of game {self._game_id}")
+                self._num_evicted_subscribers += 1
+                STREAM_EVICTED_SUBSCRIBERS.inc()
+                self.unsubscribe(s)
+                s.close()
+        return True
+
+    async def _run(self) -> None:
+        self._changed = asyncio.Event()
+        while self._subscribers:
+            self._changed.clear()
+            try:
+                self.publish(self._load_game_info(self._game_id))
+            except Exception:
+                LOGGER.exception(f"Could not load game {self._game_id}")
+            try:
+                await asyncio.wait_for(
+                    self._changed.wait(), self._config.resync_interval
+                )
+            except asyncio.TimeoutError:
+                pass
+        self._changed = None
+        self._task = None
+
+
+class BroadcasterRegistry:
+    def __init__(
+        self,
+        load_game_info: Callable[[int], Dict[str, Any]],
+        broker: Broker,
+        config: StreamConfig = StreamConfig(),
+    ):
+        self._load_game_info = load_game_info
+        self._broker = broker
+        self._config = config
+        self._broadcasters: Dict[int, GameBroadcaster] = {}
+        self._listener: Optional[asyncio.Task] = None
+        # counters of the broadcasters that have been removed
+        self._num_dropped_frames = 0
+        self._num_evicted_subscribers = 0
+
+    @property
+    def config(self) -> StreamConfig:
+        return self._config
+
+    def get(self, game_id: int) -> GameBroadcaster:
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.create_task(self._broker.listen(self.notify))
+        if game_id not in self._broadcasters:
+            self._broadcasters[game_id] = GameBroadcaster(
+                game_id, self._load_game_info, self._config, self._remove
+            )
+        return self._broadcasters[game_id]
+
+    def _remove(self, broadcaster: GameBroadcaster) -> None:
+        """Forgets a broadcaster once its last subscriber has left, a game that
+        is subscribed to again gets a new one."""
+        game_id = broadcaster.game_id
+        if self._broadcasters.get(game_id) is broadcaster:
+            del self._broadcasters[game_id]
+            self._num_dropped_frames += broadcaster.num_dropped_frames
+            self._num_evicted_subscribers += broadcaster.num_evicted_subscribers
+
+    def notify(self, game_id: int) -> None:
+        if game_id in self._broadcasters:
+            self._broadcasters[game_id].notify()
+
+    def close(self, game_id: int) -> int:
+        """Removes the broadcaster of a game and returns the number of closed
+        subscribers."""
+        broadcaster = self._broadcasters.get(game_id)
+        if broadcaster is None:
+            return 0
+        num_closed = broadcaster.close()
+        self._remove(broadcaster)
+        return num_closed
+
+    def stats(self) -> Dict[str, int]:
+        broadcasters = list(self._broadcasters.values())
+        return {
+            "active_subscribers": sum(b.num_subscribers for b in broadcasters),
+            "dropped_frames": self._num_dropped_frames
+            + sum(b.num_dropped_frames for b in broadcasters),
+            "evicted_subscribers": self._num_evicted_subscribers
+            + sum(b.num_evicted_subscribers for b in broadcasters),
+        }
+
+    def __iter__(self):
+        return iter(list(self._broadcasters.values()))
@@ -0,0 +1,106 @@
+from typing import Callable, List, Tuple, Optional
+from abc import ABC
+import asyncio
+import logging
+import threading
+
+LOGGER = logging.getLogger("broker")
+
+POSTGRES_CHANNEL = "codenames_games"
+
+
+class Broker(ABC):
+    """Notifies every listener (possibly in other processes) that a game has
+    changed. Messages only carry the game id, listeners reload the game
+    themselves."""
+
+    def publish(self, game_id: int) -> None:
+        raise NotImplementedError()
+
+    async def listen(self, on_message: Callable[[int], None]) -> None:
+        raise NotImplementedError()
+
+
+class InMemoryBroker(Broker):
+    def __init__(self):
+        self._listeners: List[
+            Tuple[asyncio.AbstractEventLoop, Callable[[int], None]]
+        ] = []
+
+    def publish(self, game_id: int) -> None:
+        # may be called from the thread pool of sync endpoints
+        for listener in list(self._listeners):
+            loop, on_message = listener
+            try:
+                loop.call_soon_threadsafe(on_message, game_id)
+            except RuntimeError:
+                # the event loop of the listener is already closed
+                if listener in self._listeners:
+                    self._listeners.remove(listener)
+
+    async def listen(self, on_message: Callable[[int], None]) -> None:
+        listener = (asyncio.get_running_loop(), on_message)
+        self._listeners.append(listener)
+        try:
+            await asyncio.Future()
+        finally:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+
+class PostgresBroker(Broker):
+    """Fans out notifications between workers and hosts via LISTEN/NOTIFY."""
+
+    def __init__(self, dsn: str, channel: str = POSTGRES_CHANNEL):
+        import psycopg2
+
+        self._psycopg2 = psycopg2
+        self._dsn = dsn
+        self._channel = channel
+        self._connection = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        connection = self._psycopg2.connect(self._dsn)
+        connection.autocommit = True
+        return connection
+
+    def publish(self, game_id: int) -> None:
+        with self._lock:
+            if self._connection is None or self._connection.closed:
+                self._connection = self._connect()
+            with self._connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT pg_notify(%s, %s)", (self._channel, str(game_id))
+                )
+
+    async def listen(self, on_message: Callable[[int], None]) -> None:
+        connection = self._connect()
+        with connection.cursor() as cursor:
+            cursor.execute(f'LISTEN "{self._channel}"')
+
+        loop = asyncio.get_running_loop()
+        readable = asyncio.Event()
+        loop.add_reader(connection.fileno(), readable.set)
+        try:
+            while True:
+                await readable.wait()
+                readable.clear()
+                connection.poll()
+                while connection.notifies:
+                    notify = connection.notifies.pop(0)
+                    try:
+                        on_message(int(notify.payload))
+                    except ValueError:
+                        LOGGER.warning(f"Ignoring notification '{notify.payload}'")
+        finally:
+            loop.remove_reader(connection.fileno())
+            connection.close()
+
+
+def create_broker(url: Optional[str] = None) -> Broker:
+    if not url or url == "memory://":
+        return InMemoryBroker()
+    if url.startswith("postgresql"):
+        return PostgresBroker(url.replace("postgresql+psycopg2://", "postgresql://"))
+    raise ValueError(f"Unsupported broker url '{url}'")
@@ -0,0 +1,288 @@
+"""Precomputed similarities between the board words and all candidate clues.
+
+The board vocabulary is fixed (`data/words.csv`), so the cosine similarity of
+every board word with every clue of the clue vocabulary is computed once by
+
+    python -m codenames.clue_index --output instance/clue_index
+
+and stored as a memory-mappable float16 matrix together with the top-k clues
+of every board word and the clues each board word rules out. The AI spymaster
+only slices the rows of the 25 words on the board at request time.
+"""
+
+from typing import Dict, List, Optional, Iterable
+import argparse
+import json
+import logging
+import os
+import time
+
+import numpy as np
+
+from codenames.embeddings import (
+    DEFAULT_MODEL,
+    WordIndex,
+    get_vectors,
+    load_model,
+    phrase_vectors,
+    read_board_words,
+    tokenize,
+)
+
+LOGGER = logging.getLogger("clue_index")
+
+DEFAULT_INDEX_PATH = os.path.join("instance", "clue_index")
+DEFAULT_TOP_K = 100
+DEFAULT_CHUNK_SIZE = 8192
+MAX_VOCAB_SIZE = 200000
+
+BOARD_WORDS_FILE = "board_words.txt"
+VOCAB_FILE = "vocab.txt"
+SIMILARITIES_FILE = "similarities.npy"
+NEIGHBOURS_FILE = "neighbours.npy"
+INVALID_FILE = "invalid.npy"
+META_FILE = "meta.json"
+
+
+def is_clue_candidate(s: str) -> bool:
+    return s.isalpha() and s.islower() and 2 < len(s) < 16
+
+
+def read_vocab(path: str) -> List[str]:
+    with open(path, "r") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def model_vocab(nlp, max_size: int = MAX_VOCAB_SIZE) -> List[str]:
+    """Lowercase alphabetic strings known to the model, e.g. as a default clue
+    vocabulary for floret models that have no vector keys.
+
+    Beyond `max_size`, the most frequent strings are kept if the model has word
+    probabilities, otherwise the ones with the largest vectors (frequent words
+    tend to have larger norms)."""
+    candidates = sorted(s for s in nlp.vocab.strings if is_clue_candidate(s))
+    if len(candidates) <= max_size:
+        return candidates
+    if nlp.vocab.lookups.has_table("lexeme_prob"):
+        probs = nlp.vocab.lookups.get_table("lexeme_prob")
+        scores = np.array([probs.get(s, -np.inf) for s in candidates])
+    else:
+        scores = np.concatenate(
+            [
+                np.linalg.norm(
+                    nlp.vocab.vectors.get_batch(candidates[i : i + DEFAULT_CHUNK_SIZE]),
+                    axis=1,
+                )
+                for i in range(0, len(candidates), DEFAULT_CHUNK_SIZE)
+            ]
+        )
+    kept = np.sort(np.argsort(-scores, kind="stable")[:max_size])
+    return [candidates[i] for i in kept]
+
+
+def _write_lines(path: str, lines: Iterable[str]) -> None:
+    with open(path, "w") as f:
+        f.writelines(f"{line}\n" for line in lines)
+
+
+def normalized(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return matrix / norms
+
+
+def top_k(similarities: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k most similar clues of every row, best first."""
+    k = min(k, similarities.shape[1])
+    candidates = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+    scores = np.take_along_axis(similarities, candidates, axis=1)
+    order = np.argsort(-scores, axis=1, kind="stable")
+    return np.take_along_axis(candidates, order, axis=1).astype(np.int32)
+
+
+SUFFIXES = [
+    ("ies", "y"),
+    ("ves", "f"),
+    ("es", ""),
+    ("s", ""),
+    ("ing", ""),
+    ("ed", ""),
+    ("er", ""),
+]
+
+
+def stem(word: str) -> str:
+    """A crude lemma (e.g. "berries" -> "berry", "spies" -> "spy"); the
+    vectors-only model has no lemmatizer."""
+    for suffix, replacement in SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) + len(replacement) >= 3:
+            return word[: -len(suffix)] + replacement
+    return word
+
+
+def _containing(text: str, starts: np.ndarray, part: str) -> List[int]:
+    """Indices of the clues that contain `part`, given all clues joined by
+    newlines in `text` and the offsets at which they start."""
+    found = []
+    position = text.find(part)
+    while position >= 0:
+        found.append(position)
+        position = text.find(part, position + 1)
+    return np.unique(np.searchsorted(starts, found, side="right") - 1).tolist()
+
+
+def invalid_clues(board_words: List[str], vocab: List[str]) -> np.ndarray:
+    """A packed bitset per board word of the clues it rules out: clues that
+    contain the word or one of its tokens, are contained in it, or share a
+    stem with one of its tokens."""
+    text = "\n".join(vocab)
+    starts = np.cumsum([0] + [len(c) + 1 for c in vocab[:-1]])
+    rows = {c: i for i, c in enumerate(vocab)}
+    by_stem: Dict[str, List[int]] = {}
+    for i, c in enumerate(vocab):
+        by_stem.setdefault(stem(c), []).append(i)
+
+    invalid = np.zeros((len(board_words), len(vocab)), dtype=bool)
+    for row, word in enumerate(board_words):
+        word = word.lower()
+        for part in dict.fromkeys([word, *tokenize(word)]):
+            invalid[row, _containing(text, starts, part)] = True
+            invalid[row, by_stem.get(stem(part), [])] = True
+            substrings = {
+                part[i:j] for i in range(len(part)) for j in range(i + 1, len(part) + 1)
+            }
+            invalid[row, [rows[s] for s in substrings if s in rows]] = True
+    return np.packbits(invalid, axis=1)
+
+
+def build(
+    output_path: str,
+    vectors,
+    board_words: List[str],
+    vocab: List[str],
+    k: int = DEFAULT_TOP_K,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    model_name: Optional[str] = None,
+) -> "ClueIndex":
+    """Computes the similarity matrix of the board words (rows) and the clue
+    vocabulary (columns) in chunks of clues and writes the index."""
+    os.makedirs(output_path, exist_ok=True)
+    board = WordIndex(vectors, board_words)
+    board_matrix = normalized(board.matrix)
+
+    similarities_path = os.path.join(output_path, SIMILARITIES_FILE)
+    similarities = np.lib.format.open_memmap(
+        similarities_path,
+        mode="w+",
+        dtype=np.float16,
+        shape=(len(board), len(vocab)),
+    )
+    for start in range(0, len(vocab), chunk_size):
+        clues = normalized(phrase_vectors(vectors, vocab[start : start + chunk_size]))
+        similarities[:, start : start + len(clues)] = board_matrix @ clues.T
+        LOGGER.info(f"Scored {start + len(clues)} / {len(vocab)} clues")
+    similarities.flush()
+
+    np.save(os.path.join(output_path, NEIGHBOURS_FILE), top_k(similarities, k))
+    np.save(os.path.join(output_path, INVALID_FILE), invalid_clues(board.words, vocab))
+    _write_lines(os.path.join(output_path, BOARD_WORDS_FILE), board.words)
+    _write_lines(os.path.join(output_path, VOCAB_FILE), vocab)
+    with open(os.path.join(output_path, META_FILE), "w") as f:
+        json.dump(
+            {
+                "model": model_name,
+                "num_board_words": len(board),
+                "vocab_size": len(vocab),
+                "k": k,
+                "created_at": int(time.time()),
+            },
+            f,
+        )
+    del similarities
+    return ClueIndex.load(output_path)
+
+
+class ClueIndex:
+    def __init__(
+        self,
+        board_words: List[str],
+        vocab: List[str],
+        similarities: np.ndarray,
+        neighbours: np.ndarray,
+        invalid: np.ndarray,
+    ):
+        self._board_words = board_words
+        self._rows = {w: i for i, w in enumerate(board_words)}
+        self._vocab = vocab
+        self._similarities = similarities
+        self._neighbours = neighbours
+        self._invalid = invalid
+
+    @classmethod
+    def load(cls, path: str) -> "ClueIndex":
+        return cls(
+            read_vocab(os.path.join(path, BOARD_WORDS_FILE)),
+            read_vocab(os.path.join(path, VOCAB_FILE)),
+            np.load(os.path.join(path, SIMILARITIES_FILE), mmap_mode="r"),
+            np.load(os.path.join(path, NEIGHBOURS_FILE), mmap_mode="r"),
+            np.load(os.path.join(path, INVALID_FILE), mmap_mode="r"),
+        )
+
+    @property
+    def vocab(self) -> List[str]:
+        return self._vocab
+
+    @property
+    def board_words(self) -> List[str]:
+        return self._board_words
+
+    def __contains__(self, word: str) -> bool:
+        return word.lower() in self._rows
+
+    def rows(self, words: List[str]) -> np.ndarray:
+        return np.array([self._rows[w.lower()] for w in words], dtype=int)
+
+    def similarities(self, words: List[str]) -> np.ndarray:
+        """The similarities of the given board words with all clues as a
+        (len(words), vocab size) float32 matrix."""
+        return np.asarray(self._similarities[self.rows(words)], dtype=np.float32)
+
+    def valid_mask(self, words: List[str]) -> np.ndarray:
+        """A boolean mask over the clue vocabulary of the clues that may be
+        given for a board with the given words."""
+        invalid = np.bitwise_or.reduce(self._invalid[self.rows(words)], axis=0)
+        return ~np.unpackbits(invalid, count=len(self._vocab)).astype(bool)
+
+    def neighbours(self, word: str) -> List[str]:
+        """The clues most similar to a board word, best first."""
+        return [self._vocab[i] for i in self._neighbours[self.rows([word])[0]]]
+
+
+def main(args: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", default=DEFAULT_INDEX_PATH)
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument(
+        "--vocab", help="file with one clue per line (default: the model's strings)"
+    )
+    parser.add_argument("--k", type=int, default=DEFAULT_TOP_K)
+    parsed = parser.parse_args(args)
+
+    logging.basicConfig(level=logging.INFO)
+    nlp = load_model(parsed.model)
+    vocab = read_vocab(parsed.vocab) if parsed.vocab else model_vocab(nlp)
+    index = build(
+        parsed.output,
+        get_vectors(),
+        read_board_words(),
+        vocab,
+        parsed.k,
+        model_name=parsed.model,
+    )
+    LOGGER.info(
+        f"Wrote {len(index.board_words)} x {len(index.vocab)} similarities to {parsed.output}"
+    )
+
+
+if __name__ == "__main__":
+    main()
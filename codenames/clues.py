@@ -0,0 +1,104 @@
+from typing import List, Optional, Tuple
+from dataclasses import dataclass
+
+import numpy as np
+
+from codenames.clue_index import ClueIndex
+from codenames.metrics import AI_LATENCY
+
+DEFAULT_MAX_NUM = 4
+DEFAULT_MARGIN = 0.05
+DEFAULT_MIN_SIMILARITY = 0.3
+
+
+@dataclass(frozen=True)
+class Clue:
+    word: str
+    num: int
+    score: float  # mean similarity to the targets
+    targets: Tuple[str, ...]
+
+
+def candidates(
+    index: ClueIndex,
+    team_words: List[str],
+    other_words: List[str],
+    max_num: int = DEFAULT_MAX_NUM,
+    margin: Optional[float] = DEFAULT_MARGIN,
+    num_candidates: int = 1,
+) -> List[Clue]:
+    """Returns the `num_candidates` best clues for every number of targets up
+    to `max_num`, best first per number.
+
+    For a given clue, the best subset of k targets is simply its k most
+    similar team words, so instead of enumerating all subsets of the team
+    words every clue of the vocabulary is scored by its sorted similarities
+    to the team words. A subset is only allowed if its weakest target is
+    more similar to the clue than any other word on the board by at least
+    `margin` (no restriction if None).
+    """
+    with AI_LATENCY.time(task="clue"):
+        team = index.similarities(team_words)
+        order = np.argsort(-team, axis=0, kind="stable")
+        sorted_team = np.take_along_axis(team, order, axis=0)
+        cumulative = np.cumsum(sorted_team, axis=0)
+        valid = index.valid_mask(team_words + other_words)
+        if other_words and margin is not None:
+            threshold = index.similarities(other_words).max(axis=0) + margin
+        else:
+            threshold = np.full(len(index.vocab), -np.inf)
+
+        clues = []
+        for k in range(1, min(max_num, len(team_words)) + 1):
+            allowed = valid & (sorted_team[k - 1] > threshold)
+            n = min(num_candidates, int(allowed.sum()))
+            if n == 0:
+                continue
+            means = np.where(allowed, cumulative[k - 1] / k, -np.inf)
+            best = np.argpartition(-means, n - 1)[:n]
+            best = best[np.argsort(-means[best], kind="stable")]
+            clues.extend(
+                Clue(
+                    word=index.vocab[c],
+                    num=k,
+                    score=float(means[c]),
+                    targets=tuple(team_words[i] for i in order[:k, c]),
+                )
+                for c in best.tolist()
+            )
+        return clues
+
+
+def search(
+    index: ClueIndex,
+    team_words: List[str],
+    other_words: List[str],
+    max_num: int = DEFAULT_MAX_NUM,
+    margin: Optional[float] = DEFAULT_MARGIN,
+) -> List[Clue]:
+    """Returns the best clue for every number of targets up to `max_num`."""
+    return candidates(index, team_words, other_words, max_num, margin)
+
+
+def choose(
+    clues: List[Clue], min_similarity: float = DEFAULT_MIN_SIMILARITY
+) -> Optional[Clue]:
+    """The clue with the most targets whose mean similarity reaches
+    `min_similarity`, or the best single-target clue."""
+    confident = [c for c in clues if c.score >= min_similarity]
+    if confident:
+        return max(confident, key=lambda c: (c.num, c.score))
+    return max(clues, key=lambda c: (-c.num, c.score)) if clues else None
+
+
+def best_clue(
+    index: ClueIndex,
+    team_words: List[str],
+    other_words: List[str],
+    max_num: int = DEFAULT_MAX_NUM,
+    margin: Optional[float] = DEFAULT_MARGIN,
+    min_similarity: float = DEFAULT_MIN_SIMILARITY,
+) -> Optional[Clue]:
+    return choose(
+        search(index, team_words, other_words, max_num, margin), min_similarity
+    )
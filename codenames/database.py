@@ -1,10 +1,29 @@
+import os
+
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 
+from codenames.sharding import GameShards, create_shard_engine, shard_urls
+
 SQLALCHEMY_DATABASE_URL = "sqlite:///instance/codenames.sqlite"
+ARCHIVE_DATABASE_URL = os.environ.get(
+    "CODENAMES_ARCHIVE_URL", "sqlite:///instance/archive.sqlite"
+)
+
+# games are spread over the shards, by default there is only one
+shard_engines = [
+    create_shard_engine(url) for url in shard_urls(SQLALCHEMY_DATABASE_URL)
+]
+shards = GameShards.from_engines(shard_engines)
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+engine = shard_engines[0]
+
+SessionLocal = shards.session_factories[0]
+
+archive_engine = create_engine(
+    ARCHIVE_DATABASE_URL, connect_args={"check_same_thread": False}
 )
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ArchiveSessionLocal = sessionmaker(
+    autocommit=False, autoflush=False, bind=archive_engine
+)
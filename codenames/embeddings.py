@@ -0,0 +1,409 @@
+from typing import List, Tuple, Optional, Callable, Any, Iterable
+from abc import ABC
+from collections import OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+import asyncio
+import csv
+import logging
+import os
+
+import numpy as np
+
+from codenames.metrics import EMBEDDING_BATCH_SIZE
+
+LOGGER = logging.getLogger("embeddings")
+
+DEFAULT_MODEL = "en_vectors_floret_lg"
+DEFAULT_BATCH_WINDOW = 0.005  # second
+DEFAULT_MAX_BATCH_SIZE = 64
+
+DEFAULT_VECTOR_CACHE_SIZE = 20000
+HASH_PROBE = "codenames"
+
+WORDS_PATH = os.path.join(os.path.dirname(__file__), "data", "words.csv")
+
+
+class SubwordVectors:
+    """Floret vectors computed in batch from hashed character n-grams.
+
+    The vector of a string is the mean of the table rows its n-grams hash to,
+    the same as `Vectors.get_batch` of spaCy in floret mode, so misspelled and
+    rare hints get meaningful vectors too. All strings of a batch are reduced
+    with a single gather over the table and computed vectors are kept in an
+    LRU cache, so the words of a board are hashed only once.
+    """
+
+    def __init__(
+        self,
+        data: np.ndarray,
+        hash_ngram: Optional[Callable[[str], List[int]]],
+        minn: int,
+        maxn: int,
+        bow: str = "<",
+        eow: str = ">",
+        cache_size: int = DEFAULT_VECTOR_CACHE_SIZE,
+        compute_batch: Optional[Callable[[List[str]], Any]] = None,
+    ):
+        if hash_ngram is None and compute_batch is None:
+            raise ValueError("Either n-gram hashes or a batch function are needed")
+        self._data = data
+        self._hash_ngram = hash_ngram
+        self._minn = minn
+        self._maxn = maxn
+        self._bow = bow
+        self._eow = eow
+        self._cache_size = cache_size
+        self._compute_batch = compute_batch
+        self._cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+
+    @classmethod
+    def from_vectors(cls, vectors, cache_size: int = DEFAULT_VECTOR_CACHE_SIZE):
+        """Shares the table and the hash settings of spaCy floret vectors.
+
+        The n-gram hashes are private to spaCy, so they are only used if they
+        reproduce the public `Vectors.get_batch`, which is used otherwise.
+        """
+        if vectors.mode != "floret":
+            raise ValueError(f"Vectors in mode '{vectors.mode}' have no subwords")
+        hash_ngram = getattr(vectors, "_get_ngram_hashes", None)
+        settings = (vectors.minn, vectors.maxn, vectors.bow, vectors.eow)
+        if hash_ngram is not None:
+            subword_vectors = cls(vectors.data, hash_ngram, *settings, cache_size)
+            probe = [HASH_PROBE]
+            try:
+                if np.allclose(
+                    subword_vectors._compute(probe), vectors.get_batch(probe), atol=1e-6
+                ):
+                    return subword_vectors
+            except Exception:
+                LOGGER.exception("Could not hash n-grams")
+            LOGGER.warning("Computing subword vectors with spaCy")
+        return cls(
+            vectors.data, None, *settings, cache_size, compute_batch=vectors.get_batch
+        )
+
+    def __contains__(self, s: str) -> bool:
+        return s in self._cache
+
+    @property
+    def num_dimensions(self) -> int:
+        return self._data.shape[1]
+
+    def ngrams(self, s: str) -> List[str]:
+        padded = self._bow + s + self._eow
+        return [padded] + [
+            padded[start : start + n]
+            for n in range(self._minn, self._maxn + 1)
+            for start in range(0, len(padded) - n + 1)
+        ]
+
+    def rows(self, s: str) -> List[int]:
+        if s == "":
+            return []
+        num_rows = self._data.shape[0]
+        return [
+            h % num_rows for ngram in self.ngrams(s) for h in self._hash_ngram(ngram)
+        ]
+
+    def _compute(self, strings: List[str]) -> np.ndarray:
+        if self._hash_ngram is None:
+            return np.asarray(self._compute_batch(strings), dtype="float32")
+        rows = [self.rows(s) for s in strings]
+        lengths = np.array([len(r) for r in rows])
+        vectors = np.zeros((len(strings), self.num_dimensions), dtype="float32")
+        non_empty = lengths > 0
+        if non_empty.any():
+            indices = np.fromiter(
+                (i for r in rows for i in r), dtype=np.int64, count=lengths.sum()
+            )
+            offsets = np.concatenate([[0], np.cumsum(lengths[non_empty])[:-1]])
+            sums = np.add.reduceat(self._data[indices], offsets, axis=0)
+            vectors[non_empty] = sums / lengths[non_empty, None]
+        return vectors
+
+    def get_batch(self, strings: List[str]) -> np.ndarray:
+        unique = list(dict.fromkeys(strings))
+        missing = [s for s in unique if s not in self._cache]
+        if missing:
+            for s, vector in zip(missing, self._compute(missing)):
+                self._cache[s] = vector
+        for s in unique:
+            self._cache.move_to_end(s)
+        result = np.stack([self._cache[s] for s in strings]) if strings else None
+        while len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+        if result is None:
+            return np.zeros((0, self.num_dimensions), dtype="float32")
+        return result
+
+
+def tokenize(phrase: str) -> List[str]:
+    return phrase.lower().replace("-", " ").split()
+
+
+def phrase_vectors(vectors, phrases: List[str]) -> np.ndarray:
+    """The mean of the token vectors of each phrase, e.g. "New York" is the
+    mean of "new" and "york" (zero for phrases without tokens)."""
+    tokens = [tokenize(p) for p in phrases]
+    unique = list(dict.fromkeys(t for ts in tokens for t in ts))
+    table = np.asarray(vectors.get_batch(unique), dtype="float32")
+    rows = {t: i for i, t in enumerate(unique)}
+    result = np.zeros((len(phrases), table.shape[1]), dtype="float32")
+    for i, ts in enumerate(tokens):
+        if len(ts) == 1:
+            result[i] = table[rows[ts[0]]]
+        elif ts:
+            result[i] = table[[rows[t] for t in ts]].mean(axis=0)
+    return result
+
+
+class WordIndex:
+    """Phrase vectors and norms of a fixed set of words (i.e. all board
+    words), computed once per process so that board words are never
+    tokenized or hashed on a request path."""
+
+    def __init__(self, vectors, words: Iterable[str]):
+        self._words = list(dict.fromkeys(w.lower() for w in words))
+        self._rows = {w: i for i, w in enumerate(self._words)}
+        self._matrix = phrase_vectors(vectors, self._words)
+        self._norms = np.linalg.norm(self._matrix, axis=1)
+
+    def __contains__(self, word: str) -> bool:
+        return word.lower() in self._rows
+
+    def __len__(self) -> int:
+        return len(self._words)
+
+    @property
+    def words(self) -> List[str]:
+        return self._words
+
+    @property
+    def matrix(self) -> np.ndarray:
+        return self._matrix
+
+    @property
+    def norms(self) -> np.ndarray:
+        return self._norms
+
+    def rows(self, words: List[str]) -> np.ndarray:
+        return np.array([self._rows[w.lower()] for w in words], dtype=int)
+
+
+def read_board_words(path: str = WORDS_PATH) -> List[str]:
+    with open(path, "r") as f:
+        return [r["word"] for r in csv.DictReader(f)]
+
+
+# the model of the current (worker) process
+_nlp = None
+_vectors = None
+_index: Optional[WordIndex] = None
+
+
+def set_model(nlp, board_words: Optional[List[str]] = None) -> None:
+    global _nlp, _vectors, _index
+    _nlp = nlp
+    if nlp is None:
+        _vectors = None
+        _index = None
+        return
+    if nlp.vocab.vectors.mode == "floret":
+        _vectors = SubwordVectors.from_vectors(nlp.vocab.vectors)
+    else:
+        _vectors = nlp.vocab.vectors
+    _index = WordIndex(_vectors, board_words if board_words is not None else [])
+
+
+def get_model():
+    if _nlp is None:
+        raise RuntimeError("No embedding model has been loaded in this process")
+    return _nlp
+
+
+def get_vectors():
+    """The vectors of the model with a `get_batch(strings)` method."""
+    get_model()
+    return _vectors
+
+
+def get_index() -> WordIndex:
+    """The precomputed vectors of the board words."""
+    get_model()
+    return _index
+
+
+def load_model(model_name: str = DEFAULT_MODEL, vectors_path: Optional[str] = None):
+    """Loads the spaCy model of this process and indexes the board words.
+
+    If `vectors_path` is given, the vector table is replaced by a memory-mapped
+    copy stored at that path (written by the first process to get there), so
+    that all workers share a single copy of the table in the page cache.
+    """
+    import spacy
+
+    nlp = spacy.load(model_name)
+    if vectors_path:
+        if not os.path.exists(vectors_path):
+            os.makedirs(os.path.dirname(vectors_path) or ".", exist_ok=True)
+            tmp_path = f"{vectors_path}.{os.getpid()}.npy"
+            np.save(tmp_path, nlp.vocab.vectors.data)
+            os.replace(tmp_path, vectors_path)
+        nlp.vocab.vectors.data = np.load(vectors_path, mmap_mode="r")
+    set_model(nlp, read_board_words())
+    return nlp
+
+
+def embed(
+    vectors, strings: List[str], index: Optional[WordIndex] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Returns the phrase vectors and their norms, taken from the index where
+    possible."""
+    indexed = np.array([index is not None and s in index for s in strings], dtype=bool)
+    missing = [s for s, i in zip(strings, indexed) if not i]
+    computed = phrase_vectors(vectors, missing)
+    matrix = np.empty((len(strings), computed.shape[1]), dtype="float32")
+    norms = np.empty(len(strings), dtype="float32")
+    matrix[~indexed] = computed
+    norms[~indexed] = np.linalg.norm(computed, axis=1)
+    if indexed.any():
+        rows = index.rows([s for s, i in zip(strings, indexed) if i])
+        matrix[indexed] = index.matrix[rows]
+        norms[indexed] = index.norms[rows]
+    return matrix, norms
+
+
+def similarities(
+    vectors, hint: str, words: List[str], index: Optional[WordIndex] = None
+) -> List[float]:
+    """Cosine similarity between the hint and each word (0.0 for words without
+    a vector)."""
+    return score_batch(vectors, [(hint, words)], index)[0]
+
+
+def score_batch(
+    vectors,
+    requests: List[Tuple[str, List[str]]],
+    index: Optional[WordIndex] = None,
+) -> List[List[float]]:
+    # a single lookup for all strings of the batch
+    strings = list(
+        dict.fromkeys(s.lower() for hint, words in requests for s in [hint, *words])
+    )
+    if not strings:
+        return [[] for _ in requests]
+    table, norms = embed(vectors, strings, index)
+    positions = {s: i for i, s in enumerate(strings)}
+
+    results = []
+    for hint, words in requests:
+        h = positions[hint.lower()]
+        w = np.array([positions[s.lower()] for s in words], dtype=int)
+        if len(w) == 0:
+            results.append([])
+            continue
+        denominator = norms[w] * norms[h]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            sim = np.where(denominator > 0, table[w] @ table[h] / denominator, 0.0)
+        results.append(sim.tolist())
+    return results
+
+
+def _score_batch_in_worker(requests: List[Tuple[str, List[str]]]) -> List[List[float]]:
+    return score_batch(get_vectors(), requests, get_index())
+
+
+class EmbeddingService(ABC):
+    """Runs embedding lookups and other CPU-bound AI computations outside of
+    the event loop."""
+
+    async def similarities(self, hint: str, words: List[str]) -> List[float]:
+        raise NotImplementedError()
+
+    async def run(self, f: Callable[..., Any], *args) -> Any:
+        """Runs a picklable module-level function in a worker. The function
+        can access the model via `get_model()`."""
+        raise NotImplementedError()
+
+    def close(self) -> None:
+        raise NotImplementedError()
+
+
+class ExecutorEmbeddingService(EmbeddingService):
+    """Dispatches to an executor whose workers have loaded the model.
+
+    Similarity requests arriving within `batch_window` seconds are scored in
+    a single call, so many concurrent requests cost one round trip to the
+    workers instead of one each.
+    """
+
+    def __init__(
+        self,
+        executor: Executor,
+        batch_window: float = DEFAULT_BATCH_WINDOW,
+        max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+    ):
+        self._executor = executor
+        self._batch_window = batch_window
+        self._max_batch_size = max_batch_size
+        self._pending: List[Tuple[str, List[str], asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+
+    async def similarities(self, hint: str, words: List[str]) -> List[float]:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((hint, words, future))
+        if len(self._pending) >= self._max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self._batch_window, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        EMBEDDING_BATCH_SIZE.observe(len(batch))
+        result = asyncio.get_running_loop().run_in_executor(
+            self._executor, _score_batch_in_worker, [(h, w) for h, w, _ in batch]
+        )
+
+        def resolve(result: asyncio.Future) -> None:
+            for i, (_, _, future) in enumerate(batch):
+                if future.done():
+                    continue
+                if result.exception() is not None:
+                    future.set_exception(result.exception())
+                else:
+                    future.set_result(result.result()[i])
+
+        result.add_done_callback(resolve)
+
+    async def run(self, f: Callable[..., Any], *args) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, f, *args
+        )
+
+    def close(self) -> None:
+        self._executor.shutdown(cancel_futures=True)
+
+
+def create_embedding_service(
+    num_workers: int = 1,
+    model_name: str = DEFAULT_MODEL,
+    vectors_path: Optional[str] = None,
+    batch_window: float = DEFAULT_BATCH_WINDOW,
+) -> EmbeddingService:
+    """Creates a service backed by `num_workers` processes or, if 0, by a
+    thread of this process. Worker processes load the model on startup."""
+    if num_workers > 0:
+        executor = ProcessPoolExecutor(
+            num_workers, initializer=load_model, initargs=(model_name, vectors_path)
+        )
+    else:
+        load_model(model_name, vectors_path)
+        executor = ThreadPoolExecutor(1, thread_name_prefix="embeddings")
+    return ExecutorEmbeddingService(executor, batch_window)
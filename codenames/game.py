@@ -5,7 +5,9 @@ from dataclasses import dataclass
 from enum import Enum
 import random
 from abc import ABC
+from functools import wraps
 
+from codenames.profiling import profile_transition
 
 LOGGER = logging.getLogger("game")
 
@@ -25,7 +27,7 @@ class Role(Enum):
     SPYMASTER = 2
 
     def toggle(self):
-        return Role.PLAYER if self == Role.SPYMASTER else Role.PLAYER
+        return Role.PLAYER if self == Role.SPYMASTER else Role.SPYMASTER
 
 
 class Condition(Enum):
@@ -80,6 +82,11 @@ class GameBackend(ABC):
     def add_player(self, session_id: str, color: Color, role: Role, name: str) -> None:
         raise NotImplementedError()
 
+    def add_players(self, players: List[Dict[str, Any]]) -> None:
+        """Adds all players at once or, if a role is occupied or a session has
+        already joined, none of them."""
+        raise NotImplementedError()
+
     def remove_player(self, session_id: str) -> None:
         raise NotImplementedError()
 
@@ -146,19 +153,32 @@ class AuthorizationException(Exception):
 
 
 def check_authorization(f):
+    @wraps(f)
     def wrapper(*args, **kwargs):
-        active_session_id = args[0].backend.get_active_session_id()
-        if active_session_id != args[0].session_id:
+        state = args[0]
+        # a verified seat is compared with the turn, sessions with the player
+        # in the active seat
+        if state.seat is not None:
+            authorized = state.seat == state.active_seat
+        else:
+            authorized = state.backend.get_active_session_id() == state.session_id
+        if not authorized:
             raise AuthorizationException("It's not your turn!")
         return f(*args, **kwargs)
 
     return wrapper
 
 
+Seat = Tuple[Color, Role]
+
+
 class GameState(ABC):
-    def __init__(self, session_id: str, backend: GameBackend):
+    def __init__(
+        self, session_id: str, backend: GameBackend, seat: Optional[Seat] = None
+    ):
         self._backend = backend
         self._session_id = session_id
+        self._seat = seat
 
     @property
     def backend(self) -> GameBackend:
@@ -168,6 +188,15 @@ class GameState(ABC):
     def session_id(self) -> str:
         return self._session_id
 
+    @property
+    def seat(self) -> Optional[Seat]:
+        """The color and role of the acting player, if verified by a token."""
+        return self._seat
+
+    @property
+    def active_seat(self) -> Seat:
+        raise NotImplementedError()
+
     def get_info(self) -> Dict[str, Any]:
         return self._backend.load()
 
@@ -177,6 +206,11 @@ class GameState(ABC):
     def join(self, color: Color, role: Role, name: str) -> None:
         raise NotImplementedError()
 
+    def join_with(
+        self, color: Color, role: Role, name: str, others: List[Dict[str, Any]]
+    ) -> None:
+        raise NotImplementedError()
+
     def guess(self, word_id: int) -> None:
         raise NotImplementedError()
 
@@ -188,9 +222,12 @@ class GameState(ABC):
 
 
 class NotStartedGameState(GameState):
-    def __init__(self, session_id: str, backend: GameBackend):
-        super().__init__(session_id, backend)
+    def __init__(
+        self, session_id: str, backend: GameBackend, seat: Optional[Seat] = None
+    ):
+        super().__init__(session_id, backend, seat)
 
+    @profile_transition
     def start_game(self) -> None:
         if self.get_info()["conditions"][-1]["value"] != Condition.NOT_STARTED:
             raise StateException("Game has already been started.")
@@ -206,45 +243,86 @@ class NotStartedGameState(GameState):
         self.backend.add_condition(Condition.BLUE_SPY)
         self.backend.commit()
 
+    @profile_transition
     def join(self, color: Color, role: Role, name: str) -> None:
-        if color not in [color.BLUE, color.RED]:
+        self._add_players([self._player(color, role, name)])
+
+    @profile_transition
+    def join_with(
+        self, color: Color, role: Role, name: str, others: List[Dict[str, Any]]
+    ) -> None:
+        """Joins together with other players (e.g. AI players), all of them or
+        none."""
+        self._add_players([self._player(color, role, name)] + others)
+
+    def _player(self, color: Color, role: Role, name: str) -> Dict[str, Any]:
+        return {
+            "session_id": self._session_id,
+            "color": color,
+            "role": role,
+            "name": name,
+        }
+
+    def _add_players(self, players: List[Dict[str, Any]]) -> None:
+        # occupied roles and repeated joins are rejected by the backend
+        if any(p["color"] not in [Color.BLUE, Color.RED] for p in players):
             raise InvalidColorRoleCombination()
-        if self.backend.is_occupied(color, role):
-            raise RoleOccupiedException()
-        if self.backend.has_joined(self._session_id):
-            raise AlreadyJoinedException()
-        self.backend.add_player(self._session_id, color, role, name)
+        self.backend.add_players(players)
         self.backend.commit()
 
+    @profile_transition
     def guess(self, word_id: int) -> None:
         raise StateException("The game has not started yet.")
 
+    @profile_transition
     def give_hint(self, word: str, num: int) -> None:
         raise StateException("The game has not started yet.")
 
+    @profile_transition
     def end_turn(self) -> None:
         raise StateException("The game has not started yet.")
 
 
 class SpyTurnGameState(GameState):
-    def __init__(self, session_id: str, backend: GameBackend, color: Color):
-        super().__init__(session_id, backend)
+    def __init__(
+        self,
+        session_id: str,
+        backend: GameBackend,
+        color: Color,
+        seat: Optional[Seat] = None,
+    ):
+        super().__init__(session_id, backend, seat)
         self._color = color
 
+    @property
+    def active_seat(self) -> Seat:
+        return self._color, Role.SPYMASTER
+
+    @profile_transition
     def start_game(self) -> None:
         raise StateException("The game has already started")
 
+    @profile_transition
     def join(self, color: Color, role: Role, name: str) -> None:
         raise StateException("The game has already started")
 
+    @profile_transition
+    def join_with(
+        self, color: Color, role: Role, name: str, others: List[Dict[str, Any]]
+    ) -> None:
+        raise StateException("The game has already started")
+
+    @profile_transition
     @check_authorization
     def guess(self, word_id: int) -> None:
         raise StateException("A spy can give hints only")
 
+    @profile_transition
     @check_authorization
     def end_turn(self) -> None:
         raise StateException("A spy must provide a hint")
 
+    @profile_transition
     @check_authorization
     def give_hint(self, word: str, num: int) -> None:
         hint_id = self.backend.add_hint(word, num, self._color)
@@ -258,10 +336,20 @@ class SpyTurnGameState(GameState):
 
 
 class PlayerTurnGameState(GameState):
-    def __init__(self, session_id: str, backend: GameBackend, color: Color):
-        super().__init__(session_id, backend)
+    def __init__(
+        self,
+        session_id: str,
+        backend: GameBackend,
+        color: Color,
+        seat: Optional[Seat] = None,
+    ):
+        super().__init__(session_id, backend, seat)
         self._color = color
 
+    @property
+    def active_seat(self) -> Seat:
+        return self._color, Role.PLAYER
+
     def _count_remaining_guesses(self, game_info) -> int:
         latest_hint = game_info["hints"][-1]
         round_conditions = []
@@ -281,16 +369,26 @@ class PlayerTurnGameState(GameState):
                     num_blue_words_left += 1
         return num_blue_words_left, num_red_words_left
 
+    @profile_transition
     def start_game(self) -> None:
         raise StateException("The game has already started")
 
+    @profile_transition
     def join(self, color: Color, role: Role, name: str) -> None:
         raise StateException("The game has already started")
 
+    @profile_transition
+    def join_with(
+        self, color: Color, role: Role, name: str, others: List[Dict[str, Any]]
+    ) -> None:
+        raise StateException("The game has already started")
+
+    @profile_transition
     @check_authorization
     def give_hint(self, word: str, num: int) -> None:
         raise StateException("A player cannot give hints")
 
+    @profile_transition
     @check_authorization
     def guess(self, word_id: int) -> None:
         game_info = self.get_info()
@@ -345,6 +443,7 @@ class PlayerTurnGameState(GameState):
 
             self.backend.commit()
 
+    @profile_transition
     @check_authorization
     def end_turn(self, do_commit: bool = True) -> None:
         game_info = self.get_info()
@@ -360,14 +459,19 @@ class PlayerTurnGameState(GameState):
 
 
 class FinishedGameState(GameState):
-    def __init__(self, session_id: str, backend: GameBackend):
-        super().__init__(session_id, backend)
+    def __init__(
+        self, session_id: str, backend: GameBackend, seat: Optional[Seat] = None
+    ):
+        super().__init__(session_id, backend, seat)
 
 
 class Game:
-    def __init__(self, session_id: str, backend: GameBackend):
+    def __init__(
+        self, session_id: str, backend: GameBackend, seat: Optional[Seat] = None
+    ):
         self._session_id = session_id
         self._backend = backend
+        self._seat = seat
 
     @property
     def id(self):
@@ -377,14 +481,22 @@ class Game:
         game_info = self._backend.load()
         condition = game_info["conditions"][-1]["value"]
         if condition == Condition.NOT_STARTED:
-            return NotStartedGameState(self._session_id, self._backend)
+            return NotStartedGameState(self._session_id, self._backend, self._seat)
         elif condition == Condition.RED_SPY:
-            return SpyTurnGameState(self._session_id, self._backend, Color.RED)
+            return SpyTurnGameState(
+                self._session_id, self._backend, Color.RED, self._seat
+            )
         elif condition == Condition.BLUE_SPY:
-            return SpyTurnGameState(self._session_id, self._backend, Color.BLUE)
+            return SpyTurnGameState(
+                self._session_id, self._backend, Color.BLUE, self._seat
+            )
         elif condition == Condition.RED_PLAYER:
-            return PlayerTurnGameState(self._session_id, self._backend, Color.RED)
+            return PlayerTurnGameState(
+                self._session_id, self._backend, Color.RED, self._seat
+            )
         elif condition == Condition.BLUE_PLAYER:
-            return PlayerTurnGameState(self._session_id, self._backend, Color.BLUE)
+            return PlayerTurnGameState(
+                self._session_id, self._backend, Color.BLUE, self._seat
+            )
         else:
             raise Exception()
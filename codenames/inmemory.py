@@ -0,0 +1,88 @@
+from typing import Dict, Any, List, Optional
+from dataclasses import replace
+from datetime import datetime
+
+from codenames.game import (
+    GameBackend,
+    Color,
+    Role,
+    Condition,
+    AlreadyJoinedException,
+    RoleOccupiedException,
+)
+
+
+class InMemoryGameBackend(GameBackend):
+    """A game backend that keeps its state in a copy of a loaded game, e.g.
+    to simulate moves with the rules of the game states without touching the
+    database. `commit` is a no-op."""
+
+    def __init__(self, game_id: int, game_info: Dict[str, Any]):
+        self._game_id = game_id
+        self._info = {
+            "words": dict(game_info["words"]),
+            "hints": [dict(h) for h in game_info["hints"]],
+            "conditions": [dict(c) for c in game_info["conditions"]],
+            "players": [dict(p) for p in game_info["players"]],
+        }
+
+    @property
+    def game_id(self) -> int:
+        return self._game_id
+
+    def copy(self) -> "InMemoryGameBackend":
+        return InMemoryGameBackend(self._game_id, self._info)
+
+    def load(self) -> Dict[str, Any]:
+        return self._info
+
+    def add_condition(
+        self, condition: Condition, hint_id: Optional[int] = None
+    ) -> None:
+        self._info["conditions"].append({"value": condition, "hint_id": hint_id})
+
+    def add_player(self, session_id: str, color: Color, role: Role, name: str) -> None:
+        self._info["players"].append(
+            {"session_id": session_id, "color": color, "role": role, "name": name}
+        )
+
+    def add_players(self, players: List[Dict[str, Any]]) -> None:
+        seated = self._info["players"] + players
+        if len({(p["color"], p["role"]) for p in seated}) < len(seated):
+            raise RoleOccupiedException()
+        if len({p["session_id"] for p in seated}) < len(seated):
+            raise AlreadyJoinedException()
+        self._info["players"] = [dict(p) for p in seated]
+
+    def remove_player(self, session_id: str) -> None:
+        self._info["players"] = [
+            p for p in self._info["players"] if p["session_id"] != session_id
+        ]
+
+    def add_guess(self, word_id: int) -> None:
+        words = self._info["words"]
+        words[word_id] = replace(words[word_id], selected_at=datetime.now())
+
+    def add_hint(self, word: str, num: int, color: Color) -> int:
+        hints = self._info["hints"]
+        hint_id = max((h["id"] for h in hints), default=0) + 1
+        hints.append({"id": hint_id, "word": word, "num": num, "color": color})
+        return hint_id
+
+    def is_occupied(self, color: Color, role: Role) -> bool:
+        return any(
+            p["color"] == color and p["role"] == role for p in self._info["players"]
+        )
+
+    def get_active_session_id(self) -> str:
+        condition = self._info["conditions"][-1]["value"]
+        for p in self._info["players"]:
+            if p["color"] == condition.color and p["role"] == condition.role:
+                return p["session_id"]
+        raise Exception("Could not determine active player (maybe there is none?)")
+
+    def has_joined(self, session_id: str) -> bool:
+        return any(p["session_id"] == session_id for p in self._info["players"])
+
+    def commit(self) -> None:
+        pass
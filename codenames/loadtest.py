@@ -0,0 +1,523 @@
+"""Load generator that plays many concurrent games over the HTTP API.
+
+Every simulated game is created via the API, gets four players (the joining
+player and the three AI players added by the backend) and is played until
+one team has won. Spectators follow each game over server-sent events and
+measure how long it takes until an action shows up in their stream.
+
+Usage:
+
+    python -m codenames.loadtest --games 20 --spectators 5
+    python -m codenames.loadtest --url http://localhost:8000 --games 50
+"""
+
+from typing import Dict, Any, List, Optional
+from dataclasses import dataclass
+import argparse
+import asyncio
+import json
+import logging
+import random
+import socket
+import time
+
+import httpx
+
+from codenames.game import Color, Role, Condition
+
+LOGGER = logging.getLogger("loadtest")
+
+STRATEGIES = ["scripted", "similarity"]
+
+FINISHED_CONDITIONS = [Condition.RED_WINS.value, Condition.BLUE_WINS.value]
+SPY_CONDITIONS = {
+    Condition.RED_SPY.value: Color.RED,
+    Condition.BLUE_SPY.value: Color.BLUE,
+}
+PLAYER_CONDITIONS = {
+    Condition.RED_PLAYER.value: Color.RED,
+    Condition.BLUE_PLAYER.value: Color.BLUE,
+}
+
+
+@dataclass
+class LoadTestConfig:
+    num_games: int = 10
+    spectators_per_game: int = 3
+    think_time: float = 0.1  # second, pause of a player between two actions
+    strategy: str = "scripted"
+    hint_size: int = 2
+    max_actions: int = 200  # per game, in case a game does not come to an end
+    seed: Optional[int] = None
+
+
+def percentile(values: List[float], p: float) -> float:
+    """Nearest-rank percentile of `values`."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * p // 100))  # ceil
+    return ordered[int(rank) - 1]
+
+
+def summarize(values: List[float]) -> Dict[str, float]:
+    return {
+        "count": len(values),
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "max": max(values) if values else 0.0,
+    }
+
+
+class LoadTestStats:
+    def __init__(self):
+        self._latencies: Dict[str, List[float]] = {}
+        self._errors: Dict[str, int] = {}
+        self._propagation_delays: List[float] = []
+        self._num_frames = 0
+        self._num_stream_errors = 0
+        self._num_finished_games = 0
+
+    def observe_request(self, endpoint: str, latency: float, ok: bool) -> None:
+        self._latencies.setdefault(endpoint, []).append(latency)
+        if not ok:
+            self._errors[endpoint] = self._errors.get(endpoint, 0) + 1
+
+    def observe_frame(self, delays: List[float]) -> None:
+        self._num_frames += 1
+        self._propagation_delays.extend(delays)
+
+    def observe_stream_error(self) -> None:
+        self._num_stream_errors += 1
+
+    def observe_finished_game(self) -> None:
+        self._num_finished_games += 1
+
+    def report(self) -> Dict[str, Any]:
+        endpoints = {}
+        for endpoint, latencies in sorted(self._latencies.items()):
+            num_errors = self._errors.get(endpoint, 0)
+            endpoints[endpoint] = {
+                **summarize(latencies),
+                "errors": num_errors,
+                "error_rate": num_errors / len(latencies),
+            }
+        num_requests = sum(len(v) for v in self._latencies.values())
+        num_errors = sum(self._errors.values())
+        return {
+            "endpoints": endpoints,
+            "propagation": summarize(self._propagation_delays),
+            "frames": self._num_frames,
+            "stream_errors": self._num_stream_errors,
+            "finished_games": self._num_finished_games,
+            "requests": num_requests,
+            "error_rate": num_errors / num_requests if num_requests else 0.0,
+        }
+
+
+class ActionLog:
+    """Send times of the actions of a game, consumed by every spectator.
+
+    An action is accounted to the first frame that arrives after the action
+    has been sent. Since a game only has one action in flight at a time,
+    this is the frame that contains the action unless frames lag behind by
+    more than the think time of the players.
+    """
+
+    def __init__(self):
+        self._sent_at: List[float] = []
+
+    def __len__(self) -> int:
+        return len(self._sent_at)
+
+    def add(self, sent_at: float) -> int:
+        self._sent_at.append(sent_at)
+        return len(self._sent_at) - 1
+
+    def discard(self, index: int) -> None:
+        # failed actions do not produce a frame
+        self._sent_at[index] = None
+
+    def delays_since(self, cursor: int, received_at: float) -> List[float]:
+        return [
+            received_at - t
+            for t in self._sent_at[cursor:]
+            if t is not None and t <= received_at
+        ]
+
+
+class Spectator:
+    def __init__(self, client: httpx.AsyncClient, game_id: int, actions: ActionLog):
+        self._client = client
+        self._game_id = game_id
+        self._actions = actions
+        self._cursor = 0
+
+    async def run(self, stats: LoadTestStats, connected: asyncio.Event) -> None:
+        try:
+            async with self._client.stream(
+                "GET", f"/updates/{self._game_id}", timeout=None
+            ) as response:
+                connected.set()
+                async for line in response.aiter_lines():
+                    # each event carries its version as id, keepalive comments don't
+                    if line.startswith("id:"):
+                        received_at = time.perf_counter()
+                        num_actions = len(self._actions)
+                        stats.observe_frame(
+                            self._actions.delays_since(self._cursor, received_at)
+                        )
+                        self._cursor = num_actions
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            LOGGER.exception(f"Stream of game {self._game_id} failed")
+            stats.observe_stream_error()
+        finally:
+            connected.set()
+
+
+class GameDriver:
+    """Plays a single game as all four players."""
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        config: LoadTestConfig,
+        stats: LoadTestStats,
+        name: str,
+        rng: random.Random,
+    ):
+        self._client = client
+        self._config = config
+        self._stats = stats
+        self._name = name
+        self._rng = rng
+        self._actions = ActionLog()
+        self._game_id: Optional[int] = None
+        self._words: Dict[int, Dict[str, Any]] = {}
+        self._hint = ""
+
+    @property
+    def game_id(self) -> Optional[int]:
+        return self._game_id
+
+    @property
+    def actions(self) -> ActionLog:
+        return self._actions
+
+    def session_id(self, color: Color, role: Role) -> str:
+        # joining as blue spymaster, the backend adds the other three players
+        # as AI players with derived session ids
+        if color == Color.BLUE and role == Role.SPYMASTER:
+            return self._name
+        if color == Color.RED and role == Role.SPYMASTER:
+            return self._name + "-ai1"
+        if color == Color.BLUE:
+            return self._name + "-ai2"
+        return self._name + "-ai3"
+
+    async def request(
+        self,
+        method: str,
+        endpoint: str,
+        session_id: Optional[str] = None,
+        is_action: bool = False,
+        **kwargs,
+    ) -> Optional[httpx.Response]:
+        url = endpoint.replace("{game_id}", str(self._game_id))
+        headers = {"Cookie": f"session_id={session_id}"} if session_id else {}
+        start = time.perf_counter()
+        action = self._actions.add(start) if is_action else None
+        try:
+            response = await self._client.request(
+                method, url, headers=headers, **kwargs
+            )
+        except httpx.HTTPError as ex:
+            LOGGER.warning(f"{method} {url} failed: {ex}")
+            response = None
+        ok = response is not None and response.status_code < 400
+        self._stats.observe_request(
+            f"{method} {endpoint}", time.perf_counter() - start, ok
+        )
+        if not ok and action is not None:
+            self._actions.discard(action)
+        return response if ok else None
+
+    async def think(self) -> None:
+        if self._config.think_time > 0:
+            await asyncio.sleep(self._rng.expovariate(1 / self._config.think_time))
+
+    async def create(self) -> bool:
+        response = await self.request(
+            "POST", "/games/", self._name, json={"name": self._name}
+        )
+        if response is None:
+            return False
+        self._game_id = response.json()["game_id"]
+        return True
+
+    async def setup(self) -> bool:
+        response = await self.request(
+            "PUT",
+            "/games/{game_id}/join",
+            self._name,
+            is_action=True,
+            json={
+                "color_id": Color.BLUE.value,
+                "role_id": Role.SPYMASTER.value,
+                "name": self._name,
+            },
+        )
+        if response is None:
+            return False
+        await self.think()
+        response = await self.request(
+            "PUT", "/games/{game_id}/start", self._name, is_action=True
+        )
+        if response is None:
+            return False
+        response = await self.request("GET", "/games/{game_id}/words", self._name)
+        if response is None:
+            return False
+        self._words = {w["id"]: w for w in response.json()}
+        return True
+
+    async def current_condition(self) -> Optional[int]:
+        response = await self.request("GET", "/games/{game_id}/conditions", self._name)
+        if response is None:
+            return None
+        return response.json()[-1]["condition"]
+
+    def active_words(self, color: Optional[Color] = None) -> List[Dict[str, Any]]:
+        return [
+            w
+            for w in self._words.values()
+            if w["is_active"] and (color is None or w["color"] == color.value)
+        ]
+
+    async def give_hint(self, color: Color) -> int:
+        own_words = self.active_words(color)
+        num = min(self._config.hint_size, len(own_words))
+        # the hint is one of the own words, so that the similarity of the
+        # intended target is high
+        word = self._rng.choice(own_words)["word"] if own_words else "pass"
+        response = await self.request(
+            "PUT",
+            "/games/{game_id}/give_hint",
+            self.session_id(color, Role.SPYMASTER),
+            is_action=True,
+            json={"word": word, "num": num},
+        )
+        self._hint = word
+        return num if response is not None else 0
+
+    async def choose_word(self, color: Color) -> Optional[int]:
+        if self._config.strategy == "similarity":
+            response = await self.request(
+                "GET",
+                "/games/{game_id}/similarity",
+                self.session_id(color, Role.PLAYER),
+                params={"hint": self._hint},
+            )
+            if response is not None:
+                scores = response.json()
+                candidates = [w["id"] for w in self.active_words()]
+                if candidates:
+                    return max(candidates, key=lambda i: scores.get(str(i), 0.0))
+        own_words = self.active_words(color)
+        if not own_words:
+            return None
+        return self._rng.choice(own_words)["id"]
+
+    async def guess(self, color: Color) -> bool:
+        word_id = await self.choose_word(color)
+        if word_id is None:
+            return False
+        response = await self.request(
+            "PUT",
+            "/games/{game_id}/guess",
+            self.session_id(color, Role.PLAYER),
+            is_action=True,
+            json={"word_id": word_id},
+        )
+        if response is None:
+            return False
+        self._words[word_id]["is_active"] = False
+        return True
+
+    async def end_turn(self, color: Color) -> None:
+        await self.request(
+            "PUT",
+            "/games/{game_id}/end_turn",
+            self.session_id(color, Role.PLAYER),
+            is_action=True,
+        )
+
+    async def play(self) -> bool:
+        """Plays the game until it is finished and returns whether it was."""
+        num_guesses_left = 0
+        for _ in range(self._config.max_actions):
+            await self.think()
+            condition = await self.current_condition()
+            if condition is None:
+                return False
+            if condition in FINISHED_CONDITIONS:
+                return True
+            if condition in SPY_CONDITIONS:
+                num_guesses_left = await self.give_hint(SPY_CONDITIONS[condition])
+            elif condition in PLAYER_CONDITIONS:
+                color = PLAYER_CONDITIONS[condition]
+                if num_guesses_left > 0 and await self.guess(color):
+                    num_guesses_left -= 1
+                else:
+                    await self.end_turn(color)
+        return False
+
+
+async def run_game(
+    client: httpx.AsyncClient,
+    config: LoadTestConfig,
+    stats: LoadTestStats,
+    name: str,
+    rng: random.Random,
+) -> None:
+    driver = GameDriver(client, config, stats, name, rng)
+    if not await driver.create():
+        return
+
+    spectators = []
+    for _ in range(config.spectators_per_game):
+        connected = asyncio.Event()
+        spectator = Spectator(client, driver.game_id, driver.actions)
+        spectators.append(asyncio.create_task(spectator.run(stats, connected)))
+        await connected.wait()
+
+    try:
+        if await driver.setup() and await driver.play():
+            stats.observe_finished_game()
+        # give the spectators the chance to receive the last frame
+        await asyncio.sleep(max(config.think_time, 0.1))
+    finally:
+        for s in spectators:
+            s.cancel()
+        await asyncio.gather(*spectators, return_exceptions=True)
+
+
+async def run_load_test(base_url: str, config: LoadTestConfig) -> Dict[str, Any]:
+    if config.strategy not in STRATEGIES:
+        raise ValueError(f"Unknown strategy '{config.strategy}'")
+    stats = LoadTestStats()
+    rng = random.Random(config.seed)
+    prefix = f"loadtest-{int(time.time())}-{rng.randrange(10**6)}"
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    start = time.perf_counter()
+    async with httpx.AsyncClient(
+        base_url=base_url, limits=limits, timeout=30
+    ) as client:
+        await asyncio.gather(
+            *[
+                run_game(
+                    client, config, stats, f"{prefix}-{i}", random.Random(rng.random())
+                )
+                for i in range(config.num_games)
+            ]
+        )
+    report = stats.report()
+    report["duration"] = time.perf_counter() - start
+    return report
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def run_in_process(config: LoadTestConfig) -> Dict[str, Any]:
+    """Serves the app from this process (on a random local port) while the
+    load test is running."""
+    import uvicorn
+
+    port = _free_port()
+    server = uvicorn.Server(
+        uvicorn.Config("codenames.api:app", port=port, log_level="warning")
+    )
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        if serving.done():
+            serving.result()  # raises the startup error
+        await asyncio.sleep(0.05)
+    try:
+        return await run_load_test(f"http://127.0.0.1:{port}", config)
+    finally:
+        server.should_exit = True
+        await serving
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    lines = [
+        f"{'endpoint':<40} {'count':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}"
+    ]
+    rows = list(report["endpoints"].items()) + [
+        (
+            "event propagation",
+            {**report["propagation"], "errors": report["stream_errors"]},
+        )
+    ]
+    for name, s in rows:
+        lines.append(
+            f"{name:<40} {s['count']:>7} {s['p50'] * 1000:>8.1f} "
+            f"{s['p95'] * 1000:>8.1f} {s['p99'] * 1000:>8.1f} {s['errors']:>7}"
+        )
+    lines.append(
+        f"{report['requests']} requests, error rate {report['error_rate']:.2%}, "
+        f"{report['frames']} frames, {report['finished_games']} finished games "
+        f"in {report['duration']:.1f}s"
+    )
+    return "\n".join(lines)
+
+
+def main(args: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--url", help="base url of a running backend (default: serve in-process)"
+    )
+    parser.add_argument("--games", type=int, default=LoadTestConfig.num_games)
+    parser.add_argument(
+        "--spectators", type=int, default=LoadTestConfig.spectators_per_game
+    )
+    parser.add_argument(
+        "--think-time",
+        type=float,
+        default=LoadTestConfig.think_time,
+        help="mean pause of a player between two actions in seconds",
+    )
+    parser.add_argument(
+        "--strategy", choices=STRATEGIES, default=LoadTestConfig.strategy
+    )
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--json", help="write the report to this file")
+    parsed = parser.parse_args(args)
+
+    config = LoadTestConfig(
+        num_games=parsed.games,
+        spectators_per_game=parsed.spectators,
+        think_time=parsed.think_time,
+        strategy=parsed.strategy,
+        seed=parsed.seed,
+    )
+    if parsed.url:
+        report = asyncio.run(run_load_test(parsed.url, config))
+    else:
+        report = asyncio.run(run_in_process(config))
+
+    print(format_report(report))
+    if parsed.json:
+        with open(parsed.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
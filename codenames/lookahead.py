@@ -0,0 +1,197 @@
+"""Monte Carlo lookahead for the AI spymaster.
+
+A greedy clue ignores what happens next. Here every candidate clue is played
+out on in-memory copies of the game with the rules of the game states: the
+guessers pick words with a probability that grows with their similarity to
+the clue, then the opponent gives its own greedy clue and guesses likewise.
+The candidate with the best mean outcome within the time budget wins.
+"""
+
+from typing import Dict, Any, List, Optional
+from dataclasses import dataclass
+import logging
+import time
+
+import numpy as np
+
+from codenames.clue_index import ClueIndex
+from codenames.clues import (
+    Clue,
+    DEFAULT_MARGIN,
+    DEFAULT_MAX_NUM,
+    DEFAULT_MIN_SIMILARITY,
+    candidates,
+    choose,
+)
+from codenames.game import Color, Condition, Game, StateException
+from codenames.inmemory import InMemoryGameBackend
+from codenames.metrics import AI_LATENCY
+
+LOGGER = logging.getLogger("lookahead")
+
+SPY_CONDITIONS = {Condition.BLUE_SPY: Color.BLUE, Condition.RED_SPY: Color.RED}
+WIN_CONDITIONS = {Condition.BLUE_WINS: Color.BLUE, Condition.RED_WINS: Color.RED}
+
+
+@dataclass
+class LookaheadConfig:
+    time_budget: float = 0.2  # second
+    num_candidates: int = 8  # per number of targets
+    num_opponent_candidates: int = 4  # per number of targets
+    max_num: int = DEFAULT_MAX_NUM
+    margin: Optional[float] = DEFAULT_MARGIN
+    min_similarity: float = DEFAULT_MIN_SIMILARITY
+    temperature: float = 0.05  # of the simulated guessers
+    win_value: float = 10.0
+    seed: Optional[int] = None
+
+
+@dataclass(frozen=True)
+class Evaluation:
+    clue: Clue
+    value: float  # mean of own minus opponent's revealed words
+    num_rollouts: int
+
+
+def _condition(backend: InMemoryGameBackend) -> Condition:
+    return backend.load()["conditions"][-1]["value"]
+
+
+def _words_left(backend: InMemoryGameBackend, color: Color) -> int:
+    return sum(
+        1 for w in backend.load()["words"].values() if w.is_active and w.color == color
+    )
+
+
+def play_turn(backend: InMemoryGameBackend, clue: Clue, guesses: List[int]) -> None:
+    """Gives the clue as the active spymaster and guesses the words in the
+    given order until the turn is over or `clue.num` words have been
+    guessed."""
+    spy = Game(backend.get_active_session_id(), backend)
+    spy.load_state().give_hint(clue.word, clue.num)
+    turn = _condition(backend)
+    player = Game(backend.get_active_session_id(), backend)
+    num_guesses = 0
+    for word_id in guesses:
+        if num_guesses == clue.num or _condition(backend) != turn:
+            break
+        if backend.load()["words"][word_id].is_active:
+            player.load_state().guess(word_id)
+            num_guesses += 1
+    if _condition(backend) == turn:
+        player.load_state().end_turn()
+
+
+class MonteCarloSpymaster:
+    def __init__(self, index: ClueIndex, config: Optional[LookaheadConfig] = None):
+        self._index = index
+        self._config = config or LookaheadConfig()
+        self._rng = np.random.default_rng(self._config.seed)
+
+    def give_clue(self, game_id: int, game_info: Dict[str, Any]) -> Optional[Clue]:
+        evaluations = self.evaluate(game_id, game_info)
+        return evaluations[0].clue if evaluations else None
+
+    def _candidates(self, words: Dict[int, Any], color: Color, num: int):
+        team = [w.value for w in words.values() if w.color == color]
+        others = [w.value for w in words.values() if w.color != color]
+        return candidates(
+            self._index, team, others, self._config.max_num, self._config.margin, num
+        )
+
+    def _guesses(self, similarities: np.ndarray, word_ids: np.ndarray) -> np.ndarray:
+        """Samples the order in which guessers pick the words for every row of
+        clue-word similarities (Gumbel-max trick)."""
+        noise = self._rng.gumbel(size=similarities.shape)
+        scores = similarities / self._config.temperature + noise
+        return word_ids[np.argsort(-scores, axis=-1)]
+
+    def evaluate(self, game_id: int, game_info: Dict[str, Any]) -> List[Evaluation]:
+        """Evaluates the candidate clues of the spymaster whose turn it is,
+        best first. Every candidate is played out at least once, further
+        rollouts are run as long as the time budget allows."""
+        condition = game_info["conditions"][-1]["value"]
+        if condition not in SPY_CONDITIONS:
+            raise StateException("It's not the turn of a spymaster")
+        color = SPY_CONDITIONS[condition]
+        opponent = color.toggle()
+
+        start = time.perf_counter()
+        with AI_LATENCY.time(task="lookahead"):
+            words = {i: w for i, w in game_info["words"].items() if w.is_active}
+            clues = self._candidates(words, color, self._config.num_candidates)
+            if not clues:
+                return []
+            opponent_clues = self._candidates(
+                words, opponent, self._config.num_opponent_candidates
+            )
+
+            word_ids = np.array(list(words))
+            values = [w.value for w in words.values()]
+            board = self._index.similarities(values)
+            columns = {c: i for i, c in enumerate(self._index.vocab)}
+            similarities = board[:, [columns[c.word] for c in clues]].T
+            opponent_similarities = {
+                c.word: board[:, columns[c.word]] for c in opponent_clues
+            }
+
+            initial = InMemoryGameBackend(game_id, game_info)
+            totals = np.zeros(len(clues))
+            num_rollouts = 0
+            while num_rollouts == 0 or (
+                time.perf_counter() - start < self._config.time_budget
+            ):
+                # one rollout of every candidate, sampled at once
+                guesses = self._guesses(similarities, word_ids)
+                for i, clue in enumerate(clues):
+                    totals[i] += self._rollout(
+                        initial.copy(),
+                        color,
+                        clue,
+                        guesses[i],
+                        opponent_clues,
+                        opponent_similarities,
+                        word_ids,
+                    )
+                num_rollouts += 1
+
+        evaluations = [
+            Evaluation(clue, float(total / num_rollouts), num_rollouts)
+            for clue, total in zip(clues, totals)
+        ]
+        LOGGER.debug(f"Ran {num_rollouts} rollouts of {len(clues)} clues")
+        return sorted(evaluations, key=lambda e: (-e.value, -e.clue.score))
+
+    def _rollout(
+        self,
+        backend: InMemoryGameBackend,
+        color: Color,
+        clue: Clue,
+        guesses: np.ndarray,
+        opponent_clues: List[Clue],
+        opponent_similarities: Dict[str, np.ndarray],
+        word_ids: np.ndarray,
+    ) -> float:
+        opponent = color.toggle()
+        before = _words_left(backend, color), _words_left(backend, opponent)
+
+        play_turn(backend, clue, guesses.tolist())
+        if _condition(backend) in SPY_CONDITIONS:
+            words = backend.load()["words"]
+            active = {w.value for w in words.values() if w.is_active}
+            opponent_clue = choose(
+                [c for c in opponent_clues if active.issuperset(c.targets)],
+                self._config.min_similarity,
+            )
+            if opponent_clue is not None:
+                order = self._guesses(
+                    opponent_similarities[opponent_clue.word], word_ids
+                )
+                play_turn(backend, opponent_clue, order.tolist())
+
+        winner = WIN_CONDITIONS.get(_condition(backend))
+        if winner is not None:
+            return self._config.win_value * (1 if winner == color else -1)
+        own = before[0] - _words_left(backend, color)
+        other = before[1] - _words_left(backend, opponent)
+        return float(own - other)
@@ -0,0 +1,331 @@
+from typing import Dict, List, Tuple, Optional, Callable, Sequence
+from contextlib import contextmanager
+from contextvars import ContextVar
+from bisect import bisect_left
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labelnames: Sequence[str], values: Sequence[str]) -> str:
+    if not labelnames:
+        return ""
+    pairs = ",".join(f'{n}="{_escape(str(v))}"' for n, v in zip(labelnames, values))
+    return "{" + pairs + "}"
+
+
+class Metric:
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self._name = name
+        self._documentation = documentation
+        self._labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels[n]) for n in self._labelnames)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError()
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self._name} {self._documentation}",
+            f"# TYPE {self._name} {self.type_name}",
+        ]
+        return "\n".join(lines + self.samples())
+
+
+class Counter(Metric):
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return [
+            f"{self._name}{_format_labels(self._labelnames, k)} {v}" for k, v in values
+        ]
+
+
+class Gauge(Metric):
+    """A gauge whose value is computed on every scrape."""
+
+    type_name = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        collect: Callable[[], Dict[Tuple[str, ...], float]],
+        labelnames: Sequence[str] = (),
+    ):
+        super().__init__(name, documentation, labelnames)
+        self._collect = collect
+
+    def samples(self) -> List[str]:
+        return [
+            f"{self._name}{_format_labels(self._labelnames, k)} {v}"
+            for k, v in self._collect().items()
+        ]
+
+
+class Histogram(Metric):
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self._buckets = tuple(sorted(buckets))
+        # per label set: bucket counts (non-cumulative, last one is +Inf), sum
+        self._values: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect_left(self._buckets, value)
+        with self._lock:
+            if key not in self._values:
+                self._values[key] = ([0] * (len(self._buckets) + 1), [0.0])
+            counts, total = self._values[key]
+            counts[index] += 1
+            total[0] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels) -> int:
+        values = self._values.get(self._key(labels))
+        return sum(values[0]) if values else 0
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = [(k, list(c), t[0]) for k, (c, t) in self._values.items()]
+        lines = []
+        labelnames = self._labelnames + ("le",)
+        for key, counts, total in values:
+            cumulative = 0
+            for bound, count in zip(self._buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(
+                    f"{self._name}_bucket{_format_labels(labelnames, key + (le,))} {cumulative}"
+                )
+            labels = _format_labels(self._labelnames, key)
+            lines.append(f"{self._name}_sum{labels} {total}")
+            lines.append(f"{self._name}_count{labels} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric '{metric.name}' is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def unregister(self, name: str) -> None:
+        self._metrics.pop(name, None)
+
+    def counter(
+        self, name: str, documentation: str, labelnames: Sequence[str] = ()
+    ) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge(
+        self,
+        name: str,
+        documentation: str,
+        collect: Callable[[], Dict[Tuple[str, ...], float]],
+        labelnames: Sequence[str] = (),
+    ) -> Gauge:
+        return self.register(Gauge(name, documentation, collect, labelnames))
+
+    def render(self) -> str:
+        return "\n".join(m.render() for m in self._metrics.values()) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+REQUEST_LATENCY = REGISTRY.histogram(
+    "codenames_http_request_duration_seconds",
+    "Time until the response headers are sent.",
+    ["method", "route", "status"],
+)
+REQUEST_DB_STATEMENTS = REGISTRY.histogram(
+    "codenames_http_request_db_statements",
+    "Number of SQL statements executed per request.",
+    ["method", "route"],
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100),
+)
+DB_STATEMENTS = REGISTRY.counter(
+    "codenames_db_statements_total", "Number of executed SQL statements.", ["verb"]
+)
+DB_STATEMENT_LATENCY = REGISTRY.histogram(
+    "codenames_db_statement_duration_seconds",
+    "Execution time of SQL statements.",
+    ["verb"],
+)
+GAME_LOAD_LATENCY = REGISTRY.histogram(
+    "codenames_game_load_duration_seconds", "Time to load the state of a game."
+)
+SNAPSHOT_CACHE = REGISTRY.counter(
+    "codenames_snapshot_cache_total",
+    "Snapshot lookups of the game broadcasters by result (hit or miss).",
+    ["result"],
+)
+EMBEDDING_LATENCY = REGISTRY.histogram(
+    "codenames_embedding_duration_seconds",
+    "Time to score the active words of a game against a hint.",
+)
+SIMILARITY_CACHE = REGISTRY.counter(
+    "codenames_similarity_cache_total",
+    "Similarity queries by result (hit, miss or coalesced with another query).",
+    ["result"],
+)
+EMBEDDING_BATCH_SIZE = REGISTRY.histogram(
+    "codenames_embedding_batch_size",
+    "Number of similarity requests scored together by an embedding worker.",
+    buckets=(1, 2, 4, 8, 16, 32, 64),
+)
+STREAM_DROPPED_FRAMES = REGISTRY.counter(
+    "codenames_stream_dropped_frames_total",
+    "Frames dropped because a subscriber could not keep up.",
+)
+STREAM_EVICTED_SUBSCRIBERS = REGISTRY.counter(
+    "codenames_stream_evicted_subscribers_total",
+    "Subscribers closed because they stayed backlogged.",
+)
+REAPED_GAMES = REGISTRY.counter(
+    "codenames_reaped_games_total",
+    "Inactive games removed by the reaper.",
+    ["action"],
+)
+REAPED_SUBSCRIBERS = REGISTRY.counter(
+    "codenames_reaped_subscribers_total",
+    "Stream subscribers closed because their game has been reaped.",
+)
+AI_LATENCY = REGISTRY.histogram(
+    "codenames_ai_duration_seconds",
+    "Time of the AI players to come up with a move.",
+    ["task"],
+)
+
+
+class RequestStats:
+    def __init__(self):
+        self.num_statements = 0
+
+
+_request_stats: ContextVar[Optional[RequestStats]] = ContextVar(
+    "request_stats", default=None
+)
+
+
+def _statement_verb(statement: str) -> str:
+    verb = statement.lstrip().split(None, 1)[0] if statement.strip() else ""
+    return verb.upper()
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Counts and times all statements executed by the engine."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, many):
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, many):
+        start = conn.info["query_start_time"].pop()
+        verb = _statement_verb(statement)
+        DB_STATEMENTS.inc(verb=verb)
+        DB_STATEMENT_LATENCY.observe(time.perf_counter() - start, verb=verb)
+        stats = _request_stats.get()
+        if stats is not None:
+            stats.num_statements += 1
+
+
+class MetricsMiddleware:
+    """Records the latency and the number of SQL statements per route."""
+
+    def __init__(self, app):
+        self._app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self._app(scope, receive, send)
+
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        start = time.perf_counter()
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                REQUEST_LATENCY.observe(
+                    time.perf_counter() - start,
+                    method=scope["method"],
+                    route=_route_of(scope),
+                    status=status[0],
+                )
+            await send(message)
+
+        try:
+            await self._app(scope, receive, send_wrapper)
+        finally:
+            _request_stats.reset(token)
+            REQUEST_DB_STATEMENTS.observe(
+                stats.num_statements, method=scope["method"], route=_route_of(scope)
+            )
+
+
+def _route_of(scope) -> str:
+    route = scope.get("route")
+    # use the path template to keep the number of label values bounded
+    return route.path if route is not None else "unmatched"
@@ -1,4 +1,12 @@
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String
+from sqlalchemy import (
+    Boolean,
+    Column,
+    ForeignKey,
+    Index,
+    Integer,
+    LargeBinary,
+    String,
+)
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
 
@@ -13,15 +21,27 @@ class AlembicVersion(Base):
 
 class Game(Base):
     __tablename__ = "games"
+    # ids are never reused, even after the latest game has been deleted
+    __table_args__ = {"sqlite_autoincrement": True}
 
     id = Column(Integer, primary_key=True, index=True)
-    name = Column(String)
+    name = Column(String, index=True, unique=True)
 
     active_words = relationship("ActiveWord", back_populates="game")
     moves = relationship("Move", back_populates="game")
     conditions = relationship("Condition", back_populates="game")
     hints = relationship("Hint", back_populates="game")
-    players = relationship("Player", back_populates="game")
+    players = relationship("Player", back_populates="game", order_by="Player.id")
+
+
+class GameIdCounter(Base):
+    """The latest game id allocated in a database (a single row), which never
+    goes backwards, not even when games are deleted."""
+
+    __tablename__ = "game_id_counters"
+
+    id = Column(Integer, primary_key=True)
+    last_id = Column(Integer, nullable=False)
 
 
 class Player(Base):
@@ -37,6 +57,11 @@ class Player(Base):
     color = Column(Integer)
     role = Column(Integer)
 
+    __table_args__ = (
+        Index("uq_players_game_id_color_role", game_id, color, role, unique=True),
+        Index("uq_players_game_id_session_id", game_id, session_id, unique=True),
+    )
+
 
 class Word(Base):
     __tablename__ = "words"
@@ -73,6 +98,9 @@ class Condition(Base):
     hint_id = Column(Integer, ForeignKey("hints.id"))
     hint = relationship("Hint", back_populates="conditions")
 
+    move_id = Column(Integer, ForeignKey("moves.id"))
+    move = relationship("Move")
+
     condition = Column(Integer)
     created_at = Column(Integer)
 
@@ -105,3 +133,20 @@ class Hint(Base):
     num = Column(Integer)
     color = Column(Integer)
     created_at = Column(Integer)
+
+
+# finished games moved out of the tables above live in a separate database
+ArchiveBase = declarative_base()
+
+
+class ArchivedGame(ArchiveBase):
+    __tablename__ = "archived_games"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, index=True)
+    condition = Column(Integer)
+    finished_at = Column(Integer)
+    archived_at = Column(Integer)
+
+    # the rows of all tables of the game, column by column, zlib compressed
+    data = Column(LargeBinary)
@@ -0,0 +1,224 @@
+from typing import Dict, Any, List, Optional
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field, asdict
+from functools import wraps
+import io
+import logging
+import random
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+LOGGER = logging.getLogger("profiling")
+
+
+@dataclass
+class TransitionRecord:
+    name: str
+    game_id: Optional[int]
+    started_at: float
+    duration: float = 0.0
+    num_statements: int = 0
+    backend_calls: Dict[str, int] = field(default_factory=dict)
+    backend_time: Dict[str, float] = field(default_factory=dict)
+    profile: Optional[str] = None
+
+    @property
+    def num_loads(self) -> int:
+        return self.backend_calls.get("load", 0)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {**asdict(self), "num_loads": self.num_loads}
+
+
+class Reporter:
+    def report(self, record: TransitionRecord) -> None:
+        raise NotImplementedError()
+
+
+class LoggingReporter(Reporter):
+    def __init__(self, level: int = logging.INFO):
+        self._level = level
+
+    def report(self, record: TransitionRecord) -> None:
+        LOGGER.log(
+            self._level,
+            f"{record.name} (game {record.game_id}): {record.duration * 1000:.2f}ms, "
+            f"{record.num_statements} statements, {record.num_loads} loads",
+        )
+
+
+class RingBufferReporter(Reporter):
+    """Keeps the most recent records in memory, e.g. for an admin endpoint."""
+
+    def __init__(self, maxlen: int = 256):
+        self._records = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+
+    def report(self, record: TransitionRecord) -> None:
+        with self._lock:
+            self._records.append(record)
+
+    def records(self, name: Optional[str] = None) -> List[TransitionRecord]:
+        with self._lock:
+            records = list(self._records)
+        return [r for r in records if name is None or r.name == name]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._records.clear()
+
+
+class CProfileCapture:
+    def __init__(self):
+        import cProfile
+
+        self._profile = cProfile.Profile()
+        self._profile.enable()
+
+    def stop(self) -> str:
+        import pstats
+
+        self._profile.disable()
+        out = io.StringIO()
+        pstats.Stats(self._profile, stream=out).sort_stats("cumulative").print_stats(25)
+        return out.getvalue()
+
+
+class PyinstrumentCapture:
+    def __init__(self):
+        from pyinstrument import Profiler
+
+        self._profiler = Profiler()
+        self._profiler.start()
+
+    def stop(self) -> str:
+        self._profiler.stop()
+        return self._profiler.output_text()
+
+
+CAPTURES = {"cprofile": CProfileCapture, "pyinstrument": PyinstrumentCapture}
+
+_current_record: ContextVar[Optional[TransitionRecord]] = ContextVar(
+    "current_transition", default=None
+)
+
+
+class Profiler:
+    """Records wall time, SQL statements and backend calls of game transitions.
+
+    Profiling is disabled by default, in which case the hooks only cost a flag
+    check. Nested transitions (e.g. `end_turn` called by `guess`) are accounted
+    to the outermost one.
+    """
+
+    def __init__(self):
+        self._enabled = False
+        self._sample_rate = 0.0
+        self._capture = "cprofile"
+        self._reporters: List[Reporter] = []
+
+    @property
+    def enabled(self) -> bool:
+        return self._enabled
+
+    def configure(
+        self,
+        enabled: bool = True,
+        sample_rate: float = 0.0,
+        capture: str = "cprofile",
+    ) -> None:
+        if capture not in CAPTURES:
+            raise ValueError(f"Unknown capture '{capture}'")
+        self._enabled = enabled
+        self._sample_rate = sample_rate
+        self._capture = capture
+
+    def add_reporter(self, reporter: Reporter) -> None:
+        self._reporters.append(reporter)
+
+    def remove_reporter(self, reporter: Reporter) -> None:
+        self._reporters.remove(reporter)
+
+    @contextmanager
+    def transition(self, name: str, game_id: Optional[int] = None):
+        if not self._enabled or _current_record.get() is not None:
+            yield _current_record.get()
+            return
+
+        record = TransitionRecord(name=name, game_id=game_id, started_at=time.time())
+        token = _current_record.set(record)
+        capture = None
+        if self._sample_rate > 0 and random.random() < self._sample_rate:
+            capture = CAPTURES[self._capture]()
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record.duration = time.perf_counter() - start
+            if capture:
+                record.profile = capture.stop()
+            _current_record.reset(token)
+            for reporter in self._reporters:
+                try:
+                    reporter.report(record)
+                except Exception:
+                    LOGGER.exception(f"Reporter {reporter} failed")
+
+
+PROFILER = Profiler()
+
+
+def profile_transition(f):
+    """Profiles a method of a `GameState` as a transition."""
+
+    @wraps(f)
+    def wrapper(*args, **kwargs):
+        if not PROFILER.enabled:
+            return f(*args, **kwargs)
+        with PROFILER.transition(f.__name__, args[0].backend.game_id):
+            return f(*args, **kwargs)
+
+    return wrapper
+
+
+def _profile_backend_call(f):
+    @wraps(f)
+    def wrapper(*args, **kwargs):
+        record = _current_record.get()
+        if record is None:
+            return f(*args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return f(*args, **kwargs)
+        finally:
+            name = f.__name__
+            record.backend_calls[name] = record.backend_calls.get(name, 0) + 1
+            record.backend_time[name] = (
+                record.backend_time.get(name, 0.0) + time.perf_counter() - start
+            )
+
+    return wrapper
+
+
+def profile_backend(cls):
+    """Class decorator that accounts all public methods of a game backend to
+    the current transition."""
+    for name, member in list(vars(cls).items()):
+        if not name.startswith("_") and callable(member):
+            setattr(cls, name, _profile_backend_call(member))
+    return cls
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Counts the statements executed by the engine during a transition."""
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, many):
+        record = _current_record.get()
+        if record is not None:
+            record.num_statements += 1
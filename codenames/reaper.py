@@ -0,0 +1,163 @@
+"""Removal of abandoned games.
+
+Games that have not been finished but show no activity (no condition, hint
+or guess) for longer than a TTL are deleted, or archived, in batches of a
+bounded number of games per transaction. Their stream subscribers are closed,
+so open tabs stop reloading games that are gone, and their cached boards are
+dropped.
+"""
+
+from typing import Callable, List, Optional
+from dataclasses import dataclass
+import asyncio
+import logging
+import time
+
+from sqlalchemy import func, union_all
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from codenames import models
+from codenames.archive import FINISHED_CONDITIONS, archive_games
+from codenames.broadcast import BroadcasterRegistry
+from codenames.metrics import REAPED_GAMES, REAPED_SUBSCRIBERS
+from codenames.similarity import SimilarityService
+from codenames.sql import GAME_IDS
+
+LOGGER = logging.getLogger("reaper")
+
+# rows of a game, children first
+GAME_MODELS = [
+    models.Condition,
+    models.Move,
+    models.Hint,
+    models.Player,
+    models.ActiveWord,
+    models.Game,
+]
+
+
+@dataclass
+class ReaperConfig:
+    ttl: float = 24 * 60 * 60  # second
+    interval: float = 10 * 60  # second
+    batch_size: int = 100  # games per transaction
+    archive: bool = False
+
+
+def stale_games(
+    db: Session, inactive_before: int, limit: int, after: int = 0
+) -> List[int]:
+    """The ids of unfinished games whose latest activity happened before the
+    given time, starting after the game id `after`."""
+    activity = union_all(
+        db.query(
+            models.Condition.game_id.label("game_id"),
+            models.Condition.created_at.label("at"),
+        ),
+        db.query(models.Hint.game_id, models.Hint.created_at),
+        db.query(models.Move.game_id, models.Move.selected_at),
+    ).subquery()
+    latest = (
+        db.query(func.max(models.Condition.id).label("id"))
+        .group_by(models.Condition.game_id)
+        .subquery()
+    )
+    unfinished = (
+        db.query(models.Condition.game_id)
+        .join(latest, models.Condition.id == latest.c.id)
+        .filter(models.Condition.condition.notin_(FINISHED_CONDITIONS))
+    )
+    rows = (
+        db.query(activity.c.game_id)
+        .filter(activity.c.game_id.in_(unfinished))
+        .filter(activity.c.game_id > after)
+        .group_by(activity.c.game_id)
+        .having(func.max(func.coalesce(activity.c.at, 0)) < inactive_before)
+        .order_by(activity.c.game_id)
+        .limit(limit)
+        .all()
+    )
+    return [r.game_id for r in rows]
+
+
+def delete_games(db: Session, game_ids: List[int]) -> None:
+    """Deletes the games in a single transaction."""
+    if not game_ids:
+        return
+    for model in GAME_MODELS:
+        column = model.id if model is models.Game else model.game_id
+        db.query(model).filter(column.in_(game_ids)).delete(synchronize_session=False)
+    db.commit()
+    GAME_IDS.discard(game_ids)
+
+
+class GameReaper:
+    def __init__(
+        self,
+        open_db: Callable[[], Session],
+        config: ReaperConfig = ReaperConfig(),
+        open_archive_db: Optional[Callable[[], Session]] = None,
+        broadcasters: Optional[BroadcasterRegistry] = None,
+        similarities: Optional[SimilarityService] = None,
+    ):
+        if config.archive and open_archive_db is None:
+            raise ValueError("Archiving reaped games requires an archive")
+        self._open_db = open_db
+        self._config = config
+        self._open_archive_db = open_archive_db
+        self._broadcasters = broadcasters
+        self._similarities = similarities
+
+    def reap(self, now: Optional[int] = None) -> List[int]:
+        """Removes all stale games and returns their ids."""
+        now = int(time.time()) if now is None else now
+        action = "archived" if self._config.archive else "deleted"
+        reaped = []
+        db = self._open_db()
+        archive_db = self._open_archive_db() if self._config.archive else None
+        last_id = 0  # skipped games are not returned again
+        try:
+            while True:
+                game_ids = stale_games(
+                    db, now - int(self._config.ttl), self._config.batch_size, last_id
+                )
+                if self._config.archive:
+                    removed = archive_games(db, archive_db, game_ids, now)
+                else:
+                    delete_games(db, game_ids)
+                    removed = game_ids
+                REAPED_GAMES.inc(len(removed), action=action)
+                reaped.extend(removed)
+                if len(game_ids) < self._config.batch_size:
+                    break
+                last_id = game_ids[-1]
+        finally:
+            db.close()
+            if archive_db is not None:
+                archive_db.close()
+        if reaped:
+            LOGGER.info(f"Reaped ({action}) {len(reaped)} inactive games")
+        return reaped
+
+    def close_subscribers(self, game_ids: List[int]) -> int:
+        if self._broadcasters is None:
+            return 0
+        num_closed = sum(self._broadcasters.close(game_id) for game_id in game_ids)
+        REAPED_SUBSCRIBERS.inc(num_closed)
+        return num_closed
+
+    def forget_boards(self, game_ids: List[int]) -> None:
+        # on the event loop, which owns the similarity caches
+        if self._similarities is not None:
+            self._similarities.forget(game_ids)
+
+    async def run(self) -> None:
+        while True:
+            try:
+                game_ids = await run_in_threadpool(self.reap)
+                self.close_subscribers(game_ids)
+                self.forget_boards(game_ids)
+            except Exception:
+                LOGGER.exception("Could not reap inactive games")
+            await asyncio.sleep(self._config.interval)
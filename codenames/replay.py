@@ -0,0 +1,367 @@
+"""Replays of games from their append-only log.
+
+A game is recorded as a sequence of `conditions`; every action appends one
+condition and possibly a hint (hints) or a guess (moves). The log of a game
+is loaded once and turned into a list of events, which are projected forward
+on the loaded state, so any point of the game is reconstructed without
+further queries. Moderators can undo the last action, which deletes its rows.
+"""
+
+from typing import Dict, Any, List, Optional, Tuple
+from bisect import bisect_right
+from collections import deque
+from dataclasses import dataclass, replace
+
+from sqlalchemy.orm import Session, joinedload
+
+from codenames import models
+from codenames.game import Color, Condition, Role, Word
+
+CHECKPOINT_INTERVAL = 16
+
+START = "start"
+HINT = "hint"
+GUESS = "guess"
+END_TURN = "end_turn"
+
+SPY_CONDITIONS = [Condition.BLUE_SPY, Condition.RED_SPY]
+FINISHED_CONDITIONS = [Condition.RED_WINS, Condition.BLUE_WINS]
+
+
+class ReplayException(Exception):
+    def __init__(self, message: str):
+        self._message = message
+
+    @property
+    def message(self):
+        return self._message
+
+
+@dataclass(frozen=True)
+class Event:
+    type: str
+    at: int
+    condition: Condition  # the condition the action leads to
+    hint_id: Optional[int] = None  # of the resulting condition
+    hint: Optional[Dict[str, Any]] = None  # the given hint
+    word_id: Optional[int] = None  # the guessed (active) word
+    condition_row_id: Optional[int] = None
+    move_row_id: Optional[int] = None
+
+    def to_compact(self) -> List[Any]:
+        if self.type == HINT:
+            return [self.type, self.at, self.hint["word"], self.hint["num"]]
+        if self.type == GUESS:
+            return [self.type, self.at, self.word_id]
+        return [self.type, self.at]
+
+
+def apply(game_info: Dict[str, Any], event: Event) -> None:
+    """Projects an event onto a game state in place."""
+    if event.type == HINT:
+        game_info["hints"].append(event.hint)
+    elif event.type == GUESS:
+        words = game_info["words"]
+        words[event.word_id] = replace(words[event.word_id], selected_at=event.at)
+    game_info["conditions"].append({"value": event.condition, "hint_id": event.hint_id})
+
+
+def copy_game_info(game_info: Dict[str, Any]) -> Dict[str, Any]:
+    # words are replaced rather than modified, hints and conditions are
+    # appended only
+    return {
+        "words": dict(game_info["words"]),
+        "hints": list(game_info["hints"]),
+        "conditions": list(game_info["conditions"]),
+        "players": game_info["players"],
+    }
+
+
+def infer_events(
+    conditions: List[models.Condition],
+    hints: List[models.Hint],
+    moves: List[models.Move],
+    colors: Dict[int, Color],
+) -> List[Event]:
+    """Assigns the hints and moves to the conditions they lead to.
+
+    Conditions reference the guess that led to them. Conditions recorded
+    before there were such references are inferred from the guesses that are
+    not referenced: a turn ends (a spymaster condition follows a player
+    condition) either by `end_turn` or by guessing a word of another color,
+    which is assumed if the next guess is of another color and was made
+    before the next hint has been given. Once a condition has a reference,
+    all later ones have been recorded with references.
+    """
+    hints_by_id = {h.id: h for h in hints}
+    hint_times = sorted((h.id, h.created_at or 0) for h in hints)
+    moves_by_id = {m.id: m for m in moves}
+    referenced = {c.move_id for c in conditions if c.move_id is not None}
+    moves = deque(  # unreferenced guesses in order of guessing
+        sorted((m for m in moves if m.id not in referenced), key=lambda m: m.id)
+    )
+    explicit = False
+    events = []
+    for previous, row in zip(conditions, conditions[1:]):
+        explicit = explicit or row.move_id is not None
+        before, after = Condition(previous.condition), Condition(row.condition)
+        at = row.created_at or 0
+        if before == Condition.NOT_STARTED:
+            events.append(Event(START, at, after, condition_row_id=row.id))
+        elif before in SPY_CONDITIONS:
+            hint = hints_by_id[row.hint_id]
+            events.append(
+                Event(
+                    HINT,
+                    at,
+                    after,
+                    row.hint_id,
+                    hint={
+                        "id": hint.id,
+                        "word": hint.hint,
+                        "num": hint.num,
+                        "color": Color(hint.color) if hint.color else None,
+                    },
+                    condition_row_id=row.id,
+                )
+            )
+        else:
+            move = None
+            if explicit:
+                move = moves_by_id.get(row.move_id)
+            else:
+                later_hints = [t for i, t in hint_times if i > previous.hint_id]
+                next_hint_at = later_hints[0] if later_hints else None
+                is_guess = after not in SPY_CONDITIONS or (
+                    bool(moves)
+                    and colors[moves[0].active_word_id] != before.color
+                    and (next_hint_at is None or moves[0].selected_at <= next_hint_at)
+                )
+                if is_guess:
+                    if not moves:
+                        raise ReplayException(f"No guess for condition {row.id}")
+                    move = moves.popleft()
+            if move is not None:
+                events.append(
+                    Event(
+                        GUESS,
+                        move.selected_at,
+                        after,
+                        row.hint_id,
+                        word_id=move.active_word_id,
+                        condition_row_id=row.id,
+                        move_row_id=move.id,
+                    )
+                )
+            else:
+                events.append(
+                    Event(END_TURN, at, after, row.hint_id, condition_row_id=row.id)
+                )
+    return events
+
+
+class Replay:
+    def __init__(
+        self,
+        game_id: int,
+        initial: Dict[str, Any],
+        events: List[Event],
+    ):
+        self._game_id = game_id
+        self._initial = initial
+        self._events = events
+        self._checkpoints: List[Dict[str, Any]] = []
+
+    @classmethod
+    def load(cls, db: Session, game_id: int) -> "Replay":
+        """Loads the log of a game with a single query per table."""
+        game = db.query(models.Game).filter_by(id=game_id).first()
+        if game is None:
+            raise ReplayException(f"Game {game_id} does not exist")
+        active_words = (
+            db.query(models.ActiveWord)
+            .options(joinedload(models.ActiveWord.word))
+            .filter_by(game_id=game_id)
+            .all()
+        )
+        conditions = (
+            db.query(models.Condition)
+            .filter_by(game_id=game_id)
+            .order_by(models.Condition.id)
+            .all()
+        )
+        hints = db.query(models.Hint).filter_by(game_id=game_id).all()
+        moves = db.query(models.Move).filter_by(game_id=game_id).all()
+        players = db.query(models.Player).filter_by(game_id=game_id).all()
+
+        colors = {w.id: Color(w.color) for w in active_words}
+        first_hint = min(hints, key=lambda h: h.id)
+        initial = {
+            "words": {
+                w.id: Word(
+                    id=w.id, value=w.word.value, color=colors[w.id], selected_at=None
+                )
+                for w in active_words
+            },
+            "hints": [{"id": first_hint.id, "word": None, "num": None, "color": None}],
+            "conditions": [
+                {"value": Condition(conditions[0].condition), "hint_id": None}
+            ],
+            "players": [
+                {
+                    "session_id": p.session_id,
+                    "color": Color(p.color),
+                    "role": Role(p.role),
+                    "name": p.name,
+                }
+                for p in players
+            ],
+        }
+        events = infer_events(conditions, hints, moves, colors)
+        return cls(game_id, initial, events)
+
+    @property
+    def game_id(self) -> int:
+        return self._game_id
+
+    @property
+    def events(self) -> List[Event]:
+        return self._events
+
+    def __len__(self) -> int:
+        return len(self._events)
+
+    def _checkpoint(self, index: int) -> Dict[str, Any]:
+        # checkpoint i is the state after i * CHECKPOINT_INTERVAL events
+        if not self._checkpoints:
+            self._checkpoints.append(self._initial)
+        while len(self._checkpoints) <= index:
+            state = copy_game_info(self._checkpoints[-1])
+            start = (len(self._checkpoints) - 1) * CHECKPOINT_INTERVAL
+            for event in self._events[start : start + CHECKPOINT_INTERVAL]:
+                apply(state, event)
+            self._checkpoints.append(state)
+        return self._checkpoints[index]
+
+    def state(self, step: Optional[int] = None) -> Dict[str, Any]:
+        """The game as loaded by a backend after the first `step` events (all
+        events by default)."""
+        step = len(self._events) if step is None else step
+        if not 0 <= step <= len(self._events):
+            raise ReplayException(f"Step {step} is out of range")
+        index = step // CHECKPOINT_INTERVAL
+        state = copy_game_info(self._checkpoint(index))
+        for event in self._events[index * CHECKPOINT_INTERVAL : step]:
+            apply(state, event)
+        return state
+
+    def seek(self, at: int) -> int:
+        """The number of events that happened until the given time."""
+        return bisect_right([e.at for e in self._events], at)
+
+    def state_at(self, at: int) -> Dict[str, Any]:
+        return self.state(self.seek(at))
+
+    def undo(self) -> Event:
+        """Removes the last event from the replay."""
+        if not self._events:
+            raise ReplayException("There is nothing to undo")
+        event = self._events.pop()
+        del self._checkpoints[len(self._events) // CHECKPOINT_INTERVAL + 1 :]
+        return event
+
+    def redo(self, event: Event) -> None:
+        self._events.append(event)
+
+    @property
+    def finished(self) -> bool:
+        return bool(self._events) and self._events[-1].condition in FINISHED_CONDITIONS
+
+    def export(self, reveal: bool = True) -> Dict[str, Any]:
+        """A compact representation of the replay. Unless `reveal`, only the
+        colors of guessed words are included."""
+        guessed = {e.word_id for e in self._events if e.type == GUESS}
+        return {
+            "game_id": self._game_id,
+            "words": [
+                [w.id, w.value, w.color.value if reveal or w.id in guessed else None]
+                for w in self._initial["words"].values()
+            ],
+            "events": [e.to_compact() for e in self._events],
+        }
+
+
+def undo_last_action(db: Session, replay: Replay) -> Event:
+    """Deletes the rows of the last action of a game and removes it from its
+    replay."""
+    event = replay.undo()
+    db.query(models.Condition).filter_by(id=event.condition_row_id).delete()
+    if event.type == HINT:
+        db.query(models.Hint).filter_by(id=event.hint_id).delete()
+    elif event.type == GUESS:
+        db.query(models.Move).filter_by(id=event.move_row_id).delete()
+    db.commit()
+    return event
+
+
+def redo_action(db: Session, game_id: int, event: Event) -> Event:
+    """Records an undone action again (with its original time) and returns it
+    with its new rows."""
+    hint_id = event.hint_id
+    if event.type == HINT:
+        hint = models.Hint(
+            game_id=game_id,
+            hint=event.hint["word"],
+            num=event.hint["num"],
+            color=event.hint["color"].value,
+            created_at=event.at,
+        )
+        db.add(hint)
+        db.flush()
+        hint_id = hint.id
+        event = replace(event, hint_id=hint_id, hint={**event.hint, "id": hint_id})
+    elif event.type == GUESS:
+        move = models.Move(
+            game_id=game_id, active_word_id=event.word_id, selected_at=event.at
+        )
+        db.add(move)
+        db.flush()
+        event = replace(event, move_row_id=move.id)
+    condition = models.Condition(
+        game_id=game_id,
+        hint_id=hint_id,
+        move_id=event.move_row_id if event.type == GUESS else None,
+        condition=event.condition.value,
+        created_at=event.at,
+    )
+    db.add(condition)
+    db.commit()
+    return replace(event, condition_row_id=condition.id)
+
+
+class UndoHistory:
+    """The undone actions per game, which can be redone as long as no other
+    action has been recorded since.
+
+    The undone actions are only kept in memory, so with several workers an
+    action can only be redone by the worker that undid it."""
+
+    def __init__(self):
+        self._undone: Dict[int, List[Tuple[int, Event]]] = {}
+
+    def undo(self, db: Session, game_id: int) -> Event:
+        replay = Replay.load(db, game_id)
+        event = undo_last_action(db, replay)
+        self._undone.setdefault(game_id, []).append((len(replay), event))
+        return event
+
+    def redo(self, db: Session, game_id: int) -> Event:
+        undone = self._undone.get(game_id)
+        if not undone:
+            raise ReplayException("There is nothing to redo")
+        num_events, event = undone[-1]
+        if len(Replay.load(db, game_id)) != num_events:
+            del self._undone[game_id]
+            raise ReplayException("The game has changed since the undo")
+        undone.pop()
+        return redo_action(db, game_id, event)
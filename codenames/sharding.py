@@ -0,0 +1,130 @@
+"""Horizontal sharding of games.
+
+Games never interact, so they can be spread over several databases, each
+with an engine (and writer lock, for SQLite) of its own. A game lives on
+shard `game_id % num_shards`; new games are created on the shard their name
+hashes to, with an id of that shard taken from the shard's id counter (which
+never goes backwards), so both the id and the name of a game find it without
+a lookup table. The shards are configured by
+
+    CODENAMES_SHARD_URLS=sqlite:///instance/codenames-0.sqlite,sqlite:///instance/codenames-1.sqlite
+
+and migrated by `alembic upgrade head` (all of them if the variable is set).
+Existing games keep their ids, so a database can only be split into shards
+if its game ids already match the shard.
+"""
+
+from typing import Callable, Dict, List, Optional
+import os
+import zlib
+
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from codenames.game import Game
+from codenames.sql import (
+    GAME_IDS,
+    GameIdCache,
+    SQLAlchemyGameBackend,
+    SQLAlchemyGameManager,
+)
+
+SHARD_URLS_ENV = "CODENAMES_SHARD_URLS"
+
+
+def shard_urls(default: str) -> List[str]:
+    """The database URLs of the configured shards, or the default database."""
+    urls = [u.strip() for u in os.environ.get(SHARD_URLS_ENV, "").split(",")]
+    return [u for u in urls if u] or [default]
+
+
+def create_shard_engine(url: str) -> Engine:
+    connect_args = {"check_same_thread": False} if url.startswith("sqlite") else {}
+    return create_engine(url, connect_args=connect_args)
+
+
+class GameShards:
+    def __init__(self, session_factories: List[Callable[[], Session]]):
+        if not session_factories:
+            raise ValueError("There has to be at least one shard")
+        self._session_factories = session_factories
+
+    @classmethod
+    def from_engines(cls, engines: List[Engine]) -> "GameShards":
+        return cls(
+            [sessionmaker(autocommit=False, autoflush=False, bind=e) for e in engines]
+        )
+
+    @property
+    def num_shards(self) -> int:
+        return len(self._session_factories)
+
+    @property
+    def session_factories(self) -> List[Callable[[], Session]]:
+        return self._session_factories
+
+    def shard_of(self, game_id: int) -> int:
+        return game_id % self.num_shards
+
+    def shard_of_name(self, name: str) -> int:
+        # a hash that is the same in all processes
+        return zlib.crc32(name.encode()) % self.num_shards
+
+    def session(self, shard: int) -> Session:
+        return self._session_factories[shard]()
+
+
+class ShardedGameBackend(SQLAlchemyGameBackend):
+    """A game backend with a session of its own on the shard of its game."""
+
+    def __init__(self, game_id: int, shards: GameShards):
+        super().__init__(game_id, shards.session(shards.shard_of(game_id)))
+
+    def close(self) -> None:
+        self._db.close()
+
+
+class ShardedGameManager:
+    """Creates and finds games on the shards their names hash to."""
+
+    def __init__(
+        self, shards: GameShards, game_ids: GameIdCache = GAME_IDS, **board_config
+    ):
+        self._shards = shards
+        self._game_ids = game_ids
+        self._board_config = board_config
+        self._sessions: Dict[int, Session] = {}
+        self._managers: Dict[int, SQLAlchemyGameManager] = {}
+
+    def _manager(self, name: str) -> SQLAlchemyGameManager:
+        shard = self._shards.shard_of_name(name)
+        if shard not in self._managers:
+            self._sessions[shard] = self._shards.session(shard)
+            self._managers[shard] = SQLAlchemyGameManager(
+                self._sessions[shard],
+                game_ids=self._game_ids,
+                shard=shard,
+                num_shards=self._shards.num_shards,
+                **self._board_config,
+            )
+        return self._managers[shard]
+
+    def exists(self, name: str) -> bool:
+        return self._manager(name).exists(name)
+
+    def get_id(self, name: str) -> Optional[int]:
+        return self._manager(name).get_id(name)
+
+    def get(self, name: str, session_id: Optional[str] = None) -> Optional[Game]:
+        return self._manager(name).get(name, session_id)
+
+    def create_random(
+        self, name: str, session_id: str, random_seed: int = None
+    ) -> Game:
+        return self._manager(name).create_random(name, session_id, random_seed)
+
+    def close(self) -> None:
+        for session in self._sessions.values():
+            session.close()
+        self._sessions, self._managers = {}, {}
@@ -0,0 +1,169 @@
+from typing import Dict, Iterable, List, Tuple, Optional, Callable
+from collections import OrderedDict
+from dataclasses import dataclass, field
+import asyncio
+
+import numpy as np
+from starlette.concurrency import run_in_threadpool
+
+from codenames.embeddings import EmbeddingService
+from codenames.metrics import EMBEDDING_LATENCY, SIMILARITY_CACHE
+
+DEFAULT_DEBOUNCE = 0.05  # second
+DEFAULT_MAX_GAMES = 1024
+DEFAULT_MAX_HINTS_PER_GAME = 256
+
+Board = List[Tuple[int, str]]
+Scores = Dict[int, float]
+
+
+def normalize(board: Board, sim: List[float]) -> Scores:
+    """Scales the similarities of the board to [0, 1]."""
+    ids = [word_id for word_id, _ in board]
+    sim = np.array(sim)
+    if len(sim) == 0 or sim.max() == sim.min():
+        return dict(zip(ids, [1.0] * len(ids)))
+    norm = (sim - sim.min()) / (sim.max() - sim.min())
+    return dict(zip(ids, norm.tolist()))
+
+
+@dataclass
+class _BoardScores:
+    board: Board
+    scores: "OrderedDict[str, Scores]" = field(default_factory=OrderedDict)
+
+
+@dataclass
+class _Query:
+    hint: str
+    result: asyncio.Future  # the hint and the scores that answer the query
+
+
+class SimilarityService:
+    """Scores the words of a board against hints as they are being typed.
+
+    The words of a board never change, so the scores of a hint are cached per
+    game (least recently used games and hints are evicted) and served without
+    touching the database or the embedding workers. Uncached hints wait for
+    `debounce` seconds: if the same session sends another hint meanwhile,
+    the older request is answered with the scores of the newer one, so only
+    the latest keystroke is scored.
+    """
+
+    def __init__(
+        self,
+        embeddings: EmbeddingService,
+        load_board: Callable[[int], Board],
+        debounce: float = DEFAULT_DEBOUNCE,
+        max_games: int = DEFAULT_MAX_GAMES,
+        max_hints_per_game: int = DEFAULT_MAX_HINTS_PER_GAME,
+    ):
+        self._embeddings = embeddings
+        self._load_board = load_board
+        self._debounce = debounce
+        self._max_games = max_games
+        self._max_hints_per_game = max_hints_per_game
+        self._games: "OrderedDict[int, _BoardScores]" = OrderedDict()
+        self._latest: Dict[Tuple[int, str], _Query] = {}
+        self._in_flight: Dict[Tuple[int, str], asyncio.Future] = {}
+
+    def cached(self, game_id: int, hint: str) -> Optional[Scores]:
+        game = self._games.get(game_id)
+        if game is None or hint.lower() not in game.scores:
+            return None
+        self._games.move_to_end(game_id)
+        game.scores.move_to_end(hint.lower())
+        return game.scores[hint.lower()]
+
+    def forget(self, game_ids: Iterable[int]) -> None:
+        """Drops the boards and scores of games that are gone."""
+        for game_id in game_ids:
+            self._games.pop(game_id, None)
+
+    def _put(self, game_id: int, hint: str, scores: Scores) -> None:
+        game = self._games.get(game_id)
+        if game is None:
+            return
+        game.scores[hint.lower()] = scores
+        while len(game.scores) > self._max_hints_per_game:
+            game.scores.popitem(last=False)
+
+    async def _board(self, game_id: int) -> Board:
+        if game_id not in self._games:
+            board = await run_in_threadpool(self._load_board, game_id)
+            self._games[game_id] = _BoardScores(board)
+            while len(self._games) > self._max_games:
+                self._games.popitem(last=False)
+        self._games.move_to_end(game_id)
+        return self._games[game_id].board
+
+    async def scores(
+        self, game_id: int, hint: str, session_id: Optional[str] = None
+    ) -> Tuple[str, Scores]:
+        """Returns the normalized scores of the board and the hint they have
+        been computed for (a newer hint of the same session)."""
+        if hint == "":
+            board = await self._board(game_id)
+            return hint, normalize(board, [])
+
+        scores = self.cached(game_id, hint)
+        if scores is not None:
+            SIMILARITY_CACHE.inc(result="hit")
+            return hint, scores
+
+        if session_id is None:
+            return hint, await self._compute(game_id, hint)
+
+        key = (game_id, session_id)
+        query = _Query(hint, asyncio.get_running_loop().create_future())
+        self._latest[key] = query
+        try:
+            await asyncio.sleep(self._debounce)
+            latest = self._latest.get(key)
+            try:
+                if latest is not None and latest is not query:
+                    SIMILARITY_CACHE.inc(result="coalesced")
+                    outcome = await asyncio.shield(latest.result)
+                else:
+                    outcome = hint, await self._compute(game_id, hint)
+                # older queries of the session may wait for this one
+                query.result.set_result(outcome)
+            except asyncio.CancelledError:
+                query.result.cancel()
+                raise
+            except Exception as ex:
+                query.result.set_exception(ex)
+            return await query.result
+        finally:
+            if not query.result.done():
+                query.result.cancel()
+            if self._latest.get(key) is query:
+                del self._latest[key]
+
+    async def _compute(self, game_id: int, hint: str) -> Scores:
+        # identical hints of different sessions share a single computation
+        key = (game_id, hint.lower())
+        if key in self._in_flight:
+            SIMILARITY_CACHE.inc(result="coalesced")
+            return await asyncio.shield(self._in_flight[key])
+
+        SIMILARITY_CACHE.inc(result="miss")
+        result = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = result
+        try:
+            board = await self._board(game_id)
+            with EMBEDDING_LATENCY.time():
+                sim = await self._embeddings.similarities(
+                    hint, [word for _, word in board]
+                )
+            scores = normalize(board, sim)
+            self._put(game_id, hint, scores)
+            result.set_result(scores)
+        except Exception as ex:
+            result.set_exception(ex)
+        finally:
+            # e.g. cancelled, the coalesced waiters must not wait forever
+            if not result.done():
+                result.cancel()
+            del self._in_flight[key]
+        return await result
@@ -1,6 +1,8 @@
-from typing import Dict, Union, Any, List, Tuple, Optional
+from typing import Dict, Union, Any, Iterable, List, Tuple, Optional
+from collections import OrderedDict
 from itertools import chain
 import random
+import threading
 import time
 
 from codenames.game import (
@@ -10,28 +12,44 @@ from codenames.game import (
     Role,
     Condition,
     GameAlreadyExistsException,
+    AlreadyJoinedException,
+    RoleOccupiedException,
     Word,
 )
 
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from sqlalchemy.sql.expression import func
-from sqlalchemy import desc
+from sqlalchemy import case, desc, insert, select, update
 from codenames import models, schemas
+from codenames.metrics import GAME_LOAD_LATENCY
+from codenames.profiling import profile_backend
 
 
+@profile_backend
 class SQLAlchemyGameBackend(GameBackend):
     def __init__(self, game_id: int, db: Session):
         self._game_id = game_id
         self._db = db
+        self._last_move: Optional[models.Move] = None
+        # the current condition and the seats of the loaded game, kept up to
+        # date by this backend, so authorization needs no queries (until the
+        # game is loaded, the active session id is queried)
+        self._condition: Optional[Condition] = None
+        self._seats: Dict[Tuple[Color, Role], str] = {}
 
     @property
     def game_id(self) -> int:
         return self._game_id
 
     def load(self) -> Dict[str, Any]:
+        with GAME_LOAD_LATENCY.time():
+            return self._load()
+
+    def _load(self) -> Dict[str, Any]:
         game = self._db.query(models.Game).filter_by(id=self._game_id).first()
 
-        return {
+        info = {
             "words": {
                 w.id: Word(
                     id=w.id,
@@ -64,6 +82,11 @@ class SQLAlchemyGameBackend(GameBackend):
                 for p in game.players
             ],
         }
+        self._condition = info["conditions"][-1]["value"]
+        self._seats = {
+            (p["color"], p["role"]): p["session_id"] for p in info["players"]
+        }
+        return info
 
     def read_active_words(self):
         return (
@@ -73,13 +96,13 @@ class SQLAlchemyGameBackend(GameBackend):
         )
 
     def add_guess(self, word_id: int) -> None:
-        self._db.add(
-            models.Move(
-                game_id=self._game_id,
-                active_word_id=word_id,
-                selected_at=int(time.time()),
-            )
+        # referenced by the condition the guess leads to
+        self._last_move = models.Move(
+            game_id=self._game_id,
+            active_word_id=word_id,
+            selected_at=int(time.time()),
         )
+        self._db.add(self._last_move)
 
     def read_conditions(self):
         return (
@@ -115,10 +138,14 @@ class SQLAlchemyGameBackend(GameBackend):
             models.Condition(
                 game_id=self._game_id,
                 hint_id=hint_id,
+                move=self._last_move,
                 condition=condition.value,
                 created_at=int(time.time()),
             )
         )
+        self._last_move = None
+        if self._condition is not None:
+            self._condition = condition
 
     def is_occupied(self, color: Color, role: Role) -> bool:
         player_count = (
@@ -138,11 +165,38 @@ class SQLAlchemyGameBackend(GameBackend):
                 name=name,
             )
         )
+        self._seats[(color, role)] = session_id
+
+    def add_players(self, players: List[Dict[str, Any]]) -> None:
+        # a single INSERT, checked by the unique indexes on the players; the
+        # violated one is only looked up on failure
+        try:
+            self._db.execute(
+                insert(models.Player).values(
+                    [
+                        {
+                            "game_id": self._game_id,
+                            "session_id": p["session_id"],
+                            "color": p["color"].value,
+                            "role": p["role"].value,
+                            "name": p["name"],
+                        }
+                        for p in players
+                    ]
+                )
+            )
+        except IntegrityError:
+            self._db.rollback()
+            if any(self.is_occupied(p["color"], p["role"]) for p in players):
+                raise RoleOccupiedException()
+            raise AlreadyJoinedException()
+        self._seats.update({(p["color"], p["role"]): p["session_id"] for p in players})
 
     def read_players(self):
         return (
             self._db.query(models.Player)
             .filter(models.Player.game_id == self._game_id)
+            .order_by(models.Player.id)
             .all()
         )
 
@@ -158,8 +212,17 @@ class SQLAlchemyGameBackend(GameBackend):
         self._db.query(models.Player).filter_by(
             game_id=self._game_id, session_id=session_id
         ).delete()
+        self._seats = {k: v for k, v in self._seats.items() if v != session_id}
 
     def get_active_session_id(self) -> str:
+        if self._condition is not None:
+            session_id = self._seats.get((self._condition.color, self._condition.role))
+            if session_id is None:
+                raise Exception(
+                    "Could not determine active player (maybe there is none?)"
+                )
+            return session_id
+
         game_condition = Condition(
             self._db.query(models.Condition)
             .filter_by(game_id=self._game_id)
@@ -187,6 +250,56 @@ class SQLAlchemyGameBackend(GameBackend):
         self._db.commit()
 
 
+DEFAULT_GAME_ID_CACHE_SIZE = 10000
+MAX_CREATE_ATTEMPTS = 5
+GAME_ID_COUNTER = 1  # the id of the single row of the counter
+
+
+class GameIdCache:
+    """A bounded LRU map from game names to ids.
+
+    The id of a name never changes while the game exists, so entries only
+    have to be removed when games are deleted. Games deleted by other
+    processes are not removed, so hits have to be checked against the games.
+    """
+
+    def __init__(self, max_size: int = DEFAULT_GAME_ID_CACHE_SIZE):
+        self._max_size = max_size
+        self._ids: "OrderedDict[str, int]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def get(self, name: str) -> Optional[int]:
+        with self._lock:
+            game_id = self._ids.get(name)
+            if game_id is not None:
+                self._ids.move_to_end(name)
+            return game_id
+
+    def put(self, name: str, game_id: int) -> None:
+        with self._lock:
+            self._ids[name] = game_id
+            self._ids.move_to_end(name)
+            while len(self._ids) > self._max_size:
+                self._ids.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._ids.clear()
+
+    def discard(self, game_ids: Iterable[int]) -> None:
+        game_ids = set(game_ids)
+        with self._lock:
+            for name in [n for n, i in self._ids.items() if i in game_ids]:
+                del self._ids[name]
+
+
+# shared by the managers of all requests
+GAME_IDS = GameIdCache()
+
+
 class SQLAlchemyGameManager:
     def __init__(
         self,
@@ -195,8 +308,15 @@ class SQLAlchemyGameManager:
         num_red: int = 9,
         num_neutral: int = 9,
         num_assassin: int = 1,
+        game_ids: GameIdCache = GAME_IDS,
+        shard: int = 0,
+        num_shards: int = 1,
     ):
         self._db = db
+        self._game_ids = game_ids
+        # the ids of games created on a shard are congruent to it
+        self._shard = shard
+        self._num_shards = num_shards
         self._word_color_counts = {
             Color.BLUE.value: num_blue,
             Color.RED.value: num_red,
@@ -205,10 +325,27 @@ class SQLAlchemyGameManager:
         }
 
     def exists(self, name: str) -> bool:
-        res = self._db.query(models.Game).filter(models.Game.name == name).first()
-        if res:
-            return True
-        return False
+        return self.get_id(name) is not None
+
+    def get_id(self, name: str) -> Optional[int]:
+        game_id = self._game_ids.get(name)
+        if game_id is not None:
+            # a primary key lookup, the game may have been deleted elsewhere
+            cached_name = (
+                self._db.query(models.Game.name)
+                .filter(models.Game.id == game_id)
+                .scalar()
+            )
+            if cached_name != name:
+                self._game_ids.discard([game_id])
+                game_id = None
+        if game_id is None:
+            game_id = (
+                self._db.query(models.Game.id).filter(models.Game.name == name).scalar()
+            )
+            if game_id is not None:
+                self._game_ids.put(name, game_id)
+        return game_id
 
     def create_random(
         self, name: str, session_id: str, random_seed: int = None
@@ -224,7 +361,11 @@ class SQLAlchemyGameManager:
         ]
         self._db.add_all(active_words)
         self._db.add(
-            models.Condition(game_id=game.id, condition=Condition.NOT_STARTED.value)
+            models.Condition(
+                game_id=game.id,
+                condition=Condition.NOT_STARTED.value,
+                created_at=int(time.time()),
+            )
         )
         self._db.add(
             models.Hint(game_id=game.id, hint=None, num=None, color=None, created_at=0)
@@ -233,17 +374,58 @@ class SQLAlchemyGameManager:
         self._db.commit()
         return game
 
-    def get(self, name: str) -> Optional[Game]:
-        return None
+    def get(self, name: str, session_id: Optional[str] = None) -> Optional[Game]:
+        game_id = self.get_id(name)
+        if game_id is None:
+            return None
+        return Game(session_id, SQLAlchemyGameBackend(game_id, self._db))
+
+    def _next_id(self, base):
+        # the smallest id of the shard larger than base
+        return base - base % self._num_shards + self._num_shards + self._shard
+
+    def _allocate_id(self) -> int:
+        """An id of the shard larger than all ids allocated before, taken from
+        the counter in a single statement, so it also holds the write lock."""
+        counter = models.GameIdCounter.__table__
+        max_id = func.coalesce(select(func.max(models.Game.id)).scalar_subquery(), 0)
+        base = case((counter.c.last_id > max_id, counter.c.last_id), else_=max_id)
+        result = self._db.execute(
+            update(counter)
+            .where(counter.c.id == GAME_ID_COUNTER)
+            .values(last_id=self._next_id(base))
+        )
+        if result.rowcount == 0:
+            # a database created without the migrations
+            max_id = self._db.query(func.max(models.Game.id)).scalar() or 0
+            game_id = self._next_id(max_id)
+            self._db.execute(
+                insert(counter).values(id=GAME_ID_COUNTER, last_id=game_id)
+            )
+            return game_id
+        return self._db.execute(
+            select(counter.c.last_id).where(counter.c.id == GAME_ID_COUNTER)
+        ).scalar()
 
     def _create_game(self, name: str, session_id: str) -> Game:
-        if self.exists(name):
-            raise GameAlreadyExistsException()
-
-        self._db.add(models.Game(name=name))
-        self._db.commit()
-        game = self._db.query(models.Game).filter(models.Game.name == name).first()
-        return Game(session_id, SQLAlchemyGameBackend(game.id, self._db))
+        # the unique index on the name rejects duplicates, even concurrent ones
+        for _ in range(MAX_CREATE_ATTEMPTS):
+            try:
+                result = self._db.execute(
+                    insert(models.Game).values(id=self._allocate_id(), name=name)
+                )
+                self._db.commit()
+                break
+            except IntegrityError:
+                self._db.rollback()
+                # otherwise the counter has been created concurrently
+                if self.exists(name):
+                    raise GameAlreadyExistsException()
+        else:
+            raise Exception(f"Could not allocate an id for game '{name}'")
+        game_id = result.inserted_primary_key[0]
+        self._game_ids.put(name, game_id)
+        return Game(session_id, SQLAlchemyGameBackend(game_id, self._db))
 
     def _get_random_words(self) -> List[Word]:
         all_words = self._db.query(models.Word).all()
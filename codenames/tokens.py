@@ -0,0 +1,74 @@
+"""Signed seat tokens.
+
+Joining a game issues a token that names the game and the color and role of
+the seat, signed with HMAC-SHA256. Actions are authorized by verifying the
+token, which needs neither the database nor state shared between workers,
+only the same secret (`CODENAMES_TOKEN_SECRET`). Game ids are never reused,
+so a token is only valid for the game it has been issued for. Tokens expire
+after a TTL.
+"""
+
+from typing import Optional, Tuple
+import base64
+import hashlib
+import hmac
+import time
+
+from codenames.game import Color, Role
+
+SEAT_COOKIE_PREFIX = "seat_"
+DEFAULT_TOKEN_TTL = 7 * 24 * 60 * 60  # second
+
+
+class InvalidTokenException(Exception):
+    def __init__(self, message: str):
+        super().__init__(message)
+        self._message = message
+
+    @property
+    def message(self):
+        return self._message
+
+
+def seat_cookie(game_id: int) -> str:
+    """The name of the cookie with the seat token of a game."""
+    return f"{SEAT_COOKIE_PREFIX}{game_id}"
+
+
+class SeatTokens:
+    def __init__(self, secret: bytes, ttl: int = DEFAULT_TOKEN_TTL):
+        self._secret = secret
+        self._ttl = ttl
+
+    def _sign(self, payload: str) -> str:
+        digest = hmac.new(self._secret, payload.encode(), hashlib.sha256).digest()
+        return base64.urlsafe_b64encode(digest).rstrip(b"=").decode()
+
+    def issue(
+        self,
+        game_id: int,
+        color: Color,
+        role: Role,
+        now: Optional[int] = None,
+    ) -> str:
+        expires = (int(time.time()) if now is None else now) + self._ttl
+        payload = f"{game_id}.{color.value}.{role.value}.{expires}"
+        return f"{payload}.{self._sign(payload)}"
+
+    def verify(
+        self, token: str, game_id: int, now: Optional[int] = None
+    ) -> Tuple[Color, Role]:
+        """The seat of a valid token of the given game."""
+        payload, _, signature = token.rpartition(".")
+        if not hmac.compare_digest(self._sign(payload), signature):
+            raise InvalidTokenException("Invalid seat token")
+        try:
+            token_game_id, color, role, expires = (int(v) for v in payload.split("."))
+            seat = Color(color), Role(role)
+        except ValueError:
+            raise InvalidTokenException("Malformed seat token")
+        if token_game_id != game_id:
+            raise InvalidTokenException("The seat token is for another game")
+        if expires <= (int(time.time()) if now is None else now):
+            raise InvalidTokenException("The seat token has expired")
+        return seat
@@ -13,6 +13,7 @@ const RED_COLOR_ID = 1;
 const BLUE_COLOR_ID = 2;
 const PLAYER_ROLE_ID = 1;
 const SPYMASTER_ROLE_ID = 2;
+const SIMILARITY_DEBOUNCE_MS = 150;
 
 export default function App() {
   return (
@@ -252,6 +253,8 @@ function Game() {
   const [hint, setHint] = useState(null);
   const [similarities, setSimilarities] = useState(null);
   const modalDiv = useRef(null)
+  const similarityTimeout = useRef(null);
+  const similarityRequest = useRef(null);
 
   useEffect(() => {
       fetch(`/games/${gameId}/words`).then(res => res.json()).then(data => {
@@ -278,11 +281,25 @@ function Game() {
   }
 
   function handleHintChange(event) {
-    fetch(`/games/${gameId}/similarity?` + new URLSearchParams({
-        hint: event.target.value,
-    })).then(res => res.json()).then(data => {
-      setSimilarities(data)
-    });
+    // only query the latest hint once typing pauses and drop stale responses
+    const hint = event.target.value;
+    clearTimeout(similarityTimeout.current);
+    if (similarityRequest.current) {
+      similarityRequest.current.abort();
+    }
+    similarityTimeout.current = setTimeout(() => {
+      const controller = new AbortController();
+      similarityRequest.current = controller;
+      fetch(`/games/${gameId}/similarity?` + new URLSearchParams({
+          hint: hint,
+      }), { signal: controller.signal }).then(res => res.json()).then(data => {
+        setSimilarities(data)
+      }).catch(err => {
+        if (err.name !== 'AbortError') {
+          throw err;
+        }
+      });
+    }, SIMILARITY_DEBOUNCE_MS);
   }
 
   if (!words) {
@@ -7,6 +7,14 @@ from alembic.config import Config as AlembicConfig
 import pytest
 
 
+@pytest.fixture(autouse=True)
+def clear_game_ids():
+    """Every test starts with a new database, so cached game ids are stale."""
+    from codenames.sql import GAME_IDS
+
+    GAME_IDS.clear()
+
+
 @pytest.fixture
 def db_session():
     engine = create_engine("sqlite:///:memory:", echo=True)
@@ -28,3 +36,20 @@ def db_session():
 
     engine.dispose()
     print("\n----- RELEASE TEST DB CONNECTION POOL\n")
+
+
+@pytest.fixture
+def floret_vectors():
+    """Subword vectors over a small random floret table."""
+    import numpy as np
+    import spacy
+    from spacy.vectors import Vectors
+
+    from codenames.embeddings import SubwordVectors
+
+    nlp = spacy.blank("en")
+    data = np.random.default_rng(0).standard_normal((500, 8)).astype("float32")
+    nlp.vocab.vectors = Vectors(
+        strings=nlp.vocab.strings, data=data, mode="floret", minn=3, maxn=5
+    )
+    return SubwordVectors.from_vectors(nlp.vocab.vectors)
@@ -0,0 +1,116 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from codenames import models
+from codenames.analytics import GameAnalytics
+from codenames.archive import archive_game
+from codenames.sql import SQLAlchemyGameBackend
+from utils import create_default_game, add_players, play_default_game
+
+
+@pytest.fixture
+def archive_session(db_session):
+    engine = create_engine("sqlite:///:memory:")
+    models.ArchiveBase.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+
+    create_default_game(db_session)
+    add_players(db_session)
+    play_default_game(SQLAlchemyGameBackend(42, db_session))
+    archive_game(db_session, session, 42, now=1000)
+
+    yield session
+    session.close()
+    engine.dispose()
+
+
+class TestGameAnalytics:
+    def test_stats_of_archived_games(self, archive_session):
+        # given
+        analytics = GameAnalytics(min_appearances=1)
+
+        # when
+        num_added = analytics.refresh(archive_session)
+        stats = analytics.stats()
+
+        # then
+        assert num_added == 1
+        assert stats["num_games"] == 1
+        assert stats["win_rate_by_first_team"]["BLUE"] == {"games": 1, "win_rate": 1.0}
+        assert stats["win_rate_by_first_team"]["RED"]["win_rate"] is None
+        assert stats["guesses_per_hint"] == 1.0  # 4 guesses, 4 hints
+        assert stats["assassin_rate"] == 1.0
+        hardest = {w["word"]: w for w in stats["hardest_words"]}
+        # word 4 (blue) has been guessed by red
+        assert hardest["New York"] == {
+            "word": "New York",
+            "appearances": 1,
+            "found_rate": 0.0,
+            "confused_rate": 1.0,
+        }
+
+    def test_refresh_adds_new_games_only(self, archive_session):
+        # given
+        analytics = GameAnalytics()
+        analytics.refresh(archive_session)
+        archived = archive_session.query(models.ArchivedGame).one()
+        archive_session.add(
+            models.ArchivedGame(
+                id=43,
+                name="other",
+                condition=archived.condition,
+                finished_at=archived.finished_at,
+                archived_at=archived.archived_at,
+                data=archived.data,
+            )
+        )
+        archive_session.commit()
+
+        # when
+        num_added = analytics.refresh(archive_session)
+        second = analytics.refresh(archive_session)
+
+        # then
+        assert (num_added, second) == (1, 0)
+        assert analytics.num_games == 2
+        assert analytics.stats()["win_rate_by_first_team"]["BLUE"]["games"] == 2
+
+    def test_refresh_in_batches_of_games_archived_at_once(self, archive_session):
+        # given
+        analytics = GameAnalytics()
+        archived = archive_session.query(models.ArchivedGame).one()
+
+        def archive(game_id, archived_at):
+            archive_session.add(
+                models.ArchivedGame(
+                    id=game_id,
+                    name=f"game{game_id}",
+                    condition=archived.condition,
+                    finished_at=archived.finished_at,
+                    archived_at=archived_at,
+                    data=archived.data,
+                )
+            )
+            archive_session.commit()
+
+        for game_id in [43, 44, 45, 46]:
+            archive(game_id, archived.archived_at)
+
+        # when
+        num_added = analytics.refresh(archive_session, batch_size=2)
+        archive(7, archived.archived_at + 1)  # an id lower than all others
+        later = analytics.refresh(archive_session, batch_size=2)
+
+        # then
+        assert (num_added, later) == (5, 1)
+        assert analytics.num_games == 6
+
+    def test_cached_stats(self, archive_session):
+        # given
+        analytics = GameAnalytics()
+        stats = analytics.cached_stats(archive_session, max_age=60)
+        archive_session.query(models.ArchivedGame).delete()
+
+        # when / then
+        assert analytics.cached_stats(archive_session, max_age=60) is stats
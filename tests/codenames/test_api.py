@@ -1,8 +1,23 @@
-from codenames.api import app, get_game_manager, get_game_backend
+from codenames.api import (
+    app,
+    get_game_manager,
+    get_game_backend,
+    get_broadcasters,
+    get_game_backend_opener,
+    get_broker,
+    get_db,
+    get_admin_token,
+    broadcasters,
+)
+from codenames.broadcast import BroadcasterRegistry
+from codenames.broker import InMemoryBroker
 from codenames.models import Base
 from codenames.sql import SQLAlchemyGameManager, SQLAlchemyGameBackend
 from codenames.game import Color, Role, Condition
 
+from contextlib import contextmanager
+import json
+
 import alembic
 from alembic.config import Config
 from pytest import fixture
@@ -12,6 +27,7 @@ from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 
 SQLALCHEMY_DATABASE_URL = "sqlite:///instance/test.sqlite"
+ADMIN_TOKEN = "moderatortoken"
 
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
@@ -32,6 +48,14 @@ def get_test_game_manager():
         db.close()
 
 
+def get_test_db():
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
 def get_test_game_backend(game_id: int):
     db = TestingSessionLocal()
     backend = SQLAlchemyGameBackend(game_id, db)
@@ -41,8 +65,45 @@ def get_test_game_backend(game_id: int):
         db.close()
 
 
+@contextmanager
+def open_test_game_backend(game_id: int):
+    db = TestingSessionLocal()
+    try:
+        yield SQLAlchemyGameBackend(game_id, db)
+    finally:
+        db.close()
+
+
+def get_test_game_backend_opener():
+    return open_test_game_backend
+
+
+def load_test_game_info(game_id: int):
+    with open_test_game_backend(game_id) as backend:
+        return backend.load()
+
+
+test_broker = InMemoryBroker()
+test_broadcasters = BroadcasterRegistry(
+    load_test_game_info, test_broker, broadcasters.config
+)
+
+
+def get_test_broker():
+    return test_broker
+
+
+def get_test_broadcasters():
+    return test_broadcasters
+
+
 app.dependency_overrides[get_game_manager] = get_test_game_manager
 app.dependency_overrides[get_game_backend] = get_test_game_backend
+app.dependency_overrides[get_broker] = get_test_broker
+app.dependency_overrides[get_broadcasters] = get_test_broadcasters
+app.dependency_overrides[get_game_backend_opener] = get_test_game_backend_opener
+app.dependency_overrides[get_db] = get_test_db
+app.dependency_overrides[get_admin_token] = lambda: ADMIN_TOKEN
 
 
 @fixture
@@ -76,19 +137,37 @@ def test_game_api(client, test_db):
     assert response.status_code == 200, response.text
     assert len(response.json()) == 1
 
-    # add players
-    for player_id, color, role, name in [
-        ("p1", Color.RED, Role.PLAYER, "mike"),
-        ("p2", Color.RED, Role.SPYMASTER, "rita"),
-        ("p3", Color.BLUE, Role.PLAYER, "tim"),
-        ("p4", Color.BLUE, Role.SPYMASTER, "miri"),
-    ]:
-        response = client.put(
-            f"/games/{game_id}/join",
-            json={"color_id": color.value, "role_id": role.value, "name": name},
-            headers={"Cookie": f"session_id={player_id}"},
-        )
-        assert response.status_code == 200, response.text
+    # add a player, who is joined by AI players in the other roles
+    response = client.put(
+        f"/games/{game_id}/join",
+        json={
+            "color_id": Color.RED.value,
+            "role_id": Role.PLAYER.value,
+            "name": "mike",
+        },
+        headers={"Cookie": "session_id=p1"},
+    )
+    assert response.status_code == 200, response.text
+
+    response = client.put(
+        f"/games/{game_id}/join",
+        json={
+            "color_id": Color.RED.value,
+            "role_id": Role.SPYMASTER.value,
+            "name": "rita",
+        },
+        headers={"Cookie": "session_id=p2"},
+    )
+    assert response.status_code == 403, response.text
+
+    response = client.get(f"/games/{game_id}/players")
+    assert response.status_code == 200, response.text
+    assert [(p["session_id"], p["color"], p["role"]) for p in response.json()] == [
+        ("p1", Color.RED.value, Role.PLAYER.value),
+        ("p1-ai1", Color.BLUE.value, Role.PLAYER.value),
+        ("p1-ai2", Color.RED.value, Role.SPYMASTER.value),
+        ("p1-ai3", Color.BLUE.value, Role.SPYMASTER.value),
+    ]
 
     response = client.put(
         f"/games/{game_id}/start", headers={"Cookie": f"session_id=p1"}
@@ -99,7 +178,7 @@ def test_game_api(client, test_db):
     response = client.put(
         f"/games/{game_id}/give_hint",
         json={"word": "myhint", "num": 2},
-        headers={"Cookie": f"session_id=p4"},
+        headers={"Cookie": f"session_id=p1-ai3"},
     )
     assert response.status_code == 200, response.text
 
@@ -108,11 +187,11 @@ def test_game_api(client, test_db):
     assert len(response.json()) == 2
 
     # three correct guesses
-    for word_id in [21, 17, 22]:
+    for word_id in [21, 23, 25]:
         response = client.put(
             f"/games/{game_id}/guess",
             json={"word_id": word_id},
-            headers={"Cookie": f"session_id=p3"},
+            headers={"Cookie": f"session_id=p1-ai1"},
         )
         assert response.status_code == 200, f"'{response.text}', {word_id}"
 
@@ -120,7 +199,7 @@ def test_game_api(client, test_db):
     response = client.put(
         f"/games/{game_id}/give_hint",
         json={"word": "nexthint", "num": 5},
-        headers={"Cookie": f"session_id=p2"},
+        headers={"Cookie": f"session_id=p1-ai2"},
     )
     assert response.status_code == 200, response.text
 
@@ -131,7 +210,7 @@ def test_game_api(client, test_db):
     # one guess and then end turn
     response = client.put(
         f"/games/{game_id}/guess",
-        json={"word_id": 1},
+        json={"word_id": 2},
         headers={"Cookie": f"session_id=p1"},
     )
     assert response.status_code == 200, response.text
@@ -145,7 +224,7 @@ def test_game_api(client, test_db):
     response = client.put(
         f"/games/{game_id}/give_hint",
         json={"word": "nexthint", "num": 5},
-        headers={"Cookie": f"session_id=p4"},
+        headers={"Cookie": f"session_id=p1-ai3"},
     )
     assert response.status_code == 200, response.text
 
@@ -157,7 +236,7 @@ def test_game_api(client, test_db):
     response = client.put(
         f"/games/{game_id}/guess",
         json={"word_id": 10},
-        headers={"Cookie": f"session_id=p3"},
+        headers={"Cookie": f"session_id=p1-ai1"},
     )
     assert response.status_code == 200, response.text
 
@@ -165,7 +244,7 @@ def test_game_api(client, test_db):
     response = client.put(
         f"/games/{game_id}/give_hint",
         json={"word": "anotherhint", "num": 4},
-        headers={"Cookie": f"session_id=p2"},
+        headers={"Cookie": f"session_id=p1-ai2"},
     )
     assert response.status_code == 200, response.text
 
@@ -176,7 +255,7 @@ def test_game_api(client, test_db):
     # guess of assassin ends game and blue wins
     response = client.put(
         f"/games/{game_id}/guess",
-        json={"word_id": 8},
+        json={"word_id": 15},
         headers={"Cookie": f"session_id=p1"},
     )
     assert response.status_code == 200, response.text
@@ -185,3 +264,147 @@ def test_game_api(client, test_db):
     assert response.status_code == 200, response.text
     assert len(response.json()) == 13
     assert response.json()[-1]["condition"] == Condition.BLUE_WINS.value
+
+
+def test_game_socket(client, test_db):
+    # given
+    response = client.post("/games/", json={"name": "sockettestgame"})
+    assert response.status_code == 200, response.text
+    game_id = response.json()["game_id"]
+
+    with client.websocket_connect(
+        f"/ws/games/{game_id}", headers={"Cookie": "session_id=p1"}
+    ) as websocket:
+        initial = json.loads(websocket.receive_bytes())
+        assert initial[0]["t"] == "snapshot"
+        assert len(initial[0]["data"]["words"]) == 28
+
+        # when
+        websocket.send_json(
+            {
+                "action": "join",
+                "color_id": Color.RED.value,
+                "role_id": Role.SPYMASTER.value,
+                "name": "mike",
+            }
+        )
+        joined = json.loads(websocket.receive_bytes())
+
+        websocket.send_json({"action": "start"})
+        started = json.loads(websocket.receive_bytes())
+
+        websocket.send_json({"action": "guess", "word_id": 1})
+        error = json.loads(websocket.receive_bytes())
+
+    # then
+    assert [e["t"] for e in joined] == ["player_joined"] * 4
+    assert joined[0]["name"] == "mike"
+    assert started == [
+        {"t": "condition_appended", "value": Condition.BLUE_SPY.value, "hint_id": None}
+    ]
+    assert error[0]["t"] == "error"
+    assert error[0]["status"] == 401
+
+
+def test_seat_token_api(client, test_db):
+    # given
+    response = client.post("/games/", json={"name": "tokentestgame"})
+    assert response.status_code == 200, response.text
+    game_id = response.json()["game_id"]
+    response = client.put(
+        f"/games/{game_id}/join",
+        json={
+            "color_id": Color.BLUE.value,
+            "role_id": Role.SPYMASTER.value,
+            "name": "mike",
+        },
+        headers={"Cookie": "session_id=p1"},
+    )
+    assert response.status_code == 200, response.text
+    token = response.json()["token"]
+    assert response.cookies[f"seat_{game_id}"] == token
+    client.put(f"/games/{game_id}/start", headers={"Cookie": "session_id=p1"})
+
+    # when
+    forged = client.put(
+        f"/games/{game_id}/give_hint",
+        json={"word": "sky", "num": 2},
+        headers={"Cookie": f"seat_{game_id}={token[:-1]}"},
+    )
+    given = client.put(
+        f"/games/{game_id}/give_hint",
+        json={"word": "sky", "num": 2},
+        headers={"Cookie": f"seat_{game_id}={token}"},
+    )
+
+    # then
+    assert forged.status_code == 401, forged.text
+    assert given.status_code == 200, given.text
+
+
+def test_replay_api(client, test_db):
+    # given
+    response = client.post("/games/", json={"name": "replaytestgame"})
+    assert response.status_code == 200, response.text
+    game_id = response.json()["game_id"]
+    headers = {"Cookie": "session_id=p1"}
+    client.put(
+        f"/games/{game_id}/join",
+        json={
+            "color_id": Color.BLUE.value,
+            "role_id": Role.SPYMASTER.value,
+            "name": "mike",
+        },
+        headers=headers,
+    )
+    client.put(f"/games/{game_id}/start", headers=headers)
+    client.put(
+        f"/games/{game_id}/give_hint", json={"word": "sky", "num": 2}, headers=headers
+    )
+
+    # when
+    replay = client.get(f"/games/{game_id}/replay")
+    state = client.get(f"/games/{game_id}/replay/state", params={"step": 1})
+    admin_headers = {"Authorization": f"Bearer {ADMIN_TOKEN}"}
+    anonymous_undo = client.put(f"/admin/games/{game_id}/undo")
+    player_undo = client.put(
+        f"/admin/games/{game_id}/undo", headers={"Authorization": "Bearer p1"}
+    )
+    undo = client.put(f"/admin/games/{game_id}/undo", headers=admin_headers)
+    conditions = client.get(f"/games/{game_id}/conditions")
+    anonymous_redo = client.put(f"/admin/games/{game_id}/redo")
+    redo = client.put(f"/admin/games/{game_id}/redo", headers=admin_headers)
+    second_redo = client.put(f"/admin/games/{game_id}/redo", headers=admin_headers)
+
+    # then
+    assert replay.status_code == 200, replay.text
+    assert [e[0] for e in replay.json()["events"]] == ["start", "hint"]
+    assert all(color is None for _, _, color in replay.json()["words"])
+    assert state.status_code == 200, state.text
+    assert len(state.json()["conditions"]) == 2
+    assert anonymous_undo.status_code == 401
+    assert player_undo.status_code == 403
+    assert anonymous_redo.status_code == 401
+    assert undo.status_code == 200, undo.text
+    assert undo.json()["event"][2:] == ["sky", 2]
+    assert len(conditions.json()) == 2
+    assert redo.status_code == 200, redo.text
+    assert second_redo.status_code == 409
+    assert len(client.get(f"/games/{game_id}/conditions").json()) == 3
+
+
+def test_metrics(client, test_db):
+    # given
+    client.post("/games/", json={"name": "metricstestgame"})
+
+    # when
+    response = client.get("/metrics")
+
+    # then
+    assert response.status_code == 200, response.text
+    assert response.headers["content-type"].startswith("text/plain")
+    assert (
+        'codenames_http_request_duration_seconds_count{method="POST",route="/games/",status="200"}'
+        in response.text
+    )
+    assert "codenames_stream_subscribers 0" in response.text
@@ -0,0 +1,114 @@
+import time
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from codenames import models
+from codenames.archive import (
+    ArchiveConflictException,
+    archive_finished_games,
+    archive_game,
+    load_archived_game,
+    to_game_info,
+)
+from codenames.game import Condition
+from codenames.sql import SQLAlchemyGameBackend, SQLAlchemyGameManager
+from utils import create_default_game, add_players, play_default_game
+
+
+@pytest.fixture
+def archive_session():
+    engine = create_engine("sqlite:///:memory:")
+    models.ArchiveBase.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+class TestArchive:
+    @pytest.fixture
+    def backend(self, db_session):
+        create_default_game(db_session)
+        add_players(db_session)
+        backend = SQLAlchemyGameBackend(42, db_session)
+        play_default_game(backend)
+        return backend
+
+    def test_archive_finished_games(self, backend, db_session, archive_session):
+        # given
+        expected = backend.load()
+        SQLAlchemyGameManager(db_session).create_random("running", "A1")
+
+        # when
+        num_archived = archive_finished_games(
+            db_session, archive_session, min_age=60, now=int(time.time()) + 61
+        )
+
+        # then
+        assert num_archived == 1
+        assert db_session.query(models.Game).filter_by(id=42).first() is None
+        for model in [models.ActiveWord, models.Move, models.Condition]:
+            assert db_session.query(model).filter_by(game_id=42).count() == 0
+        assert db_session.query(models.Game).filter_by(name="running").count() == 1
+
+        archived = load_archived_game(archive_session, 42)
+        assert archived.name == "mygame"
+        assert archived.condition == Condition.BLUE_WINS.value
+        assert to_game_info(archived) == expected
+        assert load_archived_game(archive_session, name="mygame").id == 42
+
+    def test_recently_finished_games_are_kept(
+        self, backend, db_session, archive_session
+    ):
+        # when
+        num_archived = archive_finished_games(
+            db_session, archive_session, min_age=60, now=int(time.time())
+        )
+
+        # then
+        assert num_archived == 0
+        assert db_session.query(models.Game).filter_by(id=42).count() == 1
+        assert load_archived_game(archive_session, 42) is None
+
+    def test_archived_games_are_not_overwritten(
+        self, backend, db_session, archive_session
+    ):
+        # given
+        archive_session.add(
+            models.ArchivedGame(id=42, name="othergame", condition=0, archived_at=0)
+        )
+        archive_session.commit()
+
+        # when
+        with pytest.raises(ArchiveConflictException):
+            archive_game(db_session, archive_session, 42)
+
+        # then
+        assert load_archived_game(archive_session, 42).name == "othergame"
+        assert db_session.query(models.Game).filter_by(id=42).count() == 1
+
+    def test_conflicting_games_are_skipped(self, backend, db_session, archive_session):
+        # given
+        archive_session.add(
+            models.ArchivedGame(id=42, name="othergame", condition=0, archived_at=0)
+        )
+        archive_session.commit()
+        later = SQLAlchemyGameManager(db_session).create_random("later", "A1")
+        SQLAlchemyGameBackend(later.id, db_session).add_condition(Condition.RED_WINS)
+
+        # when
+        num_archived = archive_finished_games(
+            db_session,
+            archive_session,
+            min_age=60,
+            now=int(time.time()) + 61,
+            batch_size=1,
+        )
+
+        # then
+        assert num_archived == 1
+        assert db_session.query(models.Game).filter_by(id=42).count() == 1
+        assert load_archived_game(archive_session, 42).name == "othergame"
+        assert load_archived_game(archive_session, later.id).name == "later"
@@ -0,0 +1,254 @@
+import asyncio
+import json
+
+from codenames.broadcast import (
+    BroadcasterRegistry,
+    GameBroadcaster,
+    Snapshot,
+    StreamConfig,
+    Subscriber,
+)
+from codenames.broker import InMemoryBroker
+from codenames.game import Color, Condition, Game
+from codenames.replay import Replay, undo_last_action
+from codenames.sql import SQLAlchemyGameBackend
+
+from utils import create_default_game, add_players
+
+
+def decode(frame: bytes):
+    data = [
+        line[len("data: ") :]
+        for line in frame.decode().splitlines()
+        if line.startswith("data: ")
+    ]
+    return json.loads("\n".join(data))
+
+
+class TestSnapshot:
+    def test_operatives_do_not_see_colors(self, db_session):
+        # given
+        backend = SQLAlchemyGameBackend(42, db_session)
+        create_default_game(db_session)
+        add_players(db_session)  # A100 and A22 are spymasters, A21 is a player
+        backend.add_guess(1)
+
+        # when
+        snapshot = Snapshot.encode(backend.load())
+        spymaster_words = decode(snapshot.frame_for("A100"))["words"]
+        operative_words = decode(snapshot.frame_for("A21"))["words"]
+        spectator_words = decode(snapshot.frame_for(None))["words"]
+
+        # then
+        assert spymaster_words["2"]["color"]["_value_"] == Color.BLUE.value
+        assert operative_words["2"]["color"] is None
+        assert operative_words["1"]["color"]["_value_"] == Color.RED.value
+        assert spectator_words == operative_words
+
+    def test_variants_are_shared_between_subscribers(self, db_session):
+        # given
+        backend = SQLAlchemyGameBackend(42, db_session)
+        create_default_game(db_session)
+        add_players(db_session)
+
+        # when
+        snapshot = Snapshot.encode(backend.load())
+
+        # then
+        assert snapshot.frame_for("A100") is snapshot.frame_for("A22")
+        assert snapshot.frame_for("A21") is snapshot.frame_for("A23")
+
+    def test_finished_games_reveal_all_colors(self, db_session):
+        # given
+        backend = SQLAlchemyGameBackend(42, db_session)
+        create_default_game(db_session)
+        backend.add_condition(Condition.RED_WINS)
+
+        # when
+        snapshot = Snapshot.encode(backend.load())
+
+        # then
+        assert snapshot.operative_frame == snapshot.spymaster_frame
+
+
+class TestGameBroadcaster:
+    def test_publishes_each_version_once(self, db_session):
+        # given
+        backend = SQLAlchemyGameBackend(42, db_session)
+        create_default_game(db_session)
+        add_players(db_session)
+
+        async def run():
+            broadcaster = GameBroadcaster(
+                42, lambda _: backend.load(), StreamConfig(resync_interval=60)
+            )
+            spymaster = broadcaster.subscribe("A100")
+            operative = broadcaster.subscribe("A21")
+            await asyncio.sleep(0)  # initial load by the polling task
+
+            published = [broadcaster.publish(backend.load())]
+            backend.add_guess(2)
+            published.append(broadcaster.publish(backend.load()))
+
+            frames = [await spymaster.get(), await spymaster.get()]
+            frames += [await operative.get(), await operative.get()]
+            broadcaster.unsubscribe(spymaster)
+            broadcaster.unsubscribe(operative)
+            return published, frames, broadcaster.num_subscribers
+
+        # when
+        published, frames, num_subscribers = asyncio.run(run())
+
+        # then
+        assert published == [False, True]
+        assert decode(frames[0])["words"]["7"]["color"] is not None
+        assert decode(frames[2])["words"]["7"]["color"] is None
+        assert decode(frames[3])["words"]["2"]["selected_at"]
+        assert num_subscribers == 0
+
+    def test_publishes_a_different_action_after_an_undo(self, db_session):
+        # given
+        backend = SQLAlchemyGameBackend(42, db_session)
+        create_default_game(db_session)
+        add_players(db_session)
+        Game("A100", backend).load_state().start_game()
+        Game("A100", backend).load_state().give_hint("sky", 2)
+        Game("A21", backend).load_state().guess(2)
+
+        async def run():
+            broadcaster = GameBroadcaster(
+                42, lambda _: backend.load(), StreamConfig(resync_interval=60)
+            )
+            subscriber = broadcaster.subscribe("A21", deltas=True)
+            await asyncio.sleep(0)  # initial load by the polling task
+            initial = await subscriber.get()
+
+            undo_last_action(db_session, Replay.load(db_session, 42))
+            Game("A21", backend).load_state().guess(4)
+            published = broadcaster.publish(backend.load())
+            update = await asyncio.wait_for(subscriber.get(), timeout=1)
+            broadcaster.unsubscribe(subscriber)
+            return initial, published, update
+
+        # when
+        initial, published, update = asyncio.run(run())
+
+        # then
+        assert json.loads(initial)[0]["data"]["words"]["2"]["selected_at"]
+        assert published
+        words = json.loads(update)[0]["data"]["words"]
+        assert not words["2"]["selected_at"]
+        assert words["4"]["selected_at"]
+
+    def test_reloads_when_notified_by_broker(self, db_session):
+        # given
+        backend = SQLAlchemyGameBackend(42, db_session)
+        create_default_game(db_session)
+        add_players(db_session)
+        broker = InMemoryBroker()
+
+        async def run():
+            registry = BroadcasterRegistry(
+                lambda _: backend.load(), broker, StreamConfig(resync_interval=60)
+            )
+            broadcaster = registry.get(42)
+            subscriber = broadcaster.subscribe("A21")
+            initial = await subscriber.get()
+
+            backend.add_guess(2)
+            broker.publish(42)
+            broker.publish(7)  # no broadcaster for this game
+            update = await asyncio.wait_for(subscriber.get(), timeout=1)
+            broadcaster.unsubscribe(subscriber)
+            return initial, update
+
+        # when
+        initial, update = asyncio.run(run())
+
+        # then
+        assert not decode(initial)["words"]["2"]["selected_at"]
+        assert decode(update)["words"]["2"]["selected_at"]
+
+    def test_removes_broadcasters_without_subscribers(self, db_session):
+        # given
+        backend = SQLAlchemyGameBackend(42, db_session)
+        create_default_game(db_session)
+        add_players(db_session)
+
+        async def run():
+            registry = BroadcasterRegistry(
+                lambda _: backend.load(), InMemoryBroker(), StreamConfig()
+            )
+            broadcaster = registry.get(42)
+            first = broadcaster.subscribe("A21")
+            second = broadcaster.subscribe("B21")
+            broadcaster.unsubscribe(first)
+            remaining = list(registry)
+            broadcaster.unsubscribe(second)
+            return broadcaster, remaining, list(registry), registry.get(42)
+
+        # when
+        broadcaster, remaining, registered, renewed = asyncio.run(run())
+
+        # then
+        assert remaining == [broadcaster]
+        assert registered == []
+        assert renewed is not broadcaster
+
+
+class TestSubscriber:
+    def test_lagging_subscriber_is_coalesced_to_latest_snapshot(self, db_session):
+        # given
+        backend = SQLAlchemyGameBackend(42, db_session)
+        create_default_game(db_session)
+        add_players(db_session)
+
+        async def run():
+            subscriber = Subscriber("A21", deltas=True, max_queue_size=2)
+            subscriber.push(Snapshot.encode(backend.load()), initial=True)
+            previous = backend.load()
+            dropped = []
+            for word_id in [1, 2, 3]:
+                backend.add_guess(word_id)
+                snapshot = Snapshot.encode(backend.load(), previous)
+                previous = backend.load()
+                dropped.append(subscriber.push(snapshot))
+            return dropped, [await subscriber.get(), await subscriber.get()]
+
+        # when
+        dropped, frames = asyncio.run(run())
+
+        # then
+        assert dropped == [0, 2, 0]
+        assert json.loads(frames[0])[0]["t"] == "snapshot"
+        assert json.loads(frames[0])[0]["data"]["words"]["2"]["selected_at"]
+        assert json.loads(frames[1]) == [
+            {"t": "word_selected", "id": 3, "color": Color.RED.value}
+        ]
+
+    def test_backlogged_subscribers_are_evicted(self, db_session):
+        # given
+        backend = SQLAlchemyGameBackend(42, db_session)
+        create_default_game(db_session)
+        add_players(db_session)
+
+        async def run():
+            broadcaster = GameBroadcaster(
+                42,
+                lambda _: backend.load(),
+                StreamConfig(resync_interval=60, max_queue_size=1, eviction_timeout=0),
+            )
+            slow = broadcaster.subscribe("A21")
+            await asyncio.sleep(0)  # initial load fills the queue
+            backend.add_guess(2)
+            broadcaster.publish(backend.load())
+            return broadcaster, await slow.get()
+
+        # when
+        broadcaster, frame = asyncio.run(run())
+
+        # then
+        assert frame is None
+        assert broadcaster.num_subscribers == 0
+        assert broadcaster.num_evicted_subscribers == 1
+        assert broadcaster.num_dropped_frames == 1
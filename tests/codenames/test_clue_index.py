@@ -0,0 +1,122 @@
+import numpy as np
+import spacy
+
+from codenames.clue_index import (
+    ClueIndex,
+    build,
+    invalid_clues,
+    model_vocab,
+    stem,
+    top_k,
+)
+from codenames.embeddings import similarities
+
+BOARD_WORDS = ["Hollywood", "New York", "Ice Cream", "Bank"]
+VOCAB = ["movie", "city", "dessert", "money", "river", "star", "snow"]
+
+
+class TestBuild:
+    def test_similarities_of_board_words_and_clues(self, floret_vectors, tmp_path):
+        # when
+        index = build(str(tmp_path), floret_vectors, BOARD_WORDS, VOCAB, k=3)
+
+        # then
+        result = index.similarities(["new york", "Bank"])
+        assert result.shape == (2, len(VOCAB))
+        assert np.allclose(
+            result[0],
+            [similarities(floret_vectors, c, ["New York"])[0] for c in VOCAB],
+            atol=1e-3,
+        )
+
+    def test_written_index_is_memory_mapped(self, floret_vectors, tmp_path):
+        # given
+        build(str(tmp_path), floret_vectors, BOARD_WORDS, VOCAB, k=3)
+
+        # when
+        index = ClueIndex.load(str(tmp_path))
+
+        # then
+        matrix = np.load(tmp_path / "similarities.npy", mmap_mode="r")
+        assert matrix.dtype == np.float16
+        assert matrix.shape == (len(BOARD_WORDS), len(VOCAB))
+        assert index.vocab == VOCAB
+        assert "ice cream" in index
+        assert len(index.neighbours("Hollywood")) == 3
+
+
+class TestModelVocab:
+    def test_keeps_the_most_frequent_clues(self):
+        # given
+        nlp = spacy.blank("en")
+        for s in ["apple", "banana", "zebra", "Paris", "x1"]:
+            nlp.vocab.strings.add(s)
+        nlp.vocab.lookups.add_table(
+            "lexeme_prob", {"apple": -12.0, "banana": -15.0, "zebra": -9.0}
+        )
+
+        # when
+        result = model_vocab(nlp, max_size=2)
+
+        # then
+        assert result == ["apple", "zebra"]
+
+    def test_keeps_the_largest_vectors_without_frequencies(self):
+        # given
+        nlp = spacy.blank("en")
+        vectors = {"apple": [1.0, 0.0], "banana": [0.1, 0.1], "zebra": [0.0, 3.0]}
+        for word, vector in vectors.items():
+            nlp.vocab.set_vector(word, np.array(vector, dtype="float32"))
+
+        # when
+        result = model_vocab(nlp, max_size=2)
+
+        # then
+        assert result == ["apple", "zebra"]
+
+
+class TestTopK:
+    def test_best_first(self):
+        # given
+        similarities = np.array([[0.1, 0.9, 0.5, 0.7], [0.4, 0.3, 0.2, 0.1]])
+
+        # when
+        result = top_k(similarities, 2)
+
+        # then
+        assert result.tolist() == [[1, 3], [0, 1]]
+
+
+class TestValidity:
+    def test_board_words_rule_out_related_clues(self):
+        # given
+        vocab = ["wood", "hollywoods", "york", "creams", "spies", "berries", "river"]
+
+        # when
+        invalid = invalid_clues(["hollywood", "new york", "spy"], vocab)
+
+        # then
+        bits = np.unpackbits(invalid, axis=1, count=len(vocab)).astype(bool)
+        assert [vocab[i] for i in np.flatnonzero(bits[0])] == ["wood", "hollywoods"]
+        assert [vocab[i] for i in np.flatnonzero(bits[1])] == ["york"]
+        assert [vocab[i] for i in np.flatnonzero(bits[2])] == ["spies"]
+
+    def test_valid_mask_of_a_board(self, floret_vectors, tmp_path):
+        # given
+        vocab = VOCAB + ["banks", "icy", "creamy", "hollywoods"]
+        index = build(str(tmp_path), floret_vectors, BOARD_WORDS, vocab)
+
+        # when
+        mask = index.valid_mask(["Ice Cream", "Bank"])
+
+        # then
+        assert [c for c, valid in zip(vocab, mask) if not valid] == ["banks", "creamy"]
+
+    def test_stem(self):
+        assert [stem(w) for w in ["berries", "wolves", "spies", "bus", "ice"]] == [
+            "berry",
+            "wolf",
+            "spy",
+            "bus",
+            "ice",
+        ]
@@ -0,0 +1,125 @@
+from itertools import combinations
+
+import numpy as np
+
+from codenames.clue_index import ClueIndex
+from codenames.clues import best_clue, search
+
+TEAM = [f"team{i}" for i in range(9)]
+OTHERS = [f"other{i}" for i in range(16)]
+
+
+def random_index(vocab_size=300, seed=0, invalid_clues=()):
+    rng = np.random.default_rng(seed)
+    board_words = TEAM + OTHERS
+    vocab = [f"clue{i}" for i in range(vocab_size)]
+    similarities = rng.uniform(-0.2, 0.8, (len(board_words), vocab_size))
+    invalid = np.zeros((len(board_words), vocab_size), dtype=bool)
+    for row, clue in invalid_clues:
+        invalid[row, clue] = True
+    return ClueIndex(
+        board_words,
+        vocab,
+        similarities.astype(np.float16),
+        np.zeros((len(board_words), 0), dtype=np.int32),
+        np.packbits(invalid, axis=1),
+    )
+
+
+def notebook_clues(index, team_words, other_words, max_num_words=4):
+    """`produce_clues` of notebooks/word2vec.py: the best valid clue of every
+    subset of the team words by mean similarity."""
+    similarities = index.similarities(team_words)
+    valid = index.valid_mask(team_words + other_words)
+    best = {}
+    for k in range(1, max_num_words + 1):
+        for subset in combinations(range(len(team_words)), k):
+            scores = np.where(valid, similarities[list(subset)].mean(axis=0), -np.inf)
+            best[k] = max(best.get(k, -np.inf), scores.max())
+    return best
+
+
+class TestSearch:
+    def test_same_scores_as_enumerating_all_subsets(self):
+        # given
+        index = random_index(invalid_clues=[(0, 5), (3, 17), (20, 42)])
+
+        # when
+        clues = search(index, TEAM, OTHERS, margin=None)
+
+        # then
+        expected = notebook_clues(index, TEAM, OTHERS)
+        assert [c.num for c in clues] == [1, 2, 3, 4]
+        for clue in clues:
+            assert np.isclose(clue.score, expected[clue.num], atol=1e-5)
+
+    def test_targets_are_the_most_similar_team_words(self):
+        # given
+        index = random_index()
+
+        # when
+        clues = search(index, TEAM, OTHERS, margin=None)
+
+        # then
+        for clue in clues:
+            column = index.similarities(TEAM)[:, index.vocab.index(clue.word)]
+            expected = [TEAM[i] for i in np.argsort(-column, kind="stable")[: clue.num]]
+            assert list(clue.targets) == expected
+            assert np.isclose(
+                clue.score, column[np.argsort(-column)[: clue.num]].mean()
+            )
+
+    def test_targets_are_more_similar_than_all_other_words(self):
+        # given
+        index = random_index()
+
+        # when
+        clues = search(index, TEAM[:3], OTHERS, margin=0.05)
+
+        # then
+        assert clues
+        for clue in clues:
+            column = index.vocab.index(clue.word)
+            danger = index.similarities(OTHERS)[:, column].max()
+            assert (
+                index.similarities(list(clue.targets))[:, column].min() > danger + 0.05
+            )
+
+    def test_invalid_clues_are_never_given(self):
+        # given
+        index = random_index()
+        best = search(index, TEAM, OTHERS, margin=None)[0].word
+        index = random_index(
+            invalid_clues=[(TEAM.index("team8"), index.vocab.index(best))]
+        )
+
+        # when
+        clues = search(index, TEAM, OTHERS, margin=None)
+
+        # then
+        assert best not in [c.word for c in clues]
+
+
+class TestBestClue:
+    def test_most_targets_above_min_similarity(self):
+        # given
+        index = random_index()
+
+        # when
+        clue = best_clue(index, TEAM, OTHERS, margin=None, min_similarity=0.6)
+
+        # then
+        candidates = search(index, TEAM, OTHERS, margin=None)
+        assert clue == max(
+            (c for c in candidates if c.score >= 0.6), key=lambda c: c.num
+        )
+
+    def test_none_if_no_clue_is_safe(self):
+        # given
+        index = random_index()
+
+        # when
+        clue = best_clue(index, TEAM, OTHERS, margin=10.0)
+
+        # then
+        assert clue is None
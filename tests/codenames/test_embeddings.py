@@ -0,0 +1,177 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import numpy as np
+import spacy
+from pytest import fixture
+from spacy.vectors import Vectors
+
+from codenames.embeddings import (
+    ExecutorEmbeddingService,
+    SubwordVectors,
+    WordIndex,
+    get_index,
+    get_vectors,
+    phrase_vectors,
+    set_model,
+    similarities,
+)
+from codenames.metrics import EMBEDDING_BATCH_SIZE
+
+
+@fixture
+def nlp():
+    """A blank pipeline with a small random floret table."""
+    nlp = spacy.blank("en")
+    data = np.random.default_rng(0).standard_normal((500, 8)).astype("float32")
+    nlp.vocab.vectors = Vectors(
+        strings=nlp.vocab.strings,
+        data=data,
+        mode="floret",
+        minn=3,
+        maxn=5,
+        hash_count=2,
+    )
+    set_model(nlp, WORDS)
+    yield nlp
+    set_model(None)
+
+
+WORDS = ["Ocean", "Hollywood", "Bank", "Ice Cream"]
+
+
+class TestSimilarities:
+    def test_single_words_same_as_lexeme_similarity(self, nlp):
+        # given
+        words = WORDS[:3]
+        expected = [nlp.vocab["sea"].similarity(nlp.vocab[w.lower()]) for w in words]
+
+        # when
+        result = similarities(get_vectors(), "Sea", words)
+
+        # then
+        assert np.allclose(result, expected, atol=1e-6)
+
+    def test_indexed_words_same_as_computed(self, nlp):
+        # when
+        indexed = similarities(get_vectors(), "dessert", WORDS, get_index())
+        computed = similarities(get_vectors(), "dessert", WORDS)
+
+        # then
+        assert np.allclose(indexed, computed, atol=1e-6)
+
+
+class TestPhraseVectors:
+    def test_mean_of_token_vectors(self, nlp):
+        # given
+        vectors = get_vectors()
+
+        # when
+        result = phrase_vectors(vectors, ["Ice Cream", "ice-cream", "ice", " "])
+
+        # then
+        expected = vectors.get_batch(["ice", "cream"]).mean(axis=0)
+        assert np.allclose(result[0], expected)
+        assert np.allclose(result[1], expected)
+        assert np.allclose(result[2], vectors.get_batch(["ice"])[0])
+        assert not result[3].any()
+
+    def test_falls_back_to_spacy_without_ngram_hashes(self, nlp):
+        # given
+        floret = nlp.vocab.vectors
+        without_hashes = SimpleNamespace(
+            mode=floret.mode,
+            data=floret.data,
+            minn=floret.minn,
+            maxn=floret.maxn,
+            bow=floret.bow,
+            eow=floret.eow,
+            get_batch=floret.get_batch,
+        )
+        vectors = SubwordVectors.from_vectors(without_hashes)
+        strings = ["ocean", "hollywod", "ice cream"]
+
+        # when
+        result = vectors.get_batch(strings)
+
+        # then
+        assert np.allclose(result, floret.get_batch(strings), atol=1e-6)
+        assert "ocean" in vectors
+
+
+class TestWordIndex:
+    def test_words_are_indexed_case_insensitive(self, nlp):
+        # when
+        index = WordIndex(get_vectors(), WORDS + ["ocean"])
+
+        # then
+        assert len(index) == 4
+        assert "ICE CREAM" in index
+        assert "Sea" not in index
+        assert np.allclose(
+            index.norms[index.rows(["Ice Cream"])],
+            np.linalg.norm(phrase_vectors(get_vectors(), ["ice cream"])),
+        )
+
+
+class TestSubwordVectors:
+    def test_same_as_spacy_floret_vectors(self, nlp):
+        # given
+        vectors = SubwordVectors.from_vectors(nlp.vocab.vectors)
+        strings = ["ocean", "hollywod", "ice cream", "", "x", "ocean"]
+
+        # when
+        result = vectors.get_batch(strings)
+
+        # then
+        assert result.shape == (6, 8)
+        assert np.allclose(result, nlp.vocab.vectors.get_batch(strings), atol=1e-6)
+        assert not result[3].any()
+
+    def test_least_recently_used_vectors_are_evicted(self, nlp):
+        # given
+        vectors = SubwordVectors.from_vectors(nlp.vocab.vectors, cache_size=2)
+
+        # when
+        vectors.get_batch(["sea", "bank"])
+        vectors.get_batch(["sea", "movie"])
+        vectors.get_batch(["bank", "sea"])
+
+        # then
+        assert "bank" in vectors
+        assert "sea" in vectors
+        assert "movie" not in vectors
+
+
+class TestExecutorEmbeddingService:
+    def test_concurrent_requests_are_batched(self, nlp):
+        # given
+        service = ExecutorEmbeddingService(ThreadPoolExecutor(1), batch_window=0.05)
+        hints = ["sea", "movie", "money", "dessert", "snow"]
+        num_batches = EMBEDDING_BATCH_SIZE.count()
+
+        async def run():
+            return await asyncio.gather(
+                *[service.similarities(h, WORDS) for h in hints]
+            )
+
+        # when
+        results = asyncio.run(run())
+        service.close()
+
+        # then
+        assert EMBEDDING_BATCH_SIZE.count() == num_batches + 1
+        for hint, result in zip(hints, results):
+            assert np.allclose(result, similarities(get_vectors(), hint, WORDS))
+
+    def test_run(self, nlp):
+        # given
+        service = ExecutorEmbeddingService(ThreadPoolExecutor(1))
+
+        # when
+        result = asyncio.run(service.run(len, WORDS))
+        service.close()
+
+        # then
+        assert result == 4
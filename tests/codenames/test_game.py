@@ -4,6 +4,7 @@ import pytest
 
 from codenames.game import (
     AlreadyJoinedException,
+    AuthorizationException,
     Color,
     Condition,
     NotStartedGameState,
@@ -62,6 +63,52 @@ class TestNotStartedGameState:
             not_started_state.join(Color.RED, Role.PLAYER, "mike")
             not_started_state.join(Color.RED, Role.PLAYER, "jan")
 
+    def test_join_with_other_players(self, backend, not_started_state):
+        # when
+        not_started_state.join_with(
+            Color.RED,
+            Role.PLAYER,
+            "mike",
+            [
+                {
+                    "session_id": "mysessionid-ai1",
+                    "color": Color.BLUE,
+                    "role": Role.PLAYER,
+                    "name": "Ng (AI)",
+                }
+            ],
+        )
+
+        # then
+        players = backend.load()["players"]
+        assert [(p["session_id"], p["color"]) for p in players] == [
+            ("mysessionid", Color.RED),
+            ("mysessionid-ai1", Color.BLUE),
+        ]
+
+    def test_join_with_occupied_roles_seats_nobody(self, backend, not_started_state):
+        # given
+        NotStartedGameState("other", backend).join(Color.BLUE, Role.PLAYER, "lisa")
+
+        # when
+        with pytest.raises(RoleOccupiedException):
+            not_started_state.join_with(
+                Color.RED,
+                Role.PLAYER,
+                "mike",
+                [
+                    {
+                        "session_id": "mysessionid-ai1",
+                        "color": Color.BLUE,
+                        "role": Role.PLAYER,
+                        "name": "Ng (AI)",
+                    }
+                ],
+            )
+
+        # then
+        assert not backend.has_joined("mysessionid")
+
     def test_start_game_fails_if_any_role_is_still_open(self, not_started_state):
         # when / then
         with pytest.raises(StateException):
@@ -154,6 +201,30 @@ class TestSpyTurnGameState:
         assert latest_hint["num"] == 2
         assert latest_hint["color"] == color
 
+    def test_verified_seats_are_authorized_without_sessions(self, backend):
+        # given
+        backend.add_condition(Condition.BLUE_SPY)
+        seat = (Color.BLUE, Role.SPYMASTER)
+        state = SpyTurnGameState(None, backend, Color.BLUE, seat)
+        backend.get_active_session_id = MagicMock()
+
+        # when
+        state.give_hint("myhint", 2)
+
+        # then
+        assert backend.load()["conditions"][-1]["value"] == Condition.BLUE_PLAYER
+        backend.get_active_session_id.assert_not_called()
+
+    def test_verified_seats_are_authorized_in_their_turn_only(self, backend):
+        # given
+        backend.add_condition(Condition.BLUE_SPY)
+        seat = (Color.RED, Role.SPYMASTER)
+        state = SpyTurnGameState("A100", backend, Color.BLUE, seat)
+
+        # when / then
+        with pytest.raises(AuthorizationException):
+            state.give_hint("myhint", 2)
+
 
 class TestPlayerTurnGameState:
     @fixture
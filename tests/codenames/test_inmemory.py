@@ -0,0 +1,32 @@
+from codenames.game import Color, Condition, Game, Role
+from codenames.inmemory import InMemoryGameBackend
+from codenames.sql import SQLAlchemyGameBackend
+from utils import create_default_game, add_players
+
+
+class TestInMemoryGameBackend:
+    def test_plays_like_the_database(self, db_session):
+        # given
+        create_default_game(db_session)
+        add_players(db_session)
+        sql_backend = SQLAlchemyGameBackend(42, db_session)
+        sql_backend.add_condition(Condition.BLUE_SPY)
+        sql_backend.commit()
+        backend = InMemoryGameBackend(42, sql_backend.load())
+
+        # when
+        for b in [sql_backend, backend]:
+            Game("A100", b).load_state().give_hint("myhint", 2)
+            Game("A21", b).load_state().guess(2)  # blue
+            Game("A21", b).load_state().guess(5)  # neutral
+
+        # then
+        info, expected = backend.load(), sql_backend.load()
+        assert backend.get_active_session_id() == "A22"
+        assert [c["value"] for c in info["conditions"]] == [
+            c["value"] for c in expected["conditions"]
+        ]
+        assert {i: w.is_active for i, w in info["words"].items()} == {
+            i: w.is_active for i, w in expected["words"].items()
+        }
+        assert backend.is_occupied(Color.RED, Role.PLAYER)
@@ -0,0 +1,56 @@
+from codenames.loadtest import ActionLog, LoadTestStats, percentile
+
+
+class TestPercentile:
+    def test_nearest_rank(self):
+        # given
+        values = [float(v) for v in range(100, 0, -1)]
+
+        # when
+        result = [percentile(values, p) for p in [50, 95, 99, 100]]
+
+        # then
+        assert result == [50.0, 95.0, 99.0, 100.0]
+
+    def test_empty(self):
+        assert percentile([], 99) == 0.0
+
+
+class TestActionLog:
+    def test_delays_are_accounted_to_the_next_frame(self):
+        # given
+        actions = ActionLog()
+        actions.add(1.0)
+        failed = actions.add(2.0)
+        actions.add(3.0)
+        actions.add(5.0)
+
+        # when
+        actions.discard(failed)
+        delays = actions.delays_since(0, 4.0)
+
+        # then
+        assert delays == [3.0, 1.0]
+        assert actions.delays_since(3, 5.5) == [0.5]
+
+
+class TestLoadTestStats:
+    def test_report(self):
+        # given
+        stats = LoadTestStats()
+        stats.observe_request("PUT /games/{game_id}/guess", 0.1, True)
+        stats.observe_request("PUT /games/{game_id}/guess", 0.3, False)
+        stats.observe_request("GET /games/{game_id}/words", 0.2, True)
+        stats.observe_frame([0.05])
+
+        # when
+        report = stats.report()
+
+        # then
+        guess = report["endpoints"]["PUT /games/{game_id}/guess"]
+        assert guess["count"] == 2
+        assert guess["p99"] == 0.3
+        assert guess["error_rate"] == 0.5
+        assert report["error_rate"] == 1 / 3
+        assert report["propagation"]["p50"] == 0.05
+        assert report["frames"] == 1
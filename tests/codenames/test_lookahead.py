@@ -0,0 +1,143 @@
+import time
+
+import numpy as np
+import pytest
+
+from codenames.clue_index import ClueIndex
+from codenames.clues import Clue, best_clue
+from codenames.game import Color, Condition, Role, StateException, Word
+from codenames.inmemory import InMemoryGameBackend
+from codenames.lookahead import LookaheadConfig, MonteCarloSpymaster, play_turn
+
+COLORS = {
+    "blue1": Color.BLUE,
+    "blue2": Color.BLUE,
+    "blue3": Color.BLUE,
+    "red1": Color.RED,
+    "red2": Color.RED,
+    "red3": Color.RED,
+    "neutral": Color.NEUTRAL,
+    "assassin": Color.ASSASSIN,
+}
+VOCAB = ["risky", "safe", "redclue"]
+SIMILARITIES = {
+    # risky is the greedy choice for two blue words but close to the assassin
+    "risky": {"blue1": 0.9, "blue2": 0.9, "assassin": 0.88},
+    "safe": {"blue1": 0.7, "blue2": 0.7},
+    "redclue": {"red1": 0.8, "red2": 0.8},
+}
+
+
+@pytest.fixture
+def index():
+    board_words = list(COLORS)
+    similarities = np.zeros((len(board_words), len(VOCAB)), dtype=np.float16)
+    for j, clue in enumerate(VOCAB):
+        for word, sim in SIMILARITIES[clue].items():
+            similarities[board_words.index(word), j] = sim
+    return ClueIndex(
+        board_words,
+        VOCAB,
+        similarities,
+        np.zeros((len(board_words), 0), dtype=np.int32),
+        np.zeros((len(board_words), 1), dtype=np.uint8),
+    )
+
+
+def create_game_info(condition=Condition.BLUE_SPY):
+    return {
+        "words": {
+            i: Word(id=i, value=w, color=c, selected_at=None)
+            for i, (w, c) in enumerate(COLORS.items(), start=1)
+        },
+        "hints": [{"id": 1, "word": None, "num": None, "color": None}],
+        "conditions": [{"value": condition, "hint_id": None}],
+        "players": [
+            {"session_id": f"{c.name}-{r.name}", "color": c, "role": r, "name": ""}
+            for c in [Color.BLUE, Color.RED]
+            for r in [Role.SPYMASTER, Role.PLAYER]
+        ],
+    }
+
+
+class TestPlayTurn:
+    def test_turn_on_a_copy_of_the_game(self):
+        # given
+        game_info = create_game_info()
+        backend = InMemoryGameBackend(42, game_info)
+
+        # when
+        play_turn(backend, Clue("safe", 2, 0.7, ("blue1", "blue2")), [1, 2, 3])
+
+        # then
+        info = backend.load()
+        assert [info["words"][i].is_active for i in [1, 2, 3]] == [False, False, True]
+        assert info["conditions"][-1]["value"] == Condition.RED_SPY
+        assert info["hints"][-1]["word"] == "safe"
+        assert all(w.is_active for w in game_info["words"].values())
+
+    def test_turn_ends_with_a_wrong_guess(self):
+        # given
+        backend = InMemoryGameBackend(42, create_game_info())
+
+        # when
+        play_turn(backend, Clue("safe", 2, 0.7, ("blue1", "blue2")), [7, 1, 2])
+
+        # then
+        info = backend.load()
+        assert [info["words"][i].is_active for i in [7, 1, 2]] == [False, True, True]
+        assert info["conditions"][-1]["value"] == Condition.RED_SPY
+
+    def test_assassin_ends_the_game(self):
+        # given
+        backend = InMemoryGameBackend(42, create_game_info())
+
+        # when
+        play_turn(backend, Clue("risky", 2, 0.9, ("blue1", "blue2")), [8, 1])
+
+        # then
+        assert backend.load()["conditions"][-1]["value"] == Condition.RED_WINS
+
+
+class TestMonteCarloSpymaster:
+    def test_avoids_clues_that_risk_the_assassin(self, index):
+        # given
+        spymaster = MonteCarloSpymaster(
+            index, LookaheadConfig(margin=None, time_budget=0.05, seed=0)
+        )
+        greedy = best_clue(
+            index,
+            ["blue1", "blue2", "blue3"],
+            ["red1", "red2", "red3", "neutral", "assassin"],
+            margin=None,
+        )
+
+        # when
+        clue = spymaster.give_clue(42, create_game_info())
+
+        # then
+        assert greedy.word == "risky"
+        assert clue.word == "safe"
+
+    def test_rollouts_within_time_budget(self, index):
+        # given
+        spymaster = MonteCarloSpymaster(
+            index, LookaheadConfig(margin=None, time_budget=0.05, seed=0)
+        )
+
+        # when
+        start = time.perf_counter()
+        evaluations = spymaster.evaluate(42, create_game_info(Condition.RED_SPY))
+        elapsed = time.perf_counter() - start
+
+        # then
+        assert elapsed < 0.5
+        assert evaluations[0].clue.word == "redclue"
+        assert all(e.num_rollouts > 1 for e in evaluations)
+
+    def test_only_for_spymasters(self, index):
+        # when / then
+        with pytest.raises(StateException):
+            MonteCarloSpymaster(index).evaluate(
+                42, create_game_info(Condition.BLUE_PLAYER)
+            )
@@ -0,0 +1,72 @@
+from codenames.metrics import (
+    MetricsRegistry,
+    DB_STATEMENTS,
+    instrument_engine,
+)
+from codenames.sql import SQLAlchemyGameBackend
+
+from utils import create_default_game
+
+
+class TestMetricsRegistry:
+    def test_render_counter(self):
+        # given
+        registry = MetricsRegistry()
+        counter = registry.counter("requests_total", "Requests.", ["route"])
+
+        # when
+        counter.inc(route="/a")
+        counter.inc(2, route="/a")
+        counter.inc(route='/"b"')
+
+        # then
+        assert registry.render() == (
+            "# HELP requests_total Requests.\n"
+            "# TYPE requests_total counter\n"
+            'requests_total{route="/a"} 3\n'
+            'requests_total{route="/\\"b\\""} 1\n'
+        )
+
+    def test_render_histogram(self):
+        # given
+        registry = MetricsRegistry()
+        histogram = registry.histogram("latency_seconds", "Latency.", buckets=(0.1, 1))
+
+        # when
+        histogram.observe(0.05)
+        histogram.observe(0.1)
+        histogram.observe(3)
+
+        # then
+        assert registry.render().splitlines()[2:] == [
+            'latency_seconds_bucket{le="0.1"} 2',
+            'latency_seconds_bucket{le="1"} 2',
+            'latency_seconds_bucket{le="+Inf"} 3',
+            "latency_seconds_sum 3.15",
+            "latency_seconds_count 3",
+        ]
+
+    def test_render_gauge(self):
+        # given
+        registry = MetricsRegistry()
+        registry.gauge("subscribers", "Subscribers.", lambda: {(): 7})
+
+        # when
+        result = registry.render()
+
+        # then
+        assert result.splitlines()[-1] == "subscribers 7"
+
+
+def test_instrument_engine_counts_statements(db_session):
+    # given
+    instrument_engine(db_session.get_bind())
+    create_default_game(db_session)
+    backend = SQLAlchemyGameBackend(42, db_session)
+    num_selects = DB_STATEMENTS.value(verb="SELECT")
+
+    # when
+    backend.load()
+
+    # then
+    assert DB_STATEMENTS.value(verb="SELECT") > num_selects
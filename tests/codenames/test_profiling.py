@@ -0,0 +1,87 @@
+from pytest import fixture
+
+from codenames.game import (
+    Color,
+    Condition,
+    NotStartedGameState,
+    PlayerTurnGameState,
+    Role,
+)
+from codenames.profiling import PROFILER, RingBufferReporter, instrument_engine
+from codenames.sql import SQLAlchemyGameBackend
+
+from utils import create_default_game, add_players
+
+
+@fixture
+def records(db_session):
+    instrument_engine(db_session.get_bind())
+    records = RingBufferReporter()
+    PROFILER.configure(enabled=True)
+    PROFILER.add_reporter(records)
+    yield records
+    PROFILER.remove_reporter(records)
+    PROFILER.configure(enabled=False)
+
+
+class TestProfiler:
+    def test_records_transition(self, db_session, records):
+        # given
+        backend = SQLAlchemyGameBackend(42, db_session)
+        create_default_game(db_session)
+        state = NotStartedGameState("mysessionid", backend)
+
+        # when
+        state.join(Color.RED, Role.PLAYER, "ben")
+
+        # then
+        (record,) = records.records()
+        assert record.name == "join"
+        assert record.game_id == 42
+        assert record.duration > 0
+        assert record.num_statements > 0
+        assert record.backend_calls == {"add_players": 1, "commit": 1}
+
+    def test_nested_transitions_are_accounted_to_outermost(self, db_session, records):
+        # given
+        backend = SQLAlchemyGameBackend(42, db_session)
+        create_default_game(db_session)
+        add_players(db_session)
+        latest_hint_id = backend.add_hint("myhint", 1, Color.BLUE)
+        backend.add_condition(Condition.BLUE_PLAYER, latest_hint_id)
+        state = PlayerTurnGameState("A21", backend, Color.BLUE)
+
+        # when
+        state.guess(5)  # neutral word ends the turn
+
+        # then
+        (record,) = records.records()
+        assert record.name == "guess"
+        assert record.num_loads == 2
+        assert record.backend_calls["get_active_session_id"] == 2
+
+    def test_sampled_transitions_are_captured(self, db_session, records):
+        # given
+        PROFILER.configure(enabled=True, sample_rate=1.0)
+        backend = SQLAlchemyGameBackend(42, db_session)
+        create_default_game(db_session)
+        state = NotStartedGameState("mysessionid", backend)
+
+        # when
+        state.join(Color.RED, Role.PLAYER, "ben")
+
+        # then
+        assert "function calls" in records.records("join")[0].profile
+
+    def test_disabled_profiler_records_nothing(self, db_session, records):
+        # given
+        PROFILER.configure(enabled=False)
+        backend = SQLAlchemyGameBackend(42, db_session)
+        create_default_game(db_session)
+        state = NotStartedGameState("mysessionid", backend)
+
+        # when
+        state.join(Color.RED, Role.PLAYER, "ben")
+
+        # then
+        assert records.records() == []
@@ -0,0 +1,227 @@
+import asyncio
+import time
+
+import pytest
+from alembic.command import upgrade as alembic_upgrade
+from alembic.config import Config as AlembicConfig
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import sessionmaker
+
+from codenames import models
+from codenames.archive import load_archived_game
+from codenames.broadcast import BroadcasterRegistry, StreamConfig
+from codenames.broker import create_broker
+from codenames.embeddings import EmbeddingService
+from codenames.game import Color, Condition
+from codenames.metrics import REAPED_GAMES, REAPED_SUBSCRIBERS
+from codenames.reaper import GameReaper, ReaperConfig, delete_games, stale_games
+from codenames.similarity import SimilarityService
+from codenames.sql import SQLAlchemyGameBackend, SQLAlchemyGameManager
+from utils import create_default_game, add_players, play_default_game
+
+TTL = 60
+
+
+class ConstantEmbeddingService(EmbeddingService):
+    async def similarities(self, hint, words):
+        return [1.0] * len(words)
+
+
+@pytest.fixture
+def archive_session():
+    engine = create_engine("sqlite:///:memory:")
+    models.ArchiveBase.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+class TestReaper:
+    def test_inactive_games_are_deleted(self, db_session):
+        # given
+        create_default_game(db_session)
+        add_players(db_session)
+        num_deleted = REAPED_GAMES.value(action="deleted")
+        reaper = GameReaper(lambda: db_session, ReaperConfig(ttl=TTL, batch_size=1))
+
+        # when
+        reaped = reaper.reap()
+
+        # then
+        assert reaped == [42]
+        assert REAPED_GAMES.value(action="deleted") == num_deleted + 1
+        assert db_session.query(models.Game).filter_by(id=42).count() == 0
+        for model in [models.ActiveWord, models.Player, models.Condition, models.Hint]:
+            assert db_session.query(model).filter_by(game_id=42).count() == 0
+
+    def test_no_statements_without_games(self, db_session):
+        # given
+        create_default_game(db_session)
+        statements = []
+
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        engine = db_session.get_bind()
+        event.listen(engine, "before_cursor_execute", record)
+
+        # when
+        try:
+            delete_games(db_session, [])
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+
+        # then
+        assert statements == []
+        assert db_session.query(models.Game).filter_by(id=42).count() == 1
+
+    def test_active_and_finished_games_are_kept(self, db_session):
+        # given
+        create_default_game(db_session)
+        add_players(db_session)
+        play_default_game(SQLAlchemyGameBackend(42, db_session))
+        manager = SQLAlchemyGameManager(db_session)
+        game_id = manager.create_random("lobby", "A1").id
+        now = int(time.time())
+
+        # when
+        reaped = GameReaper(lambda: db_session, ReaperConfig(ttl=TTL)).reap(now)
+
+        # then
+        assert reaped == []
+        assert stale_games(db_session, now + TTL + 1, 10) == [game_id]
+        assert db_session.query(models.Game).count() == 2
+
+    def test_activity_resets_the_ttl(self, db_session):
+        # given
+        create_default_game(db_session)
+        add_players(db_session)
+        backend = SQLAlchemyGameBackend(42, db_session)
+        backend.add_condition(Condition.BLUE_SPY)
+        backend.add_hint("sky", 2, Color.BLUE)
+        now = int(time.time())
+
+        # when
+        stale_before_ttl = stale_games(db_session, now - TTL, 10)
+        stale_after_ttl = stale_games(db_session, now + TTL, 10)
+
+        # then
+        assert stale_before_ttl == []
+        assert stale_after_ttl == [42]
+
+    def test_inactive_games_are_archived(self, db_session, archive_session):
+        # given
+        create_default_game(db_session)
+        add_players(db_session)
+        reaper = GameReaper(
+            lambda: db_session,
+            ReaperConfig(ttl=TTL, archive=True),
+            lambda: archive_session,
+        )
+
+        # when
+        reaped = reaper.reap()
+
+        # then
+        assert reaped == [42]
+        assert db_session.query(models.Game).filter_by(id=42).count() == 0
+        archived = load_archived_game(archive_session, 42)
+        assert archived.name == "mygame"
+        assert archived.finished_at is None
+
+    def test_conflicting_games_are_not_archived(self, db_session, archive_session):
+        # given
+        create_default_game(db_session)
+        later_id = SQLAlchemyGameManager(db_session).create_random("later", "A1").id
+        archive_session.add(
+            models.ArchivedGame(id=42, name="othergame", condition=0, archived_at=0)
+        )
+        archive_session.commit()
+        reaper = GameReaper(
+            lambda: db_session,
+            ReaperConfig(ttl=TTL, batch_size=1, archive=True),
+            lambda: archive_session,
+        )
+
+        # when
+        reaped = reaper.reap(int(time.time()) + TTL + 1)
+
+        # then
+        assert reaped == [later_id]
+        assert db_session.query(models.Game).filter_by(id=42).count() == 1
+        assert load_archived_game(archive_session, later_id).name == "later"
+
+    def test_subscribers_of_reaped_games_are_closed(self, db_session):
+        # given
+        create_default_game(db_session)
+        backend = SQLAlchemyGameBackend(42, db_session)
+        num_closed = REAPED_SUBSCRIBERS.value()
+
+        async def run():
+            broadcasters = BroadcasterRegistry(
+                lambda _: backend.load(), create_broker(None), StreamConfig()
+            )
+            subscriber = broadcasters.get(42).subscribe("A21")
+            reaper = GameReaper(
+                lambda: db_session, ReaperConfig(ttl=TTL), broadcasters=broadcasters
+            )
+            reaper.close_subscribers(reaper.reap())
+            return subscriber, broadcasters.stats()
+
+        # when
+        subscriber, stats = asyncio.run(run())
+
+        # then
+        assert subscriber.closed
+        assert stats["active_subscribers"] == 0
+        assert REAPED_SUBSCRIBERS.value() == num_closed + 1
+
+    def test_boards_of_reaped_games_are_forgotten(self, db_session):
+        # given
+        create_default_game(db_session)
+        similarities = SimilarityService(
+            ConstantEmbeddingService(), lambda _: [(1, "Ocean")], debounce=0
+        )
+        reaper = GameReaper(
+            lambda: db_session, ReaperConfig(ttl=TTL), similarities=similarities
+        )
+
+        async def run():
+            await similarities.scores(42, "sea")
+            cached = similarities.cached(42, "sea")
+            reaper.forget_boards(reaper.reap())
+            return cached, similarities.cached(42, "sea")
+
+        # when
+        cached, forgotten = asyncio.run(run())
+
+        # then
+        assert cached == {1: 1.0}
+        assert forgotten is None
+
+    def test_games_without_timestamps_are_kept_after_migration(self, tmp_path):
+        # given
+        url = f"sqlite:///{tmp_path / 'codenames.sqlite'}"
+        alembic_config = AlembicConfig("alembic.ini")
+        alembic_config.set_main_option("sqlalchemy.url", url)
+        engine = create_engine(url)
+        with engine.begin() as connection:
+            alembic_config.attributes["connection"] = connection
+            alembic_upgrade(alembic_config, "e5b3c8d1a7f2")
+            connection.execute(text("INSERT INTO games (id, name) VALUES (42, 'old')"))
+            connection.execute(
+                text("INSERT INTO conditions (game_id, condition) VALUES (42, 0)")
+            )
+
+        # when
+        with engine.begin() as connection:
+            alembic_config.attributes["connection"] = connection
+            alembic_upgrade(alembic_config, "head")
+        db = sessionmaker(bind=engine)()
+        reaped = GameReaper(lambda: db, ReaperConfig(ttl=TTL)).reap()
+
+        # then
+        assert reaped == []
+        db.close()
+        engine.dispose()
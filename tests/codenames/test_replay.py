@@ -0,0 +1,157 @@
+import pytest
+
+from codenames import models, replay
+from codenames.game import Condition, Game
+from codenames.replay import (
+    END_TURN,
+    GUESS,
+    HINT,
+    START,
+    Replay,
+    ReplayException,
+    UndoHistory,
+)
+from codenames.sql import SQLAlchemyGameBackend
+from utils import create_default_game, add_players, play_default_game
+
+EVENT_TYPES = [START, HINT, GUESS, END_TURN, HINT, GUESS, HINT, GUESS, HINT, GUESS]
+
+
+class TestReplay:
+    @pytest.fixture
+    def backend(self, db_session):
+        create_default_game(db_session)
+        add_players(db_session)
+        backend = SQLAlchemyGameBackend(42, db_session)
+        play_default_game(backend)
+        return backend
+
+    def test_events_of_the_log(self, backend, db_session):
+        # when
+        result = Replay.load(db_session, 42)
+
+        # then
+        assert [e.type for e in result.events] == EVENT_TYPES
+        assert [e.word_id for e in result.events if e.type == GUESS] == [2, 4, 5, 6]
+        assert result.finished
+
+    def test_events_of_logs_without_move_references(self, backend, db_session):
+        # given
+        db_session.query(models.Condition).update({"move_id": None})
+        db_session.commit()
+
+        # when
+        result = Replay.load(db_session, 42)
+
+        # then
+        assert [e.type for e in result.events] == EVENT_TYPES
+        assert [e.word_id for e in result.events if e.type == GUESS] == [2, 4, 5, 6]
+
+    def test_events_of_logs_partially_without_move_references(
+        self, backend, db_session
+    ):
+        # given the first turns have been played before there were references
+        conditions = db_session.query(models.Condition).order_by(models.Condition.id)
+        for condition in conditions.limit(6):  # up to the hint "fire"
+            condition.move_id = None
+        db_session.commit()
+
+        # when
+        result = Replay.load(db_session, 42)
+
+        # then
+        assert [e.type for e in result.events] == EVENT_TYPES
+        assert [e.word_id for e in result.events if e.type == GUESS] == [2, 4, 5, 6]
+
+    def test_final_state_is_the_loaded_game(self, backend, db_session):
+        # when
+        result = Replay.load(db_session, 42).state()
+
+        # then
+        assert result == backend.load()
+
+    def test_states_of_all_steps(self, backend, db_session, monkeypatch):
+        # given
+        monkeypatch.setattr(replay, "CHECKPOINT_INTERVAL", 3)
+        game_replay = Replay.load(db_session, 42)
+
+        # when
+        states = [game_replay.state(step) for step in range(len(game_replay) + 1)]
+
+        # then
+        assert [len(s["conditions"]) for s in states] == list(range(1, 12))
+        assert [s["conditions"][-1]["value"] for s in states[:4]] == [
+            Condition.NOT_STARTED,
+            Condition.BLUE_SPY,
+            Condition.BLUE_PLAYER,
+            Condition.BLUE_PLAYER,
+        ]
+        assert states[2]["words"][2].is_active
+        assert not states[3]["words"][2].is_active
+        assert [len(s["hints"]) for s in states] == [1, 1, 2, 2, 2, 3, 3, 4, 4, 5, 5]
+        with pytest.raises(ReplayException):
+            game_replay.state(len(game_replay) + 1)
+
+    def test_seek(self, backend, db_session):
+        # given
+        game_replay = Replay.load(db_session, 42)
+        last = game_replay.events[-1].at
+
+        # when / then
+        assert game_replay.seek(0) == 0
+        assert game_replay.seek(last) == len(game_replay)
+        assert game_replay.state_at(last) == game_replay.state()
+
+    def test_export(self, backend, db_session):
+        # when
+        result = Replay.load(db_session, 42).export(reveal=False)
+
+        # then
+        assert result["events"][:3] == [
+            [START, result["events"][0][1]],
+            [HINT, result["events"][1][1], "sky", 2],
+            [GUESS, result["events"][2][1], 2],
+        ]
+        colors = {word_id: color for word_id, _, color in result["words"]}
+        assert colors[2] is not None
+        assert colors[1] is None
+
+
+class TestUndoHistory:
+    @pytest.fixture
+    def backend(self, db_session):
+        create_default_game(db_session)
+        add_players(db_session)
+        backend = SQLAlchemyGameBackend(42, db_session)
+        play_default_game(backend)
+        return backend
+
+    def test_undo_and_redo(self, backend, db_session):
+        # given
+        history = UndoHistory()
+        expected = backend.load()
+
+        # when
+        undone = [history.undo(db_session, 42) for _ in range(3)]
+        state = SQLAlchemyGameBackend(42, db_session).load()
+        for _ in range(3):
+            history.redo(db_session, 42)
+
+        # then
+        assert [e.type for e in undone] == [GUESS, HINT, GUESS]
+        assert state["conditions"][-1]["value"] == Condition.BLUE_PLAYER
+        assert state["words"][6].is_active and state["words"][5].is_active
+        assert Replay.load(db_session, 42).state() == expected
+
+    def test_no_redo_after_new_actions(self, backend, db_session):
+        # given
+        history = UndoHistory()
+        history.undo(db_session, 42)
+        history.undo(db_session, 42)
+        Game("A22", backend).load_state().give_hint("other", 1)
+
+        # when / then
+        with pytest.raises(ReplayException):
+            history.redo(db_session, 42)
+        with pytest.raises(ReplayException):
+            history.redo(db_session, 42)
@@ -0,0 +1,96 @@
+import pytest
+from sqlalchemy import create_engine
+from alembic.command import upgrade as alembic_upgrade
+from alembic.config import Config as AlembicConfig
+
+from codenames import models
+from codenames.game import Condition, GameAlreadyExistsException
+from codenames.reaper import delete_games
+from codenames.sharding import GameShards, ShardedGameBackend, ShardedGameManager
+
+NUM_SHARDS = 3
+
+
+def migrated_engine():
+    engine = create_engine("sqlite:///:memory:")
+    alembic_config = AlembicConfig("alembic.ini")
+    alembic_config.set_main_option("sqlalchemy.url", "sqlite:///:memory:")
+    with engine.begin() as connection:
+        alembic_config.attributes["connection"] = connection
+        alembic_upgrade(alembic_config, "head")
+    return engine
+
+
+@pytest.fixture
+def shards():
+    engines = [migrated_engine() for _ in range(NUM_SHARDS)]
+    yield GameShards.from_engines(engines)
+    for engine in engines:
+        engine.dispose()
+
+
+def manager(shards):
+    return ShardedGameManager(shards, num_blue=2, num_red=2, num_neutral=2)
+
+
+class TestShardedGameManager:
+    def test_games_are_created_on_the_shard_of_their_name(self, shards):
+        # given
+        names = [f"game-{i}" for i in range(12)]
+
+        # when
+        game_ids = [manager(shards).create_random(n, "mysessionid").id for n in names]
+
+        # then
+        assert len(set(game_ids)) == len(names)
+        assert len({shards.shard_of_name(n) for n in names}) == NUM_SHARDS
+        for name, game_id in zip(names, game_ids):
+            shard = shards.shard_of_name(name)
+            assert shards.shard_of(game_id) == shard
+            for s in range(NUM_SHARDS):
+                db = shards.session(s)
+                assert db.query(models.Game).filter_by(id=game_id).count() == (
+                    1 if s == shard else 0
+                )
+                db.close()
+
+    def test_games_are_found_by_name_and_id(self, shards):
+        # given
+        created = manager(shards).create_random("my_game", "mysessionid")
+
+        # when
+        game = manager(shards).get("my_game", "mysessionid")
+        backend = ShardedGameBackend(game.id, shards)
+        info = backend.load()
+        backend.close()
+
+        # then
+        assert game.id == created.id
+        assert len(info["words"]) == 7
+        assert info["conditions"][-1]["value"] == Condition.NOT_STARTED
+        assert manager(shards).get("other_game") is None
+
+    def test_creating_duplicates_fails(self, shards):
+        # given
+        manager(shards).create_random("my_game", "mysessionid")
+
+        # when / then
+        with pytest.raises(GameAlreadyExistsException):
+            manager(shards).create_random("my_game", "mysessionid")
+
+    def test_ids_of_deleted_games_are_not_reused(self, shards):
+        # given
+        names = [f"game-{i}" for i in range(20)]
+        shard = shards.shard_of_name(names[0])
+        first, second = [n for n in names if shards.shard_of_name(n) == shard][:2]
+        deleted = manager(shards).create_random(first, "mysessionid").id
+        db = shards.session(shard)
+        delete_games(db, [deleted])
+        db.close()
+
+        # when
+        created = manager(shards).create_random(second, "mysessionid").id
+
+        # then
+        assert created > deleted
+        assert shards.shard_of(created) == shard
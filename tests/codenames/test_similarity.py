@@ -0,0 +1,118 @@
+import asyncio
+
+from codenames.embeddings import EmbeddingService
+from codenames.similarity import SimilarityService
+
+BOARD = [(1, "Ocean"), (2, "Hollywood"), (3, "Bank")]
+
+
+class CountingEmbeddingService(EmbeddingService):
+    """Scores a word by the number of letters it shares with the hint."""
+
+    def __init__(self):
+        self.hints = []
+
+    async def similarities(self, hint, words):
+        self.hints.append(hint)
+        return [float(len(set(hint.lower()) & set(w.lower()))) for w in words]
+
+
+def create_service(**kwargs):
+    embeddings = CountingEmbeddingService()
+    boards = []
+
+    def load_board(game_id):
+        boards.append(game_id)
+        return BOARD
+
+    return SimilarityService(embeddings, load_board, **kwargs), embeddings, boards
+
+
+class TestSimilarityService:
+    def test_scores_are_cached_per_game(self):
+        # given
+        service, embeddings, boards = create_service(debounce=0)
+
+        async def run():
+            return [
+                await service.scores(42, "sea", "A"),
+                await service.scores(42, "SEA", "B"),
+                await service.scores(42, "hill", "A"),
+            ]
+
+        # when
+        results = asyncio.run(run())
+
+        # then
+        assert results[0] == ("sea", {1: 1.0, 2: 0.0, 3: 0.5})
+        assert results[1] == ("SEA", results[0][1])
+        assert embeddings.hints == ["sea", "hill"]
+        assert boards == [42]
+
+    def test_newer_hints_of_a_session_supersede_older_ones(self):
+        # given
+        service, embeddings, boards = create_service(debounce=0.05)
+
+        async def run():
+            queries = []
+            for hint in ["o", "oc", "oce"]:
+                queries.append(asyncio.create_task(service.scores(42, hint, "A")))
+                await asyncio.sleep(0.01)
+            other = asyncio.create_task(service.scores(42, "bank", "B"))
+            return await asyncio.gather(*queries, other)
+
+        # when
+        results = asyncio.run(run())
+
+        # then
+        assert [hint for hint, _ in results] == ["oce", "oce", "oce", "bank"]
+        assert sorted(embeddings.hints) == ["bank", "oce"]
+
+    def test_least_recently_used_hints_are_evicted(self):
+        # given
+        service, embeddings, boards = create_service(debounce=0, max_hints_per_game=2)
+
+        async def run():
+            for hint in ["sea", "hill", "sea", "bank", "hill"]:
+                await service.scores(42, hint)
+
+        # when
+        asyncio.run(run())
+
+        # then
+        assert embeddings.hints == ["sea", "hill", "bank", "hill"]
+
+    def test_empty_hint(self):
+        # given
+        service, embeddings, boards = create_service()
+
+        # when
+        result = asyncio.run(service.scores(42, "", "A"))
+
+        # then
+        assert result == ("", {1: 1.0, 2: 1.0, 3: 1.0})
+        assert embeddings.hints == []
+
+    def test_cancelled_computations_do_not_block_coalesced_queries(self):
+        # given
+        class BlockingEmbeddingService(EmbeddingService):
+            async def similarities(self, hint, words):
+                await asyncio.Event().wait()
+
+        service = SimilarityService(BlockingEmbeddingService(), lambda _: BOARD)
+
+        async def run():
+            first = asyncio.create_task(service.scores(42, "sea"))
+            await asyncio.sleep(0.01)
+            second = asyncio.create_task(service.scores(42, "sea"))
+            await asyncio.sleep(0.01)
+            first.cancel()
+            done, _ = await asyncio.wait([second], timeout=1)
+            return done
+
+        # when
+        done = asyncio.run(run())
+
+        # then
+        assert len(done) == 1
+        assert next(iter(done)).cancelled()
@@ -1,14 +1,20 @@
 import pytest
+from sqlalchemy.exc import IntegrityError
 
+from codenames import models
 from codenames.game import (
     Word,
     Color,
     Role,
     Condition,
     GameAlreadyExistsException,
+    AlreadyJoinedException,
+    RoleOccupiedException,
     StateException,
 )
-from codenames.sql import SQLAlchemyGameManager, SQLAlchemyGameBackend
+from codenames.metrics import DB_STATEMENTS, instrument_engine
+from codenames.reaper import delete_games
+from codenames.sql import GameIdCache, SQLAlchemyGameManager, SQLAlchemyGameBackend
 
 from utils import create_default_game, add_players
 
@@ -82,6 +88,83 @@ class TestSQLAlchemyGameBackend:
         # then
         assert backend.load()["conditions"][-1]["value"] == Condition.BLUE_SPY
 
+    def test_add_players_at_once(self, db_session):
+        # given
+        backend = SQLAlchemyGameBackend(42, db_session)
+        create_default_game(db_session)
+        players = [
+            {"session_id": "A1", "color": Color.RED, "role": Role.PLAYER, "name": "a"},
+            {"session_id": "A2", "color": Color.BLUE, "role": Role.PLAYER, "name": "b"},
+        ]
+
+        # when
+        backend.add_players(players)
+        backend.commit()
+
+        # then
+        assert backend.load()["players"] == players
+
+    def test_adding_players_to_occupied_roles_fails(self, db_session):
+        # given
+        backend = SQLAlchemyGameBackend(42, db_session)
+        create_default_game(db_session)
+        add_players(db_session)  # adds A23 as red player
+
+        # when / then
+        with pytest.raises(RoleOccupiedException):
+            backend.add_players(
+                [
+                    {
+                        "session_id": "A1",
+                        "color": Color.RED,
+                        "role": Role.PLAYER,
+                        "name": "a",
+                    }
+                ]
+            )
+
+    def test_adding_joined_players_fails(self, db_session):
+        # given
+        backend = SQLAlchemyGameBackend(42, db_session)
+        create_default_game(db_session)
+        backend.add_players(
+            [{"session_id": "A1", "color": Color.RED, "role": Role.PLAYER, "name": "a"}]
+        )
+
+        # when / then
+        with pytest.raises(AlreadyJoinedException):
+            backend.add_players(
+                [
+                    {
+                        "session_id": "A1",
+                        "color": Color.BLUE,
+                        "role": Role.PLAYER,
+                        "name": "a",
+                    }
+                ]
+            )
+
+    def test_active_session_id_of_a_loaded_game_needs_no_queries(self, db_session):
+        # given
+        backend = SQLAlchemyGameBackend(42, db_session)
+        create_default_game(db_session)
+        add_players(db_session)
+        instrument_engine(db_session.get_bind())
+        backend.load()
+        num_selects = DB_STATEMENTS.value(verb="SELECT")
+
+        # when
+        backend.add_condition(Condition.BLUE_SPY)
+        spymaster = backend.get_active_session_id()
+        backend.add_condition(Condition.BLUE_PLAYER)
+        player = backend.get_active_session_id()
+
+        # then
+        assert (spymaster, player) == ("A100", "A21")
+        assert DB_STATEMENTS.value(verb="SELECT") == num_selects
+        backend.commit()
+        assert SQLAlchemyGameBackend(42, db_session).get_active_session_id() == "A21"
+
     def test_has_joined(self, db_session):
         # given
         backend = SQLAlchemyGameBackend(42, db_session)
@@ -212,3 +295,94 @@ class TestSQLAlchemyGameManager:
         # then
         with pytest.raises(GameAlreadyExistsException):
             manager.create_random("my_game", "mysessionid")
+
+    def test_get_a_created_game_by_name(self, db_session):
+        # given
+        manager = SQLAlchemyGameManager(
+            db_session, num_blue=2, num_red=2, num_neutral=2
+        )
+        created = manager.create_random("my_game", "mysessionid")
+
+        # when
+        game = manager.get("my_game", "mysessionid")
+
+        # then
+        assert game.id == created.id
+        assert manager.get("other_game") is None
+
+    def test_game_ids_are_cached(self, db_session):
+        # given
+        game_ids = GameIdCache(max_size=1)
+        manager = SQLAlchemyGameManager(
+            db_session, num_blue=2, num_red=2, num_neutral=2, game_ids=game_ids
+        )
+        first = manager.create_random("first", "mysessionid")
+        second = manager.create_random("second", "mysessionid")
+
+        # when
+        cached = [game_ids.get("first"), game_ids.get("second")]
+        looked_up = manager.get_id("first")
+
+        # then
+        assert cached == [None, second.id]
+        assert looked_up == first.id
+        assert len(game_ids) == 1
+        assert game_ids.get("first") == first.id
+
+    def test_game_names_are_unique(self, db_session):
+        # given
+        db_session.add(models.Game(name="my_game"))
+        db_session.commit()
+
+        # when
+        db_session.add(models.Game(name="my_game"))
+
+        # then
+        with pytest.raises(IntegrityError):
+            db_session.commit()
+
+    def test_ids_of_deleted_games_are_not_reused(self, db_session):
+        # given
+        manager = SQLAlchemyGameManager(
+            db_session, num_blue=2, num_red=2, num_neutral=2
+        )
+        deleted = manager.create_random("deleted", "mysessionid").id
+        delete_games(db_session, [deleted])
+
+        # when
+        created = manager.create_random("created", "mysessionid").id
+
+        # then
+        assert created > deleted
+
+    def test_cached_ids_of_games_deleted_elsewhere_are_dropped(self, db_session):
+        # given
+        game_ids = GameIdCache()
+        manager = SQLAlchemyGameManager(
+            db_session, num_blue=2, num_red=2, num_neutral=2, game_ids=game_ids
+        )
+        deleted = manager.create_random("my_game", "mysessionid").id
+        # as by the reaper of another worker, which leaves this cache as it is
+        db_session.query(models.Game).filter_by(id=deleted).delete()
+        db_session.commit()
+
+        # when
+        result = manager.get("my_game")
+
+        # then
+        assert result is None
+        assert game_ids.get("my_game") is None
+
+    def test_ids_are_allocated_without_a_counter(self, db_session):
+        # given
+        db_session.query(models.GameIdCounter).delete()
+        create_default_game(db_session)
+        manager = SQLAlchemyGameManager(
+            db_session, num_blue=2, num_red=2, num_neutral=2
+        )
+
+        # when
+        game_ids = [manager.create_random(n, "mysessionid").id for n in ["a", "b"]]
+
+        # then
+        assert game_ids == [43, 44]
@@ -0,0 +1,65 @@
+import pytest
+
+from codenames.game import Color, Role
+from codenames.tokens import InvalidTokenException, SeatTokens
+
+
+class TestSeatTokens:
+    def test_issued_tokens_are_valid(self):
+        # given
+        tokens = SeatTokens(b"secret")
+
+        # when
+        seat = tokens.verify(tokens.issue(42, Color.BLUE, Role.SPYMASTER), 42)
+
+        # then
+        assert seat == (Color.BLUE, Role.SPYMASTER)
+
+    def test_modified_tokens_are_invalid(self):
+        # given
+        tokens = SeatTokens(b"secret")
+        token = tokens.issue(42, Color.BLUE, Role.SPYMASTER)
+        forged = token.replace("42.2.2", "42.1.2", 1)
+
+        # when / then
+        with pytest.raises(InvalidTokenException):
+            tokens.verify(forged, 42)
+
+    def test_tokens_of_other_secrets_are_invalid(self):
+        # given
+        token = SeatTokens(b"other").issue(42, Color.BLUE, Role.SPYMASTER)
+
+        # when / then
+        with pytest.raises(InvalidTokenException):
+            SeatTokens(b"secret").verify(token, 42)
+
+    def test_tokens_are_valid_for_their_game_only(self):
+        # given
+        tokens = SeatTokens(b"secret")
+        token = tokens.issue(42, Color.BLUE, Role.SPYMASTER)
+
+        # when / then
+        with pytest.raises(InvalidTokenException):
+            tokens.verify(token, 43)
+
+    def test_tokens_expire(self):
+        # given
+        tokens = SeatTokens(b"secret", ttl=60)
+        token = tokens.issue(42, Color.BLUE, Role.SPYMASTER, now=1000)
+
+        # when
+        seat = tokens.verify(token, 42, now=1059)
+
+        # then
+        assert seat == (Color.BLUE, Role.SPYMASTER)
+        with pytest.raises(InvalidTokenException):
+            tokens.verify(token, 42, now=1060)
+
+    def test_malformed_tokens_are_invalid(self):
+        # given
+        tokens = SeatTokens(b"secret")
+
+        # when / then
+        for token in ["", "42", "a.b.c.d", "42.2.2.2.2"]:
+            with pytest.raises(InvalidTokenException):
+                tokens.verify(token + "." + tokens._sign(token), 42)
@@ -2,6 +2,7 @@ from codenames.game import (
     Color,
     Role,
     Condition,
+    Game,
 )
 
 from codenames import models
@@ -53,3 +54,17 @@ def add_players(db):
     ]
     db.add_all(players)
     db.commit()
+
+
+def play_default_game(backend):
+    """ Plays the default game until red guesses the assassin. """
+    Game("A100", backend).load_state().start_game()
+    Game("A100", backend).load_state().give_hint("sky", 2)
+    Game("A21", backend).load_state().guess(2)  # blue
+    Game("A21", backend).load_state().end_turn()
+    Game("A22", backend).load_state().give_hint("fire", 1)
+    Game("A23", backend).load_state().guess(4)  # blue
+    Game("A100", backend).load_state().give_hint("sea", 1)
+    Game("A21", backend).load_state().guess(5)  # neutral
+    Game("A22", backend).load_state().give_hint("death", 1)
+    Game("A23", backend).load_state().guess(6)  # assassin